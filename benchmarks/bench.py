@@ -0,0 +1,402 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Benchmarks of OpenFLEX's own overhead: expanding, filtering and sampling
+# combinations, parsing tool results, writing the CSV and results database, and
+# launching tool runs. The tools are the stand-ins in benchmarks/fakebin, which
+# write realistic reports instantly, so every measured second is spent in
+# OpenFLEX. Each benchmark records its best time over several repeats and its
+# peak (Python) memory, which can be saved to a JSON baseline and compared with
+# later runs:
+#
+#   python benchmarks/bench.py --save baseline.json
+#   python benchmarks/bench.py --compare baseline.json
+
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+import click
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openflex.config import FlexConfig
+from openflex.constraints import numpy
+
+FAKEBIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakebin")
+
+# Combination counts, from 10 to 10^6
+SIZES = [10**k for k in range(1, 7)]
+
+VIVADO_REPORT = "431.03\nLUT:1187:53200 FF:845:106400 BRAM:4:140 DSP:8:220 IO:66:200\n"
+QUARTUS_OUTPUT = (
+    "Info: Running Quartus Prime Shell\n"
+    + "HEADERS: fMax,fMax (restricted),ALMs,ALMs (Total),REGs,REGs (Total),DSPs,DSPs (Total)\n"
+    + "VALUES: 402.41,402.41,1421,113560,845,454240,8,342\n"
+    + "Info: Quartus Prime Shell was successful. 0 errors, 0 warnings\n"
+)
+PROFILE = {
+    "wall": 12.5,
+    "cpu": 11.8,
+    "peak_rss": 1450.0,
+    "stages": {
+        "synth_design": {"wall": 6.1, "cpu": 5.9, "peak_rss": 1210.0},
+        "place_design": {"wall": 3.2, "cpu": 3.0, "peak_rss": 1450.0},
+        "route_design": {"wall": 3.2, "cpu": 2.9, "peak_rss": 1390.0},
+    },
+}
+
+
+def write_config(size, tool="vivado", groups=False, constraints=False):
+    # Writes bench.yml (and the RTL file it names) in the current directory, with
+    # parameters whose product is size (a power of 10). With groups, half of the
+    # combinations come from a subset group. With constraints, a derived
+    # parameter and a constraint that keeps about half of the combinations.
+    digits = len(str(size)) - 1
+    parameters = {f"P{i}": list(range(10)) for i in range(digits)}
+    config = {
+        "mode": "synth",
+        "tool": tool,
+        "top": "top",
+        "clock": "clk",
+        "device": "xc7a100tcsg324-1",
+        "files": ["top.sv"],
+        "parameters": parameters,
+    }
+    if groups:
+        parameters["P0"] = list(range(5))
+        config["groups"] = [{"MODE": ["fast"]}, {"P0": list(range(5, 10))}]
+    if constraints and digits > 1:
+        config["derived"] = {"SUM": "P0 + P1"}
+        config["constraints"] = [f"P0 <= P{digits - 1}"]
+
+    with open("top.sv", "w") as file:
+        file.write("module top #(parameter P0 = 0) (input logic clk);\nendmodule\n")
+    with open("bench.yml", "w") as file:
+        yaml.safe_dump(config, file)
+
+    return "bench.yml"
+
+
+def load(path):
+    dut = FlexConfig(path)
+    dut.cache = None
+    dut.results_file = "bench.db"
+    return dut
+
+
+def expand(groups=False, constraints=False):
+    def setup(size):
+        path = write_config(size, groups=groups, constraints=constraints)
+        return lambda: sum(1 for _ in load(path).combinations)
+
+    return setup
+
+
+def count(size):
+    path = write_config(size, constraints=True)
+    return lambda: len(load(path).combinations)
+
+
+def filtered(size):
+    dut = load(write_config(size))
+    base = dut.combinations
+
+    def run():
+        dut.combinations = base
+        dut.filter(lambda c: int(c["P0"]) % 2 == 0)
+        return sum(1 for _ in dut.combinations)
+
+    return run
+
+
+def added(size):
+    # add_parameter() on a tenth of the space, with ten values per combination
+    dut = load(write_config(size // 10 or 1))
+    base = dut.combinations
+
+    def run():
+        dut.combinations = base
+        dut.add_parameter("WIDTH", lambda c, kwargs: range(kwargs["n"]), n=10)
+        return sum(1 for _ in dut.combinations)
+
+    return run
+
+
+def sampled(size):
+    # A tenth of the space, drawn at random
+    dut = load(write_config(size))
+    base = dut.combinations
+
+    def run():
+        dut.combinations = base
+        dut.sample(max(size // 10, 1))
+        return sum(1 for _ in dut.combinations)
+
+    return run
+
+
+def parse_vivado(size):
+    dut = load(write_config(10))
+    os.makedirs("report", exist_ok=True)
+    with open(os.path.join("report", "vivado_report.txt"), "w") as file:
+        file.write(VIVADO_REPORT)
+    with open(os.path.join("report", "openflex_profile.json"), "w") as file:
+        json.dump(PROFILE, file)
+
+    def run():
+        for _ in range(size):
+            dut._vivado_metrics("report")
+
+    return run
+
+
+def parse_quartus(size):
+    dut = load(write_config(10))
+
+    def run():
+        for _ in range(size):
+            dut._quartus_metrics(QUARTUS_OUTPUT)
+
+    return run
+
+
+def write_csv(size):
+    dut = load(write_config(10))
+    metrics = {"fMax": "431.03", "LUT (Used)": "1187", "LUT (Total)": "53200", "Time (s)": "12.5"}
+
+    def run():
+        if os.path.exists("bench.csv"):
+            os.remove("bench.csv")
+        for i in range(size):
+            dut._write_csv_row("bench.csv", {"P0": i, "P1": i % 7}, metrics)
+        dut._close_csv()
+
+    return run
+
+
+def write_db(size):
+    dut = load(write_config(10))
+    metrics = {"fMax": "431.03", "LUT (Used)": "1187", "LUT (Total)": "53200", "Time (s)": "12.5"}
+
+    def run():
+        for i in range(size):
+            dut.db.add(f"{i:064x}", "vivado", "xc7", "top", {"P0": i, "P1": i % 7}, metrics)
+
+    return run
+
+
+def launch(tool):
+    # A whole sweep, one tool run per combination, with the results written to a
+    # CSV file and the results database
+    def setup(size):
+        path = write_config(size, tool)
+
+        def run():
+            for f in ("bench.csv", "bench.db"):
+                if os.path.exists(f):
+                    os.remove(f)
+            shutil.rmtree(f"build_{tool}", ignore_errors=True)
+            dut = load(path)
+            if tool == "questa":
+                dut.questa_sim()
+            else:
+                getattr(dut, f"{tool}_synth")("bench.csv", clk_period="2.5")
+
+        return run
+
+    return setup
+
+
+# Name, setup function (called with the size in an empty working directory, and
+# returning the function to time), and largest size (None for any size, "runs"
+# for sizes limited by --max-runs)
+BENCHMARKS = [
+    ("expand/grid", expand(), None),
+    ("expand/groups", expand(groups=True), None),
+    ("expand/constraints", expand(constraints=True), None),
+    ("count/constraints", count, None),
+    ("filter", filtered, None),
+    ("add_parameter", added, None),
+    ("sample", sampled, None),
+    ("parse/vivado", parse_vivado, 10**5),
+    ("parse/quartus", parse_quartus, 10**5),
+    ("write/csv", write_csv, 10**4),
+    ("write/db", write_db, 10**4),
+    ("launch/vivado", launch("vivado"), "runs"),
+    ("launch/quartus", launch("quartus"), "runs"),
+    ("launch/questa", launch("questa"), "runs"),
+]
+
+
+def measure(setup, size, repeat):
+    # Returns the best time of repeat runs (s), and the peak memory of one more
+    # run (MB). Output (e.g., of the tool runs) is discarded.
+    func = setup(size)
+    times = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return min(times), peak / 2**20
+
+
+def run_benchmarks(names, max_size, max_runs, repeat):
+    results = {}
+    for name, setup, limit in BENCHMARKS:
+        if names and not any(n in name for n in names):
+            continue
+
+        if limit == "runs":
+            limit = max_runs
+        for size in SIZES:
+            if size > max_size or (limit is not None and size > limit):
+                break
+
+            directory = tempfile.mkdtemp(prefix="openflex_bench_")
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                elapsed, peak = measure(setup, size, repeat)
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(directory, ignore_errors=True)
+
+            results[f"{name}/{size}"] = {
+                "benchmark": name,
+                "size": size,
+                "time_s": elapsed,
+                "us_per_item": 1e6 * elapsed / size,
+                "peak_mb": peak,
+            }
+            print(
+                f"{name:<20} {size:>8}  {elapsed:10.4f} s  {1e6 * elapsed / size:10.2f} us/item"
+                + f"  {peak:9.2f} MB",
+                flush=True,
+            )
+
+    return results
+
+
+def compare(results, baseline, tolerance, min_time, min_memory):
+    # Prints each benchmark against the baseline, and returns the regressions: a
+    # benchmark regressed when its time or peak memory grew by more than the
+    # tolerance (and by more than min_time or min_memory, which absorb noise)
+    regressions = []
+    print(
+        f"\n{'Benchmark':<29} {'Time (s)':>10} {'Baseline':>10} {'Change':>8}"
+        + f" {'Peak (MB)':>10} {'Baseline':>10} {'Change':>8}"
+    )
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:<29} {result['time_s']:10.4f} {'-':>10} {'':>8} {result['peak_mb']:10.2f}")
+            continue
+
+        flags = []
+        time_change = result["time_s"] / base["time_s"] - 1 if base["time_s"] else 0.0
+        if time_change > tolerance and result["time_s"] - base["time_s"] > min_time:
+            flags.append("time")
+        memory_change = result["peak_mb"] / base["peak_mb"] - 1 if base["peak_mb"] else 0.0
+        if memory_change > tolerance and result["peak_mb"] - base["peak_mb"] > min_memory:
+            flags.append("memory")
+        if flags:
+            regressions.append((key, flags))
+
+        print(
+            f"{key:<29} {result['time_s']:10.4f} {base['time_s']:10.4f} {time_change:+8.0%}"
+            + f" {result['peak_mb']:10.2f} {base['peak_mb']:10.2f} {memory_change:+8.0%}"
+            + (f"  REGRESSION ({', '.join(flags)})" if flags else "")
+        )
+
+    return regressions
+
+
+@click.command()
+@click.option("-k", "--select", multiple=True, help="only run benchmarks whose name contains this")
+@click.option("--max-size", type=int, default=10**6, help="largest number of combinations")
+@click.option("--max-runs", type=int, default=100, help="largest number of (fake) tool runs")
+@click.option(
+    "--repeat", type=int, default=3, help="timed repeats of each benchmark (best is kept)"
+)
+@click.option("--save", help="write the results to a JSON baseline")
+@click.option("--compare", "baseline_file", help="compare the results with a JSON baseline")
+@click.option("--tolerance", type=float, default=0.25, help="relative growth flagged as regression")
+@click.option("--min-time", type=float, default=0.005, help="smaller time growth (s) is noise")
+@click.option("--min-memory", type=float, default=1.0, help="smaller memory growth (MB) is noise")
+def main(select, max_size, max_runs, repeat, save, baseline_file, tolerance, min_time, min_memory):
+    baseline = None
+    if baseline_file:
+        try:
+            with open(baseline_file, "r") as file:
+                baseline = json.load(file)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            sys.exit(f"ERROR: Could not read baseline {baseline_file}: {e}")
+
+    # The stand-in tools come first on the PATH, and nothing touches the user's
+    # result cache
+    os.environ["PATH"] = FAKEBIN + os.pathsep + os.environ.get("PATH", "")
+    os.environ["OPENFLEX_CACHE_DIR"] = tempfile.mkdtemp(prefix="openflex_bench_cache_")
+    try:
+        results = run_benchmarks(select, max_size, max_runs, repeat)
+    finally:
+        shutil.rmtree(os.environ["OPENFLEX_CACHE_DIR"], ignore_errors=True)
+
+    if save:
+        with open(save, "w") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "numpy": numpy is not None,
+                    "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+    if baseline is not None:
+        regressions = compare(results, baseline, tolerance, min_time, min_memory)
+        if regressions:
+            sys.exit(f"ERROR: {len(regressions)} benchmarks regressed.")
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+# Stand-in for a `quartus_sh -s` session (started by the quartus_sh stand-in),
+# for testing session runs with tclsh. It reads Tcl commands from stdin like
+# quartus_sh does, and defines the Quartus commands that OpenFLEX sends. Creating
+# a project, compiling it, and collecting its results (sourcing
+# quartus_results.tcl or quartus_synth_results.tcl) run the quartus_sh
+# stand-in, so session runs give the same results (and fail the same way, see
+# FAKE_FAIL_STAGE) as separate runs.
+#
+# For tests, FAKE_SESSION_CRASH makes the session exit when compiling the
+# projects whose parameters contain it. Each session appends its process ID to
+# FAKE_SESSION_LOG.
+
+set ::quartus_sh [file join [file dirname [file normalize [info script]]] quartus_sh]
+set ::project ""
+
+proc fake_quartus_sh {args} {
+    # Runs the quartus_sh stand-in, and errors if it fails like Quartus does
+    if {[catch {exec $::quartus_sh {*}$args 2>@1} output]} {
+        error $output
+    }
+    if {$output ne ""} {
+        puts $output
+    }
+}
+
+proc project_new {args} {
+    fake_quartus_sh --tcl_eval project_new {*}$args
+    set ::project [lindex $args end-2]
+}
+
+proc project_open {name} {
+    if {![file exists $name]} {
+        error "ERROR: Project $name does not exist."
+    }
+    set ::project [file rootname $name]
+}
+
+proc project_close {} {
+    if {$::project eq ""} {
+        error "ERROR: There is no open project."
+    }
+    set ::project ""
+}
+
+proc execute_module {args} {
+    if {$::project eq ""} {
+        error "ERROR: There is no open project."
+    }
+    if {[info exists ::env(FAKE_SESSION_CRASH)]} {
+        set file [open $::project.qsf]
+        set qsf [read $file]
+        close $file
+        if {[string first $::env(FAKE_SESSION_CRASH) $qsf] >= 0} {
+            exit 1
+        }
+    }
+    fake_quartus_sh --tcl_eval execute_module {*}$args
+}
+
+rename source tcl_source
+proc source {path} {
+    if {[string match *quartus*results.tcl $path]} {
+        fake_quartus_sh -t $path {*}$::quartus(args)
+    } else {
+        uplevel 1 [list tcl_source $path]
+    }
+}
+
+foreach command {load_package set_instance_assignment set_global_assignment} {
+    proc $command {args} {}
+}
+
+if {[info exists ::env(FAKE_SESSION_LOG)]} {
+    set file [open $::env(FAKE_SESSION_LOG) a]
+    puts $file [pid]
+    close $file
+}
+
+puts "Info: Running Quartus Prime Shell"
+flush stdout
+
+set buffer ""
+while {[gets stdin line] >= 0} {
+    append buffer $line "\n"
+    if {[info complete $buffer]} {
+        uplevel #0 $buffer
+        set buffer ""
+    }
+}
@@ -0,0 +1,156 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+# Stand-in for a `vivado -mode tcl` session (started by the vivado stand-in),
+# for testing session runs with tclsh. It reads Tcl commands from stdin like
+# Vivado does, and defines the Vivado commands that vivado_flow.tcl uses: the
+# "design" is the list of generics it was synthesized with, the checkpoints
+# store it, and the delay (and so fMax) and utilization grow with the numeric
+# generics.
+#
+# For tests, FAKE_FAIL_STAGE (synth, impl, all, or any) makes synthesis (or
+# opening the checkpoint for an implementation run) fail for the runs whose
+# parameters (e.g., "WIDTH 16") contain FAKE_FAIL, and FAKE_SESSION_CRASH makes
+# the session exit in the middle of synthesizing the runs whose parameters
+# contain it. Each synthesis takes FAKE_SESSION_DELAY seconds, and each session
+# appends its process ID to FAKE_SESSION_LOG.
+
+set ::design ""
+set ::generics {}
+
+proc fake_parameters {} {
+    set pairs {}
+    foreach g $::generics {
+        lappend pairs [join $g " "]
+    }
+    return [join $pairs " "]
+}
+
+proc fake_check {stage} {
+    if {[info exists ::env(FAKE_SESSION_CRASH)] && [string first $::env(FAKE_SESSION_CRASH) [fake_parameters]] >= 0} {
+        exit 1
+    }
+    if {![info exists ::env(FAKE_FAIL_STAGE)]} {
+        return
+    }
+    if {$::env(FAKE_FAIL_STAGE) ne $stage && $::env(FAKE_FAIL_STAGE) ne "any"} {
+        return
+    }
+    if {![info exists ::env(FAKE_FAIL)] || [string first $::env(FAKE_FAIL) [fake_parameters]] >= 0} {
+        error "\[Common 17-69\] Command failed: fake $stage failure"
+    }
+}
+
+proc synth_design {args} {
+    set ::generics {}
+    foreach {option value} $args {
+        if {$option eq "-generic"} {
+            lappend ::generics [split $value =]
+        }
+    }
+    if {[info exists ::env(FAKE_SESSION_DELAY)]} {
+        after [expr {int($::env(FAKE_SESSION_DELAY) * 1000)}]
+    }
+    fake_check $::stage
+    set ::design synth
+}
+
+proc open_checkpoint {path} {
+    set file [open $path]
+    set ::generics [string trim [read $file]]
+    close $file
+    fake_check $::stage
+    set ::design impl
+}
+
+proc write_checkpoint {args} {
+    set file [open [lindex $args end] w]
+    puts $file $::generics
+    close $file
+}
+
+proc write_verilog {args} {
+    # Parameters named IGNORED* don't change the netlist
+    set file [open [lindex $args end] w]
+    puts $file "module top();"
+    foreach g $::generics {
+        if {![string match IGNORED* [lindex $g 0]]} {
+            puts $file [join $g " "]
+        }
+    }
+    puts $file "endmodule"
+    close $file
+}
+
+proc close_design {} {
+    if {$::design eq ""} {
+        error "\[Common 17-53\] User Exception: No open design."
+    }
+    set ::design ""
+}
+
+proc fake_delay {} {
+    set size 0
+    foreach g $::generics {
+        if {[string is integer -strict [lindex $g 1]]} {
+            incr size [lindex $g 1]
+        }
+    }
+    return [expr {1.0 + $size / 100.0}]
+}
+
+proc get_timing_paths {args} {
+    return {path}
+}
+
+proc get_property {property object} {
+    return [expr {$::clock_period - [fake_delay]}]
+}
+
+proc get_utilization {} {
+    set size [expr {int(([fake_delay] - 1.0) * 100)}]
+    return "LUT:[expr {3 * $size + 12}]:53200 FF:$size:106400 BRAM:0:140 DSP:0:220 IO:4:200"
+}
+
+foreach command {
+    read_verilog read_xdc set_param opt_design place_design phys_opt_design route_design
+    report_methodology report_timing_summary report_utilization report_clock_utilization
+    report_route_status report_power report_drc report_design_analysis report_timing
+} {
+    proc $command {args} {}
+}
+
+if {[info exists ::env(FAKE_SESSION_LOG)]} {
+    set file [open $::env(FAKE_SESSION_LOG) a]
+    puts $file [pid]
+    close $file
+}
+
+puts "****** Vivado v2023.2 (64-bit)"
+flush stdout
+
+set buffer ""
+while {[gets stdin line] >= 0} {
+    append buffer $line "\n"
+    if {[info complete $buffer]} {
+        uplevel #0 $buffer
+        set buffer ""
+    }
+}
@@ -1,12 +1,16 @@
-from openflex import main, config
-import sys
-import math
+from openflex import config
 import random
 import pathlib
 
 
-def generate_count():
-    count = random.randint(1e3, 1e7)
+def generate_count(combination, kwargs):
+    # Called with each combination (and the keyword arguments given to
+    # add_parameter), returns the values of the new parameter. Combinations are
+    # generated lazily, so this is called again every time they are iterated (or
+    # sampled), and must return the same values for the same combination: the
+    # random count is seeded with the combination.
+    rng = random.Random(str(sorted(combination.items())))
+    count = rng.randint(1000, 10000000)
 
     params = []
     params.append(count)
@@ -18,34 +22,16 @@ if __name__ == "__main__":
     dut = config.FlexConfig("./blinky_synth.yml")
     dut.add_parameter("COUNT", generate_count)
 
-    mode = dut.config["mode"]
-    tool = dut.config["tool"]
-
     clk_period = 2
 
     sample = None
 
     synth_csv = pathlib.Path("blinky.csv")
 
-    # TODO: replace the rest of this code with
-    # an integrated "dut.run()" or similar
-
     if sample:
         dut.sample(sample)
 
-    if mode == "sim":
-        if tool == "questa":
-            dut.questa_sim()
-        else:
-            sys.exit("ERROR: Invalid simulator.")
-    elif mode == "synth":
-        if not synth_csv:
-            sys.exit("ERROR: Missing CSV filename")
-        if tool == "vivado":
-            dut.vivado_synth(synth_csv)
-        elif tool == "quartus":
-            dut.quartus_synth(synth_csv)
-        else:
-            sys.exit("ERROR: Invalid synthesis tool.")
-    else:
-        sys.exit("ERROR: Invalid mode.")
+    # Runs the mode and tool of the YAML file, and prints each result as soon as
+    # its combination finishes
+    for result in dut.run(csv_filename=synth_csv, clk_period=clk_period):
+        print(result.parameters, result.metrics)
@@ -0,0 +1,215 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import shutil
+import fnmatch
+import tarfile
+import threading
+import subprocess
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# What is kept of a combination's build directory once it finishes:
+#   keep-all        - everything (default)
+#   keep-on-failure - everything for failed runs, nothing for successful ones
+#   metrics-only    - only the reports that results are read from (and the
+#                     profile), plus any "keep" patterns
+#   archive         - everything, as a zstd-compressed tar archive
+RETENTION = ["keep-all", "keep-on-failure", "metrics-only", "archive"]
+
+# Files kept by metrics-only (fnmatch patterns)
+METRICS_FILES = [
+    "openflex_profile.json",
+    "*_report.txt",
+    "*.summary",
+    "yosys_stat.json",
+    "yosys_ltp.txt",
+    "nextpnr_report.json",
+]
+
+ARCHIVE_EXTENSION = ".tar.zst"
+ZSTD_LEVEL = 3
+
+
+def directory_size(directory):
+    # Total size (bytes) of the files in a directory tree
+    size = 0
+    for root, _, files in os.walk(directory):
+        for f in files:
+            try:
+                size += os.lstat(os.path.join(root, f)).st_size
+            except OSError:
+                pass
+
+    return size
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def archive_directory(directory, archive_file):
+    # Writes a zstd-compressed tar archive of a directory, with the zstandard
+    # package or, without it, the zstd command
+    name = os.path.basename(os.path.normpath(directory))
+    temp_file = archive_file + ".tmp"
+
+    if zstandard is not None:
+        with open(temp_file, "wb") as file:
+            with zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(file) as writer:
+                with tarfile.open(fileobj=writer, mode="w|") as tar:
+                    tar.add(directory, arcname=name)
+    else:
+        process = subprocess.Popen(
+            ["zstd", "-q", "-f", f"-{ZSTD_LEVEL}", "-o", temp_file], stdin=subprocess.PIPE
+        )
+        try:
+            with tarfile.open(fileobj=process.stdin, mode="w|") as tar:
+                tar.add(directory, arcname=name)
+        finally:
+            process.stdin.close()
+        if process.wait() != 0:
+            raise OSError(f"zstd failed to write {archive_file}")
+
+    os.replace(temp_file, archive_file)
+
+
+class ArtifactPolicy:
+    # Applies the retention policy to each combination's build directory once the
+    # combination finishes. With a scratch path (e.g., a tmpfs or a node-local
+    # disk), builds run there, and only the retained artifacts are moved to the
+    # build directories in the working directory. Counts the bytes produced and
+    # retained, to show how much I/O the policy saved.
+
+    def __init__(self, retention="keep-all", scratch=None, keep=()) -> None:
+        if retention not in RETENTION:
+            raise ValueError(
+                f"Unknown artifact retention '{retention}' (expected {', '.join(RETENTION)})."
+            )
+        if retention == "archive" and zstandard is None and shutil.which("zstd") is None:
+            raise ValueError("Archiving artifacts needs the zstandard package or the zstd command.")
+
+        self.retention = retention
+        self.scratch = scratch
+        self.keep = list(keep)
+        self.lock = threading.Lock()
+        self.produced = 0
+        self.retained = 0
+        self.count = 0
+
+        # Each process builds in its own scratch directory, so that concurrent
+        # sweeps (or cluster tasks on the same node) never share builds
+        self.root = os.path.join(scratch, f"openflex_{os.getpid()}") if scratch else ""
+
+    @classmethod
+    def from_config(cls, config):
+        config = dict(config or {})
+        keep = config.get("keep", [])
+        return cls(
+            config.get("retention", "keep-all"),
+            config.get("scratch"),
+            [keep] if isinstance(keep, str) else keep,
+        )
+
+    def to_config(self):
+        config = {"retention": self.retention, "keep": self.keep}
+        if self.scratch:
+            config["scratch"] = self.scratch
+        return config
+
+    def _prune(self, directory):
+        # Removes everything but the metrics files (and empty directories)
+        patterns = METRICS_FILES + self.keep
+        for root, dirs, files in os.walk(directory, topdown=False):
+            for f in files:
+                if not any(fnmatch.fnmatch(f, pattern) for pattern in patterns):
+                    os.remove(os.path.join(root, f))
+            for d in dirs:
+                path = os.path.join(root, d)
+                if os.path.isdir(path) and not os.path.islink(path) and not os.listdir(path):
+                    os.rmdir(path)
+
+    def finalize(self, build_dir, failed=False):
+        # Applies the policy to a finished combination's build directory (a path
+        # relative to the build root, e.g., build_vivado/<name>)
+        if self.retention == "keep-all" and not self.scratch:
+            return
+
+        source = os.path.join(self.root, build_dir)
+        if not os.path.isdir(source):
+            return
+
+        produced = directory_size(source)
+        retention = self.retention
+        if retention == "keep-on-failure":
+            retention = "keep-all" if failed else None
+
+        # The artifacts of an earlier run of the combination are replaced
+        if self.scratch:
+            shutil.rmtree(build_dir, ignore_errors=True)
+        parent = os.path.dirname(build_dir)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+        if retention == "archive":
+            archive_directory(source, build_dir + ARCHIVE_EXTENSION)
+            shutil.rmtree(source)
+            retained = os.path.getsize(build_dir + ARCHIVE_EXTENSION)
+        elif retention is None:
+            shutil.rmtree(source)
+            retained = 0
+        else:
+            if retention == "metrics-only":
+                self._prune(source)
+            if self.scratch:
+                shutil.move(source, build_dir)
+            retained = directory_size(build_dir)
+
+        with self.lock:
+            self.produced += produced
+            self.retained += retained
+            self.count += 1
+
+    def summary(self):
+        # Prints (and resets) the bytes produced and retained since the last
+        # summary, and removes the scratch directory
+        if self.root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+        with self.lock:
+            if not self.count:
+                return
+            produced, retained, count = self.produced, self.retained, self.count
+            self.produced = self.retained = self.count = 0
+
+        saved = produced - retained
+        percent = 100.0 * saved / produced if produced else 0.0
+        where = f" (built in {self.scratch})" if self.scratch else ""
+        print(
+            f"Artifacts ({self.retention}): {count} builds, {format_size(produced)} produced{where},"
+            + f" {format_size(retained)} retained, {format_size(saved)} ({percent:.0f}%) saved"
+        )
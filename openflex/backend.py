@@ -0,0 +1,258 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import sys
+import json
+import time
+import shlex
+import itertools
+import subprocess
+
+import yaml
+
+BACKENDS = ["local", "slurm"]
+
+# Slurm's default MaxArraySize: array task IDs must be below it, so larger jobs
+# are submitted as several arrays
+MAX_ARRAY_SIZE = 1001
+
+# Consecutive squeue failures (other than for a job that is no longer known)
+# that are retried before giving up
+SQUEUE_RETRIES = 5
+
+
+def backend_from_config(config):
+    # Creates the backend of a "backend:" YAML section (None runs locally)
+    if not config:
+        return None
+
+    if isinstance(config, str):
+        config = {"type": config}
+
+    kind = config.get("type", "local")
+    if kind == "local":
+        return None
+    if kind == "slurm":
+        return SlurmBackend(
+            shared_dir=config.get("shared_dir"),
+            batch_size=int(config.get("batch_size", 1)),
+            jobs=int(config.get("jobs", 1)),
+            poll=float(config.get("poll", 10)),
+            max_array_size=int(config.get("max_array_size", MAX_ARRAY_SIZE)),
+            sbatch_args=config.get("sbatch_args", []),
+            sbatch=config.get("sbatch", "sbatch"),
+            squeue=config.get("squeue", "squeue"),
+        )
+
+    raise ValueError(f"Unknown backend '{kind}' (expected one of {', '.join(BACKENDS)}).")
+
+
+def write_json(filename, data):
+    # Written to a temporary file first, so that readers on other nodes never see
+    # a partial file
+    tmp = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp, filename)
+
+
+class SlurmBackend:
+    # Runs a sweep as a Slurm array job. The combinations are split into tasks of
+    # batch_size combinations, and every task runs `python -m openflex.worker` on a
+    # cluster node, which runs its combinations (jobs at a time) like a local
+    # sweep and writes the results to the job directory. The results are
+    # collected from there as tasks complete. Jobs with more tasks than the
+    # cluster's MaxArraySize are submitted as several arrays.
+    #
+    # The job directory and the build directories are placed in shared_dir (the
+    # current directory by default), which must be on a filesystem shared by the
+    # cluster nodes, as must the RTL files and the Python environment.
+
+    def __init__(
+        self,
+        shared_dir=None,
+        batch_size=1,
+        jobs=1,
+        poll=10.0,
+        max_array_size=MAX_ARRAY_SIZE,
+        sbatch_args=None,
+        sbatch="sbatch",
+        squeue="squeue",
+    ) -> None:
+        self.shared_dir = os.path.abspath(shared_dir or os.getcwd())
+        self.batch_size = max(1, batch_size)
+        self.jobs = jobs
+        self.poll = poll
+        self.max_array_size = max(1, max_array_size)
+        self.sbatch_args = sbatch_args or []
+        if isinstance(self.sbatch_args, str):
+            self.sbatch_args = shlex.split(self.sbatch_args)
+        self.sbatch = sbatch
+        self.squeue = squeue
+
+    def _write_job(self, dut, tool, options):
+        job_dir = os.path.join(
+            self.shared_dir,
+            "openflex_jobs",
+            f"{tool}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}",
+        )
+        os.makedirs(os.path.join(job_dir, "tasks"))
+
+        # The workers load the same configuration, with absolute file paths, and
+        # run locally.
+        config = dict(dut.config)
+        config["files"] = dut.files
+        config.pop("backend", None)
+        if dut.prune:
+            config["prune"] = dut.prune
+        config["dedup"] = "true" if dut.dedup else "false"
+        config["artifacts"] = dut.artifacts.to_config()
+        with open(os.path.join(job_dir, "config.yml"), "w") as file:
+            yaml.safe_dump(config, file)
+
+        job = {
+            "tool": tool,
+            "options": options,
+            "jobs": self.jobs,
+            "build_dir": self.shared_dir,
+            "cache_dir": dut.cache.cache_dir if dut.cache is not None else None,
+            "threads": dut.threads,
+            "licenses": dut.licenses,
+            # The workers' results databases are empty, so pruning starts from the
+            # results this process found
+            "prune_results": dut._prune_seed,
+        }
+        write_json(os.path.join(job_dir, "job.json"), job)
+
+        # The longest combinations are placed in the first tasks, which Slurm
+        # starts first.
+        scheduled = (c for c, _, _ in dut._schedule(tool))
+        tasks = 0
+        while True:
+            batch = list(itertools.islice(scheduled, self.batch_size))
+            if not batch:
+                break
+            write_json(os.path.join(job_dir, "tasks", f"{tasks}.json"), batch)
+            tasks += 1
+
+        return job_dir, tasks
+
+    def _submit(self, dut, job_dir, tasks):
+        # Submits arrays of at most max_array_size tasks, and returns their job IDs.
+        # Each array's task IDs start at 0, so the script is given the index of
+        # its first task.
+        script = os.path.join(job_dir, "openflex.sbatch")
+        with open(script, "w") as file:
+            file.write("#!/bin/sh\n")
+            file.write("task=$((SLURM_ARRAY_TASK_ID + ${1:-0}))\n")
+            file.write(f"cd {shlex.quote(self.shared_dir)}\n")
+            file.write(
+                f"exec {shlex.quote(sys.executable)} -m openflex.worker "
+                + f'{shlex.quote(job_dir)} $task > {shlex.quote(job_dir)}/"task_$task.log" 2>&1\n'
+            )
+
+        job_ids = []
+        for start in range(0, tasks, self.max_array_size):
+            size = min(self.max_array_size, tasks - start)
+            cmd = [
+                self.sbatch,
+                "--parsable",
+                f"--array=0-{size - 1}",
+                f"--job-name=openflex_{dut.config['top']}",
+                f"--output={os.path.join(job_dir, 'slurm_%A_%a.log')}",
+                f"--chdir={self.shared_dir}",
+            ]
+            cmd += self.sbatch_args + [script, str(start)]
+
+            ret = subprocess.run(cmd, stdout=subprocess.PIPE, universal_newlines=True)
+            if ret.returncode != 0:
+                if job_ids:
+                    print(f"Cancel the jobs that were submitted with: scancel {' '.join(job_ids)}")
+                sys.exit(f"ERROR: Job submission failed: {' '.join(cmd)}")
+
+            # --parsable prints "<job id>[;<cluster>]"
+            job_ids.append(ret.stdout.strip().split(";")[0])
+
+        return job_ids
+
+    def _queued(self, job_id):
+        # True while any task of the job is pending or running, and False once
+        # squeue no longer knows the job, which means it has finished. Other
+        # squeue failures (e.g., a timeout of a busy controller) are retried.
+        for attempt in range(SQUEUE_RETRIES + 1):
+            ret = subprocess.run(
+                [self.squeue, "-h", "-j", job_id, "-o", "%i"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+            )
+            if ret.returncode == 0:
+                return ret.stdout.strip() != ""
+            if "invalid job id" in ret.stderr.lower():
+                return False
+
+            print(f"WARNING: squeue failed for job {job_id}: {ret.stderr.strip()}")
+            if attempt < SQUEUE_RETRIES:
+                time.sleep(self.poll)
+
+        sys.exit(f"ERROR: squeue failed {SQUEUE_RETRIES + 1} times for job {job_id}.")
+
+    def sweep(self, dut, tool, options, local_sweep):
+        job_dir, tasks = self._write_job(dut, tool, options)
+        if tasks == 0:
+            return
+
+        job_ids = self._submit(dut, job_dir, tasks)
+        print(f"Submitted job {', '.join(job_ids)} ({tasks} tasks), job directory: {job_dir}")
+
+        collected = set()
+        while True:
+            job_ids = [j for j in job_ids if self._queued(j)]
+
+            # Results are yielded as each task completes
+            for task in range(tasks):
+                results_file = os.path.join(job_dir, f"results_{task}.json")
+                if task not in collected and os.path.exists(results_file):
+                    collected.add(task)
+                    with open(results_file, "r") as file:
+                        for key, row, metrics in json.load(file):
+                            yield key, row, metrics
+
+            if not job_ids or len(collected) == tasks:
+                break
+            time.sleep(self.poll)
+
+        failed = [t for t in range(tasks) if t not in collected]
+        if failed:
+            print(f"ERROR: {len(failed)} of {tasks} tasks failed:")
+            for t in failed:
+                print(os.path.join(job_dir, f"task_{t}.log"))
+
+
+class TaskResults:
+    # Backend of one cluster task: the sweep runs locally, and its results are
+    # written to the job directory for the submitting process to collect.
+
+    def __init__(self, results_file) -> None:
+        self.results_file = results_file
+
+    def sweep(self, dut, tool, options, local_sweep):
+        write_json(self.results_file, [list(row) for row in local_sweep()])
+        return []
@@ -0,0 +1,161 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+
+
+def default_cache_dir():
+    if "OPENFLEX_CACHE_DIR" in os.environ:
+        return os.environ["OPENFLEX_CACHE_DIR"]
+
+    xdg_cache = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(xdg_cache, "openflex")
+
+
+def hash_inputs(*items):
+    # Content-addressed key: the caller passes everything that can change a run's
+    # results (file contents, flow scripts, parameters, device, etc.).
+    h = hashlib.sha256()
+    for item in items:
+        if isinstance(item, bytes):
+            h.update(item)
+        else:
+            h.update(json.dumps(item, sort_keys=True).encode())
+        h.update(b"\0")
+
+    return h.hexdigest()
+
+
+def hash_files(file_names):
+    h = hashlib.sha256()
+    for f in file_names:
+        h.update(os.path.basename(f).encode())
+        h.update(b"\0")
+        with open(f, "rb") as file:
+            h.update(file.read())
+        h.update(b"\0")
+
+    return h.hexdigest()
+
+
+def hash_netlist(file_name):
+    # Hash of a netlist (Verilog or VQM) that ignores comments (which contain
+    # dates, tool versions, and paths), attributes, and whitespace, so that
+    # combinations that synthesize to the same hardware get the same hash.
+    with open(file_name, "r", errors="replace") as file:
+        text = file.read()
+
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\(\*.*?\*\)", "", text, flags=re.S)
+    text = re.sub(r"//[^\n]*", "", text)
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()
+
+
+class ResultCache:
+    # Persistent on-disk cache of tool results. Each entry is a small JSON file
+    # named after the hash of the run's inputs. Entries are written atomically as
+    # soon as a run completes, so an interrupted sweep resumes where it stopped.
+
+    def __init__(self, cache_dir=None, max_size_mb=256, max_age_days=90) -> None:
+        self.cache_dir = cache_dir if cache_dir else default_cache_dir()
+        self.max_size_mb = max_size_mb
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key, entry=False):
+        # Returns the metrics, or the whole entry (with its info) if entry is set
+        path = self._path(key)
+        try:
+            with open(path, "r") as file:
+                stored = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+
+        # Refresh the modification time so that eviction is least-recently-used
+        os.utime(path)
+        self.hits += 1
+        return stored if entry else stored["metrics"]
+
+    def put(self, key, metrics, **info):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entry = {"metrics": metrics, "time": time.time()}
+        entry.update(info)
+
+        # Write to a temporary file and rename so readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for f in files:
+                path = os.path.join(root, f)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        removed = 0
+        now = time.time()
+
+        # Remove entries that haven't been used within the maximum age
+        if self.max_age_days is not None:
+            cutoff = now - float(self.max_age_days) * 86400
+            for e in [e for e in entries if e[0] < cutoff]:
+                entries.remove(e)
+                removed += self._remove(e[2])
+
+        # Remove least-recently-used entries until the cache fits within its size
+        if self.max_size_mb is not None:
+            max_size = float(self.max_size_mb) * 1024 * 1024
+            total_size = sum(e[1] for e in entries)
+            entries.sort()
+            while entries and total_size > max_size:
+                mtime, size, path = entries.pop(0)
+                total_size -= size
+                removed += self._remove(path)
+
+        return removed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def clear(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for f in files:
+                self._remove(os.path.join(root, f))
@@ -0,0 +1,383 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import math
+import random
+import itertools
+
+from .constraints import CHUNK_SIZE, Constraints, from_value, numpy, to_value, value_array
+
+# Parameter spaces of up to this many points are sampled from the list of all of
+# their combinations
+SAMPLE_ENUMERATE = 1000
+
+
+def random_indices(size, rng=random):
+    # Yields every index in [0, size) exactly once, in random order, without
+    # materializing the range while only a small fraction has been drawn.
+    seen = set()
+    while 2 * len(seen) < size:
+        i = rng.randrange(size)
+        if i not in seen:
+            seen.add(i)
+            yield i
+
+    remaining = [i for i in range(size) if i not in seen]
+    rng.shuffle(remaining)
+    yield from remaining
+
+
+def mixed_radix(index, sizes):
+    # The digits of an array of indices into the product of sizes, with the last
+    # digit varying fastest (the same order as itertools.product)
+    digits = []
+    for n in reversed(sizes):
+        index, digit = numpy.divmod(index, n)
+        digits.append(digit)
+
+    return digits[::-1]
+
+
+class Combinations:
+    # Lazy view of the parameter combinations. The space is the Cartesian product
+    # of the parameter values, repeated once per segment (the base combinations plus
+    # one copy per subset group), with each segment's overrides applied. The YAML
+    # constraints and derived parameters (see constraints.py) are applied first,
+    # to blocks of combinations at once when NumPy is available. Filters and
+    # added parameters are stages that are applied while iterating, so no list of
+    # combinations is ever built. Their functions run again every time the
+    # combinations are iterated, counted, or sampled, so they must be
+    # deterministic: the same combination always gives the same result.
+
+    def __init__(
+        self, names=(), values=(), segments=({},), points=None, stages=(), constraints=None
+    ) -> None:
+        self.names = list(names)
+        self.values = [list(v) for v in values]
+        self.segments = list(segments)
+        self.points = points
+        self.stages = list(stages)
+        self.constraints = constraints
+
+    @classmethod
+    def from_list(cls, points):
+        return cls(points=[dict(p) for p in points])
+
+    @classmethod
+    def from_config(cls, config):
+        names = []
+        values = []
+        if "parameters" in config:
+            names = list(config["parameters"].keys())
+            values = list(config["parameters"].values())
+
+        # Without any parameters there are no base combinations
+        has_base = "parameters" in config
+
+        # Mutually exclusive groups extend the base combinations, while each subset
+        # group adds a copy of the combinations (as extended so far) with its
+        # values overridden.
+        base = {}
+        segments = []
+        for g in config.get("groups", []):
+            intersection = set(g.keys()).intersection(set(names).union(base.keys()))
+
+            # If the current group is mutually exclusive to the existing parameters.
+            if not intersection:
+                base.update(g)
+                has_base = True
+
+            # If the current group is a subset of the existing parameters.
+            elif intersection == set(g.keys()):
+                s = dict(base)
+                s.update(g)
+                segments.append(s)
+            else:
+                raise ValueError(
+                    "Parameter group must either be a subset of the existing parameters, or mutually exclusive."
+                )
+
+        if not has_base:
+            return cls(points=[])
+
+        constraints = Constraints.from_config(config)
+        if constraints is not None:
+            constraints.check(set(names).union(base, *segments))
+
+        return cls(names, values, [base] + segments, constraints=constraints)
+
+    def product_size(self):
+        if self.points is not None:
+            return len(self.points)
+
+        size = len(self.segments)
+        for v in self.values:
+            size *= len(v)
+
+        return size
+
+    def point(self, index):
+        # Decodes an index into a combination using mixed-radix arithmetic, with
+        # the last parameter varying fastest (the same order as itertools.product).
+        if self.points is not None:
+            return dict(self.points[index])
+
+        if index < 0:
+            index += self.product_size()
+        if not 0 <= index < self.product_size():
+            raise IndexError("combination index out of range")
+
+        digits = []
+        for v in reversed(self.values):
+            index, digit = divmod(index, len(v))
+            digits.append(v[digit])
+
+        p = dict(zip(self.names, reversed(digits)))
+        p.update(self.segments[index])
+        return p
+
+    def _base(self):
+        if self.points is not None:
+            for p in self.points:
+                yield dict(p)
+            return
+
+        for s in self.segments:
+            for v in itertools.product(*self.values):
+                p = dict(zip(self.names, v))
+                p.update(s)
+                yield p
+
+    def _vectorized(self):
+        return self.points is None and self.constraints is not None and numpy is not None
+
+    def _blocks(self):
+        # Checks the constraints for blocks of about CHUNK_SIZE combinations at a
+        # time. Within a block, the last parameters (at least one) vary along one
+        # axis and the others along the other axis, so the parameter columns are
+        # broadcast instead of being built for every combination. Yields the
+        # segment, the value indices of each parameter (broadcastable to the
+        # block), the mask of the combinations that satisfy the constraints, and
+        # the derived parameters.
+        arrays = [value_array(v) for v in self.values]
+        sizes = [len(v) for v in self.values]
+
+        split = len(sizes)
+        inner = 1
+        while split > 0 and (split == len(sizes) or inner * sizes[split - 1] <= CHUNK_SIZE):
+            split -= 1
+            inner *= sizes[split]
+        outer = math.prod(sizes[:split])
+        rows = max(1, CHUNK_SIZE // inner)
+
+        inner_digits = [d[None, :] for d in mixed_radix(numpy.arange(inner), sizes[split:])]
+        for s in self.segments:
+            overrides = {k: to_value(v) for k, v in s.items()}
+            for start in range(0, outer, rows):
+                index = numpy.arange(start, min(start + rows, outer))
+                digits = [d[:, None] for d in mixed_radix(index, sizes[:split])] + inner_digits
+
+                columns = {n: a[d] for n, a, d in zip(self.names, arrays, digits)}
+                columns.update(overrides)
+                mask, derived = self.constraints.evaluate(columns, (len(index), inner))
+                yield s, digits, mask, derived
+
+    def _constrained(self):
+        # The base combinations that satisfy the constraints, with the derived
+        # parameters. Only the combinations that pass are built as dicts.
+        if self.constraints is None:
+            yield from self._base()
+            return
+        if not self._vectorized():
+            yield from self.constraints.apply(self._base())
+            return
+
+        names = self.constraints.names()
+        for s, digits, mask, derived in self._blocks():
+            count = int(mask.sum())
+            columns = [
+                [v[i] for i in numpy.broadcast_to(d, mask.shape)[mask].tolist()]
+                for v, d in zip(self.values, digits)
+            ]
+            derived = [[from_value(x) for x in d[mask].tolist()] for d in derived.values()]
+
+            rows = zip(*columns) if columns else itertools.repeat((), count)
+            for row, values in zip(rows, zip(*derived) if derived else itertools.repeat(())):
+                p = dict(zip(self.names, row))
+                p.update(s)
+                p.update(zip(names, values))
+                yield p
+
+    def _stages(self, points):
+        for stage in self.stages:
+            points = stage(points)
+
+        return points
+
+    def _expand(self, points):
+        # Runs base combinations (e.g., from point()) through the constraints and
+        # the stages
+        if self.constraints is not None:
+            points = self.constraints.apply(points)
+
+        return self._stages(points)
+
+    def __iter__(self):
+        return iter(self._stages(self._constrained()))
+
+    def __len__(self):
+        if not self.stages:
+            if self.constraints is None:
+                return self.product_size()
+            if self._vectorized():
+                return sum(int(mask.sum()) for _, _, mask, _ in self._blocks())
+
+        return sum(1 for _ in self)
+
+    def __bool__(self):
+        for _ in self:
+            return True
+
+        return False
+
+    def __getitem__(self, index):
+        if not self.stages and self.constraints is None:
+            return self.point(index)
+
+        if index < 0:
+            return list(self)[index]
+
+        try:
+            return next(itertools.islice(self, index, None))
+        except StopIteration:
+            raise IndexError("combination index out of range")
+
+    def __repr__(self):
+        return f"Combinations({list(itertools.islice(self, 10))}{'...' if self.product_size() > 10 else ''})"
+
+    def _with_stage(self, stage):
+        return Combinations(
+            self.names,
+            self.values,
+            self.segments,
+            self.points,
+            self.stages + [stage],
+            self.constraints,
+        )
+
+    def filter(self, f):
+        def stage(points):
+            return filter(f, points)
+
+        return self._with_stage(stage)
+
+    def add_parameter(self, name, func, kwargs):
+        def stage(points):
+            for c in points:
+                for v in func(c, kwargs):
+                    d = dict(c)
+                    d[name] = v
+                    yield d
+
+        return self._with_stage(stage)
+
+    def sample(self, n, rng=random):
+        # A random sample of n combinations (after the constraints and the stages),
+        # which raises ValueError like random.sample() if there are fewer than n.
+        # Spaces of up to SAMPLE_ENUMERATE points are sampled exactly, as
+        # random.sample(list(self), n).
+        #
+        # Larger spaces are sampled without building the list. Points of the
+        # product space are drawn at random and expanded through the stages, and
+        # a draw picks slot s < most of its point, where most is the largest
+        # number of combinations a point has expanded to so far. The draw is kept
+        # if the point has a combination s (that isn't already sampled), and when
+        # a point expands to more than most, the samples so far are thinned to
+        # what they would have been with the larger bound. This is uniform over
+        # the combinations once most is the largest number of expansions, e.g.,
+        # with filters, or when add_parameter() always adds the same number of
+        # values. Otherwise, the combinations of points that expand to more than
+        # the points drawn first are less likely. Once half of the points have
+        # been expanded, the rest are too, and the remaining combinations are
+        # sampled directly.
+        n = int(n)
+        size = self.product_size()
+        if size <= SAMPLE_ENUMERATE or n < 0:
+            return Combinations.from_list(rng.sample(list(self), n))
+
+        # The points drawn so far, the number of combinations of those that don't
+        # expand to exactly one, and the combinations of those that expand to
+        # several. Combination s of point i is sampled as key i + s * size. Until
+        # a point expands to several, each point is sampled when it is first
+        # drawn, so the set of sampled keys is only needed after that.
+        drawn = set()
+        counts = {}
+        several = {}
+        keys = []
+        taken = None
+        samples = []
+        most = 1
+        while len(samples) < n and 2 * len(drawn) < size:
+            i = rng.randrange(size)
+            new = i not in drawn
+            if new:
+                drawn.add(i)
+                candidates = list(self._expand([self.point(i)]))
+                if len(candidates) != 1:
+                    counts[i] = len(candidates)
+                if len(candidates) > 1:
+                    several[i] = candidates
+                if len(candidates) > most:
+                    keep = [rng.random() < most / len(candidates) for _ in samples]
+                    keys = list(itertools.compress(keys, keep))
+                    samples = list(itertools.compress(samples, keep))
+                    taken = set(keys)
+                    most = len(candidates)
+            else:
+                candidates = several.get(i)
+
+            s = rng.randrange(most) if most > 1 else 0
+            key = i + s * size if s else i
+            if s >= counts.get(i, 1) or (not new if taken is None else key in taken):
+                continue
+
+            if candidates is None:
+                candidates = list(self._expand([self.point(i)]))
+            keys.append(key)
+            samples.append(candidates[s])
+            if taken is not None:
+                taken.add(key)
+
+        if len(samples) < n:
+            taken = set(keys)
+            remaining = []
+            for i in range(size):
+                if i in drawn:
+                    count = counts.get(i, 1)
+                else:
+                    count = sum(1 for _ in self._expand([self.point(i)]))
+                remaining.extend(i + s * size for s in range(count) if i + s * size not in taken)
+
+            if len(samples) + len(remaining) < n:
+                raise ValueError("Sample larger than population or is negative")
+            for key in rng.sample(remaining, n - len(samples)):
+                s, i = divmod(key, size)
+                samples.append(list(self._expand([self.point(i)]))[s])
+
+        return Combinations.from_list(samples)
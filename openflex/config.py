@@ -19,15 +19,47 @@
 
 
 import os
+import re
+import json
 import sys
-import copy
-import random
+import shutil
+import hashlib
 import pathlib
 import itertools
-import subprocess
-import csv
+import threading
+import concurrent.futures
 import yaml
 
+from .combinations import Combinations
+from .cache import ResultCache, hash_files, hash_inputs, hash_netlist
+from .session import SessionPool
+from .results import CsvWriter, ResultsDB
+from .profile import PROFILE_FILE, ProcessMonitor, run_monitored, record_profile
+from .profile import terminate_process_tree
+from .backend import backend_from_config
+from .explore import Explorer
+from .prune import Pruner, synth_columns
+from .scheduler import RuntimePredictor, schedule, total_memory_mb
+from .watch import DependencyMap, FileWatcher, print_summary
+from .stream import ResultStream, AsyncResultStream
+from .artifacts import ArtifactPolicy
+from .profile import load_profile, profile_metrics, profile_summary, print_profile_summary
+
+# Post-synthesis netlists, relative to a synthesis build directory
+VIVADO_NETLIST = os.path.join("outputs", "post_synth_netlist.v")
+QUARTUS_NETLIST = "openflex_netlist.vqm"
+YOSYS_NETLIST = "openflex_netlist.v"
+
+# Families of the open-source flow that nextpnr can place and route
+# (nextpnr-<family>). Yosys synthesizes them with synth_<family>.
+NEXTPNR_FAMILIES = ["ice40", "ecp5", "gowin", "nexus"]
+
+# Commands that start a tool in Tcl (stdin-driven) mode for session runs
+SESSION_COMMANDS = {
+    "vivado": ["vivado", "-mode", "tcl", "-nojournal", "-nolog"],
+    "quartus": ["quartus_sh", "-s"],
+}
+
 
 class FlexConfig:
     def __init__(self, config_file) -> None:
@@ -41,46 +73,71 @@ class FlexConfig:
         self.files = [os.path.abspath(f) for f in self.config["files"]]
         self.parameters = self.config["parameters"]
 
-        # Gather combinations of parameters (Cartesian product)
-        param_names = []
-        param_combinations = []
-
-        if "parameters" in self.config:
-            param_dict = self.config["parameters"]
-            param_names = list(param_dict.keys())
-            value_combinations = list(itertools.product(*param_dict.values()))
-            param_combinations = [dict(zip(param_names, v)) for v in value_combinations]
-
-        if "groups" in self.config:
-            group_params = []
-
-            for g in self.config["groups"]:
-                intersection = set(g.keys()).intersection(set(param_names))
-
-                # If the current group is mutually exclusive to the existing parameters.
-                if not intersection:
-                    param_names.extend(g.keys())
-                    if not param_combinations:
-                        param_combinations = g
-                    for p in param_combinations:
-                        p.update(g)
-
-                # If the current group is a subset of the existing parameters.
-                elif intersection == set(g.keys()):
-                    param_combinations2 = copy.deepcopy(param_combinations)
-                    for p in param_combinations2:
-                        p.update(g)
-
-                    group_params.append(param_combinations2)
-                else:
-                    # fmt: off
-                    sys.exit("ERROR: Parameter group must either be a subset of the existing parameters, or mutually exclusive." )
-                    # fmt: on
-
-            for g in group_params:
-                param_combinations.extend(g)
+        # Gather combinations of parameters (Cartesian product). The combinations
+        # are generated lazily, so even very large spaces take constant memory.
+        try:
+            self.combinations = Combinations.from_config(self.config)
+        except ValueError as e:
+            sys.exit(f"ERROR: {e}")
+
+        # Persistent result cache; set to None to always re-run the tools.
+        cache_config = self.config.get("cache", {})
+        self.cache = ResultCache(
+            cache_config.get("dir"),
+            cache_config.get("max_size_mb", 256),
+            cache_config.get("max_age_days", 90),
+        )
+        self._sources_hash = None
+        self._dependencies = None
+        self._tool_slots = threading.BoundedSemaphore(1)
+
+        # Resource limits of parallel runs: the total (predicted) peak memory of
+        # concurrent jobs in MB, the number of tool licenses, and the number of
+        # threads each tool run may use (None for the tool's default).
+        resources = self.config.get("resources", {})
+        self.memory_limit = resources.get("memory_mb", total_memory_mb())
+        self.licenses = resources.get("licenses")
+        self.threads = resources.get("threads")
+
+        # Post-synthesis pruning of combinations before implementation (see prune.py).
+        # Pruning starts from the metrics in prune_results, or if None, from the
+        # earlier results of the same sources, flow, and options (see
+        # _prune_history). A cluster task gets them from the submitting process.
+        self.prune = self.config.get("prune")
+        self.prune_results = None
+        self._prune_seed = None
+
+        # Implementation results are shared by combinations whose post-synthesis
+        # netlists are identical (see _synth_sweep)
+        self.dedup = str(self.config.get("dedup", "false")).lower() in ("true", "1", "yes")
+
+        # Synthesis sweeps run locally unless a backend (e.g., a cluster) is given
+        try:
+            self.backend = backend_from_config(self.config.get("backend"))
+        except ValueError as e:
+            sys.exit(f"ERROR: {e}")
+        self._sessions = None
 
-        self.combinations = param_combinations
+        # What is kept of each combination's build directory, and where builds run
+        # (see artifacts.py)
+        try:
+            self.artifacts = ArtifactPolicy.from_config(self.config.get("artifacts"))
+        except ValueError as e:
+            sys.exit(f"ERROR: {e}")
+
+        # Running tool processes, so that a run (see run()) can be cancelled, and
+        # the time limit of each tool process in seconds (None for no limit)
+        self._processes = {}
+        self._processes_lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._on_result = None
+        self.run_timeout = None
+
+        # Results of every synthesis run are stored in a database, and optionally
+        # in CSV files (kept open during a sweep)
+        self.results_file = self.config.get("results", "openflex_results.db")
+        self._db = None
+        self._csv_writers = {}
 
         # if not "clock" in self.config:
         #    self.config["clock"] = "clk"
@@ -88,111 +145,906 @@ class FlexConfig:
         # if not "reset" in self.config:
         #    self.config["clock"] = "rst"
 
+    @property
+    def combinations(self):
+        return self._combinations
+
+    @combinations.setter
+    def combinations(self, value):
+        # Allow a plain list (or any iterable) of combinations to be assigned
+        if not isinstance(value, Combinations):
+            value = Combinations.from_list(value)
+
+        self._combinations = value
+
     def filter(self, f):
-        self.combinations = list(filter(f, self.combinations))
+        self.combinations = self.combinations.filter(f)
 
     def add_parameter(self, name, func, **kwargs):
-        new_combs = []
-        for c in self.combinations:
-            for v in func(c, kwargs):
-                d = dict(c)
-                d[name] = v
-                new_combs.append(d)
-
-        self.combinations = new_combs
+        self.combinations = self.combinations.add_parameter(name, func, kwargs)
 
     def sample(self, n):
-        self.combinations = random.sample(self.combinations, int(n))
+        try:
+            self.combinations = self.combinations.sample(n)
+        except ValueError:
+            sys.exit(f"ERROR: Can't sample {n} combinations, there are fewer than that.")
+
+    def _build_name(self, parameters):
+        # Unique, filesystem-safe name for the build directory of one combination
+        name = self.config["top"]
+        for param, value in parameters.items():
+            name += f"_{param}_{value}"
+        name = re.sub(r"[^\w.-]", "_", name)
+
+        # Very large parameter sets would exceed filesystem name limits
+        if len(name) > 200:
+            digest = hashlib.sha1(name.encode()).hexdigest()[:12]
+            name = f"{name[:180]}_{digest}"
+
+        return name
+
+    def _schedule(self, tool=None):
+        # The longest jobs (predicted from earlier results of this design) are
+        # started first, so that the sweep doesn't end with one long job running
+        # on an otherwise idle machine. Yields (combination, runtime, memory).
+        predictor = RuntimePredictor(self.results(tool)) if tool else None
+        if predictor:
+            print(f"Scheduler: predicting runtimes from {len(predictor.history)} earlier runs")
+        return schedule(self.combinations, predictor)
+
+    def _run_parallel(self, func, jobs, tool=None):
+        # Runs func on every combination using a pool of worker threads. The tools
+        # themselves are separate processes, so threads are enough to keep every
+        # core busy. Results are yielded in the calling thread as they complete,
+        # which keeps writes to shared files (e.g., the CSV) serialized.
+        jobs = int(jobs) if jobs else 1
+        if jobs <= 0:
+            jobs = os.cpu_count() or 1
+
+        # Bounds the number of tool processes, including the implementation runs
+        # that a combination fans out to. Each one also needs a tool license.
+        slots = min(jobs, int(self.licenses)) if self.licenses else jobs
+        self._tool_slots = threading.BoundedSemaphore(slots)
+
+        if jobs == 1:
+            for c in self.combinations:
+                if self._cancelled.is_set():
+                    return
+                yield c, func(c, None)
+            return
+
+        scheduled = self._schedule(tool)
+
+        # Only a bounded number of combinations are read ahead of the workers, so
+        # that lazily generated combinations are never all held in memory.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            pending = []
+            futures = {}
+            memory_used = 0.0
+
+            while True:
+                # A cancelled run only waits for the running jobs
+                if self._cancelled.is_set():
+                    pending.clear()
+                else:
+                    pending.extend(itertools.islice(scheduled, 2 * jobs - len(pending)))
 
-    def process_vivado_results(self, parameters, csv_filename):
-        # TODO: should we force user to delete build dir, or give option?
-        # vivado_build_dir = pathlib.Path("build_vivado").mkdir(exist_ok=True)
-        vivado_dir = "build_vivado"
-        vivado_file = os.path.join(vivado_dir, "vivado_report.txt")
+                # Start the longest pending jobs whose predicted peak memory fits in
+                # the memory limit. A job always starts if nothing else is running.
+                for job in list(pending):
+                    if len(futures) >= jobs:
+                        break
+
+                    memory = job[2] or 0.0
+                    if futures and self.memory_limit:
+                        if memory_used + memory > float(self.memory_limit):
+                            continue
+
+                    pending.remove(job)
+                    futures[executor.submit(func, job[0], "openflex.log")] = job
+                    memory_used += memory
+
+                if not futures:
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    c, _, memory = futures.pop(future)
+                    memory_used -= memory or 0.0
+                    yield c, future.result()
+
+    def _run_tool(self, cmd, cwd, log_name=None, capture=False, stage="startup"):
+        # When running in parallel, each tool's output goes to a log in its own
+        # build directory instead of being interleaved on the terminal. The run's
+        # runtime and memory usage (per stage) are added to the build directory's
+        # profile. Returns the return code and the output (if captured).
+        processes = []
+
+        def started(process):
+            processes.append(process)
+            self._track(process, cmd)
+
+        with self._tool_slots:
+            # Nothing new is started once a run is cancelled
+            if self._cancelled.is_set():
+                return 1, ""
 
-        with open(vivado_file, "r") as file:
-            # Read the first line as a float
             try:
-                clock_freq = float(file.readline().strip())
-            except ValueError:
-                clock_freq = "n/a"
+                if log_name is None:
+                    out = None if capture else sys.stdout
+                    returncode, output, profile = run_monitored(
+                        cmd, cwd, out, capture, stage, started
+                    )
+                else:
+                    with open(os.path.join(cwd, log_name), "a") as log:
+                        returncode, output, profile = run_monitored(
+                            cmd, cwd, log, capture, stage, started
+                        )
+            finally:
+                for process in processes:
+                    self._untrack(process)
+
+        record_profile(cwd, profile)
+        return returncode, output
+
+    def _track(self, process, cmd):
+        # Running tools can be cancelled, and are terminated after run_timeout
+        timer = None
+        if self.run_timeout:
+
+            def expire():
+                print(f"ERROR: {cmd[0]} exceeded the run timeout ({self.run_timeout} s).")
+                terminate_process_tree(process)
+
+            timer = threading.Timer(float(self.run_timeout), expire)
+            timer.daemon = True
+            timer.start()
+
+        with self._processes_lock:
+            self._processes[process] = timer
+
+        if self._cancelled.is_set():
+            terminate_process_tree(process)
+
+    def _untrack(self, process):
+        with self._processes_lock:
+            timer = self._processes.pop(process, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _cancel(self):
+        # Stops starting new tool runs, and terminates the running ones
+        self._cancelled.set()
+        with self._processes_lock:
+            processes = list(self._processes)
+        for process in processes:
+            terminate_process_tree(process)
+
+    def _run_tcl(self, tool, cmd, script, cwd, log_name=None, capture=False, stage="startup"):
+        # Runs a tool as a new process (cmd) or, in session mode, by sending the
+        # equivalent Tcl script to one of the long-lived tool sessions. Returns the
+        # return code (0 if the run succeeded) and the tool's output (if captured).
+        if self._sessions is None:
+            return self._run_tool(cmd, cwd, log_name, capture, stage)
+
+        with self._tool_slots:
+            if self._cancelled.is_set():
+                return 1, ""
+
+            # A cancelled or timed out run terminates its session, which the pool
+            # then drops, so the next run gets a fresh one
+            session = self._sessions.acquire(tool)
+            self._track(session.process, cmd)
+            monitor = ProcessMonitor(session.process.pid, stage)
+            try:
+                if capture:
+                    status, output = session.run(script, os.path.abspath(cwd), None, monitor.mark)
+                elif log_name is None:
+                    status, output = session.run(
+                        script, os.path.abspath(cwd), sys.stdout, monitor.mark
+                    )
+                else:
+                    with open(os.path.join(cwd, log_name), "a") as log:
+                        status, output = session.run(
+                            script, os.path.abspath(cwd), log, monitor.mark
+                        )
+            finally:
+                self._untrack(session.process)
+                record_profile(cwd, monitor.stop())
+                self._sessions.release(tool, session)
+
+        return status, output
+
+    def _write_csv_row(self, csv_filename, parameters, metrics):
+        # The rows of a sweep go to a writer that stays open until _close_csv()
+        row = dict(parameters)
+        row.update(metrics)
+        writer = self._csv_writers.get(csv_filename)
+        if writer is None:
+            writer = self._csv_writers[csv_filename] = CsvWriter(csv_filename)
+        writer.write(row)
+
+    def _close_csv(self):
+        for writer in self._csv_writers.values():
+            writer.close()
+        self._csv_writers = {}
+
+    @property
+    def db(self):
+        # The results database is only opened (or created) when it is first used
+        if self._db is None:
+            self._db = ResultsDB(self.results_file)
+
+        return self._db
+
+    def results(self, tool=None, **parameters):
+        # Query the stored results of this design (top and device), optionally for
+        # one tool and/or specific parameter values, e.g., dut.results(INPUT_WIDTH=8).
+        # Use .columns() or .to_pandas() on the returned table for analysis.
+        return self.db.query(tool, self.config.get("device"), self.config["top"], **parameters)
+
+    def export_csv(self, csv_filename, tool=None, **parameters):
+        self.results(tool, **parameters).to_csv(csv_filename)
+
+    def profile(self, tool=None, **parameters):
+        # Per-stage runtime and peak memory of the stored results, e.g., to find
+        # which stage dominates a sweep. Prints and returns the summary.
+        summary = profile_summary(self.results(tool, **parameters))
+        print_profile_summary(summary)
+        return summary
+
+    def _sources(self):
+        # The files that the top level depends on, included files among them,
+        # identify its results. Editing an include re-runs what uses it, while
+        # editing other files doesn't re-run anything.
+        dependencies = self._dependencies
+        if dependencies is None:
+            dependencies = DependencyMap(self.files)
+        return dependencies.top_sources(self.config["top"])
+
+    def _cache_key(self, tool, parameters, clk_period, flow_files, impl=None, flow_script=None):
+        # Everything that can change the results of a run is part of the key.
+        # Flows that generate their scripts instead of sourcing Tcl files pass
+        # flow_script(parameters, clk_period, impl), which renders them.
+        if self._sources_hash is None:
+            self._sources_hash = hash_files(self._sources())
+
+        flow = []
+        for f in flow_files:
+            with open(f, "rb") as file:
+                flow.append(file.read())
+        if flow_script is not None:
+            flow.append(flow_script(parameters, clk_period, impl or {}))
+
+        return hash_inputs(
+            tool,
+            self.config["top"],
+            self.config.get("device"),
+            self.config.get("clock"),
+            self.config.get("reset"),
+            float(clk_period),
+            {k: str(v) for k, v in parameters.items()},
+            {k: str(v) for k, v in impl.items() if k != "clk_period"} if impl else {},
+            self._sources_hash,
+            *flow,
+            # Tool options from the YAML (e.g., the yosys section) change the flow
+            *([self.config[tool]] if tool in self.config else []),
+        )
 
-            # Read the second line and split it into 3-tuples
-            tuples_line = file.readline().strip()
+    def _prune_history(
+        self,
+        tool,
+        clk_period,
+        flow_files,
+        impl_points,
+        fmax_search,
+        fmax_tolerance,
+        fmax_max_runs,
+        flow_script=None,
+    ):
+        # The metrics of the stored results that this sweep would reproduce: a
+        # result only counts when it is for one of the sweep's implementation
+        # points and its hash is the one the current sources, flow, and options
+        # give, so results of older RTL or other settings never prune anything.
+        knobs = set().union(*impl_points)
+        points = [{k: str(v) for k, v in impl.items()} for impl in impl_points]
+
+        metrics = []
+        for run_hash, row, row_metrics in self.db.runs(
+            tool, self.config.get("device"), self.config["top"]
+        ):
+            impl = {k: row[k] for k in knobs if k in row}
+            if {k: str(v) for k, v in impl.items()} not in points:
+                continue
+
+            parameters = {k: v for k, v in row.items() if k not in knobs}
+            period = float(impl.get("clk_period", clk_period))
+            key = self._cache_key(tool, parameters, period, flow_files, impl, flow_script)
+            if fmax_search:
+                key = hash_inputs(key, "fmax_search", fmax_tolerance, fmax_max_runs)
+            if key == run_hash:
+                metrics.append(row_metrics)
+
+        return metrics
+
+    def _cached_run(self, key, func, timed=False):
+        # Returns the stored metrics on a cache hit; otherwise runs the tool and
+        # stores the metrics of a successful run right away. When the flow has a
+        # timing analysis (timed), a run without an fMax is incomplete, and is
+        # run again next time rather than cached.
+        if self.cache is None:
+            return func()
+
+        metrics = self.cache.get(key)
+        if metrics is None:
+            metrics = func()
+            if metrics is not None and not (timed and metrics.get("fMax") == "n/a"):
+                self.cache.put(key, metrics, top=self.config["top"])
+
+        return metrics
+
+    def _cache_summary(self):
+        if self.cache is None:
+            return
+
+        print(f"Result cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        self.cache.evict()
+
+    def _vivado_metrics(self, vivado_dir, report="vivado_report.txt"):
+        vivado_file = os.path.join(vivado_dir, report)
+
+        try:
+            with open(vivado_file, "r") as file:
+                # Read the first line as a float
+                try:
+                    clock_freq = float(file.readline().strip())
+                except ValueError:
+                    clock_freq = "n/a"
+
+                # Read the second line and split it into 3-tuples
+                tuples_line = file.readline().strip()
+        except FileNotFoundError:
+            print(f"ERROR: No Vivado report found in {vivado_dir}.")
+            return None
 
         # Parse the triplets into a list of (string, value, value) tuples
         tuples = [tuple(item.split(":")) for item in tuples_line.split()]
 
-        if not os.path.exists(csv_filename):
-            # Create the CSV column headers
-            headers = [x for x in parameters.keys()]
-            headers.append("fMax")
-            for i in tuples:
-                headers.append(f"{i[0]} (Used)")
-                headers.append(f"{i[0]} (Total)")
+        metrics = {"fMax": clock_freq}
+        for i in tuples:
+            metrics[f"{i[0]} (Used)"] = i[1]
+            metrics[f"{i[0]} (Total)"] = i[2]
 
-            # A little lazy here to close the file and then re-open it again.
-            with open(csv_filename, "w", newline="") as csv_file:
-                csv_writer = csv.writer(csv_file)
-                csv_writer.writerow(headers)
+        # Post-synthesis estimates (synth_report.txt) aren't complete runs
+        if report == "vivado_report.txt":
+            metrics.update(profile_metrics(load_profile(vivado_dir)))
+        return metrics
 
-        with open(csv_filename, "a") as csv_file:
-            csv_writer = csv.writer(csv_file)
+    def process_vivado_results(self, parameters, csv_filename, vivado_dir="build_vivado"):
+        metrics = self._vivado_metrics(vivado_dir)
+        if metrics is not None:
+            self._write_csv_row(csv_filename, parameters, metrics)
+            self._close_csv()
 
-            row = [x for x in parameters.values()]
-            row.append(clock_freq)
-            for i in tuples:
-                row.append(i[1])
-                row.append(i[2])
+    def _impl_name(self, impl, clk_period):
+        name = f"impl_clk_period_{clk_period}"
+        for knob, value in impl.items():
+            if knob != "clk_period":
+                name += f"_{knob}_{value}"
 
-            csv_writer.writerow(row)
+        return re.sub(r"[^\w.-]", "_", name)
 
-    def vivado_synth(self, csv_filename, clk_period=1.0):
-        vivado_dir = "build_vivado"
-        vivado_filelist = f"{vivado_dir}/filelist.txt"
-        vivado_parameters = f"{vivado_dir}/parameters.txt"
-        vivado_xdc = f"{vivado_dir}/vivado.xdc"
+    def _vivado_write_inputs(self, vivado_dir, parameters, clk_period):
+        pathlib.Path(vivado_dir).mkdir(parents=True, exist_ok=True)
 
-        vivado_tcl_file = os.path.join(os.path.dirname(__file__), "tcl", "vivado_flow.tcl")
-        pathlib.Path(vivado_dir).mkdir(exist_ok=True)
+        # Never pick up the report (or profile) of an earlier run if this one fails
+        pathlib.Path(vivado_dir, "vivado_report.txt").unlink(missing_ok=True)
+        pathlib.Path(vivado_dir, "synth_report.txt").unlink(missing_ok=True)
+        pathlib.Path(vivado_dir, PROFILE_FILE).unlink(missing_ok=True)
+
+        if parameters is not None:
+            # Nor the checkpoint (or netlist) of an earlier synthesis
+            shutil.rmtree(os.path.join(vivado_dir, "outputs"), ignore_errors=True)
 
-        # Generate the filelist
-        with open(vivado_filelist, "w") as file:
-            for file_name in self.files:
-                file.write(file_name + "\n")
+            # Generate the filelist
+            with open(os.path.join(vivado_dir, "filelist.txt"), "w") as file:
+                for file_name in self.files:
+                    file.write(file_name + "\n")
 
-        # Generate the filelist
-        for c in self.combinations:
             # Write the parameter values to a file that can be read by TCL
-            with open(vivado_parameters, "w") as file:
-                for d in c.items():
+            with open(os.path.join(vivado_dir, "parameters.txt"), "w") as file:
+                for d in parameters.items():
                     file.write(f"{d[0]} {d[1]}\n")
 
-            # Generate the XDC file for Vivado
-            xdc_content = f"""
+        # Generate the XDC file for Vivado
+        xdc_content = f"""
     create_clock -period {clk_period} [get_ports {self.config["clock"]}] -name clk
     set_property HD.CLK_SRC BUFGCTRL_X0Y0 [get_ports {self.config["clock"]}]
     """
-            with open(vivado_xdc, "w") as xdc_file:
-                xdc_file.write(xdc_content)
-
-            build_cmd = []
-            build_cmd.append("vivado")
-            build_cmd.append("-mode")
-            build_cmd.append("batch")
-            build_cmd.append("-source")
-            build_cmd.append(vivado_tcl_file)
-            build_cmd.append("-tclargs")
-            build_cmd.append(self.config["top"])
-            build_cmd.append(self.config["device"])
-            build_cmd.append(clk_period)
-            # print(build_cmd)
-            subprocess.run(build_cmd, cwd=vivado_dir)
-
-            # Post-process the run to collect results
-            self.process_vivado_results(c, csv_filename)
+        with open(os.path.join(vivado_dir, "vivado.xdc"), "w") as xdc_file:
+            xdc_file.write(xdc_content)
 
-    def process_quartus_results(self, parameters, output, csv_filename):
+    def _vivado_flow(self, vivado_dir, clk_period, stage, phys_opt, log_name=None):
+        vivado_tcl_file = os.path.join(os.path.dirname(__file__), "tcl", "vivado_flow.tcl")
+        args = [
+            self.config["top"],
+            self.config["device"],
+            str(clk_period),
+            stage,
+            str(phys_opt),
+            str(self.threads or 0),
+            "1" if self.dedup else "0",
+        ]
+
+        build_cmd = []
+        build_cmd.append("vivado")
+        build_cmd.append("-mode")
+        build_cmd.append("batch")
+        build_cmd.append("-source")
+        build_cmd.append(vivado_tcl_file)
+        build_cmd.append("-tclargs")
+        build_cmd.extend(args)
+
+        # In session mode, the in-memory design of any previous run is closed first
+        session_script = (
+            "while {![catch {close_design}]} {}\n"
+            + f"set argv [list {' '.join(args)}]\n"
+            + f"set argc {len(args)}\n"
+            + f"source {{{vivado_tcl_file}}}\n"
+            + "while {![catch {close_design}]} {}"
+        )
+
+        returncode, _ = self._run_tcl("vivado", build_cmd, session_script, vivado_dir, log_name)
+        if returncode != 0:
+            print(f"ERROR: Vivado failed in {vivado_dir}.")
+        return returncode
+
+    def _vivado_run(self, parameters, clk_period, log_name=None, stage="all", impl=None):
+        impl = impl if impl else {}
+
+        # Each combination gets its own sandboxed build directory so that runs
+        # never share parameters.txt, vivado.xdc, or any of Vivado's outputs.
+        vivado_dir = os.path.join(self.artifacts.root, "build_vivado", self._build_name(parameters))
+        self._vivado_write_inputs(vivado_dir, parameters, clk_period)
+
+        # Returns None if Vivado failed, so that nothing (e.g., implementation) runs
+        # from the outputs of a failed run
+        if self._vivado_flow(vivado_dir, clk_period, stage, impl.get("phys_opt", "auto"), log_name):
+            return None
+        return vivado_dir
+
+    def _vivado_impl_run(self, synth_dir, impl, clk_period, log_name=None):
+        # Implementation runs live next to the synthesis checkpoint they start from
+        impl_dir = os.path.join(synth_dir, self._impl_name(impl, clk_period))
+        self._vivado_write_inputs(impl_dir, None, clk_period)
+
+        # Each implementation run's profile includes the synthesis run it starts from
+        if os.path.exists(os.path.join(synth_dir, PROFILE_FILE)):
+            shutil.copy(os.path.join(synth_dir, PROFILE_FILE), impl_dir)
+
+        if self._vivado_flow(impl_dir, clk_period, "impl", impl.get("phys_opt", "auto"), log_name):
+            return None
+        return impl_dir
+
+    def _fmax_search(self, run, clk_period, tolerance=0.05, max_runs=8):
+        # Finds the tightest passing clock period by repeatedly running the tool.
+        # Each run's slack (derived from its reported fMax) predicts the next
+        # period to try. Once a passing and a failing period bracket the answer,
+        # the prediction is only used if it falls inside the bracket; otherwise
+        # the bracket is bisected. Stops when the bracket (or the slack of a
+        # passing run) is within the tolerance, or after max_runs tool runs.
+        tolerance = float(tolerance)
+        period = float(clk_period)
+        passing = None
+        passing_metrics = None
+        failing = None
+        metrics = None
+        runs = 0
+
+        while runs < int(max_runs):
+            metrics = run(period)
+            runs += 1
+
+            try:
+                slack = period - 1000.0 / float(metrics["fMax"])
+            except (TypeError, KeyError, ValueError, ZeroDivisionError):
+                # Without an fMax there is nothing to search on
+                break
+
+            if slack >= 0:
+                if passing is None or period < passing:
+                    passing = period
+                    passing_metrics = metrics
+                if slack <= tolerance:
+                    break
+            elif failing is None or period > failing:
+                failing = period
+
+            # Period the tool predicts would have zero slack
+            estimate = period - slack
+
+            if passing is not None and failing is not None:
+                if passing - failing <= tolerance:
+                    break
+                if not failing + tolerance / 2 < estimate < passing - tolerance / 2:
+                    estimate = (passing + failing) / 2
+            elif passing is not None:
+                estimate = min(estimate, passing - tolerance)
+            else:
+                estimate = max(estimate, failing + tolerance)
+
+            period = round(estimate, 6)
+
+        # Without a passing run, there is no converged period, and the fMax
+        # extrapolated from a failing run is what the search was meant to replace
+        if passing_metrics is not None:
+            metrics = dict(passing_metrics)
+            metrics["Clock Period"] = passing
+        elif metrics is not None:
+            metrics = dict(metrics)
+            metrics["fMax"] = "n/a"
+            metrics["Clock Period"] = "n/a"
+
+        if metrics is not None:
+            metrics["fMax Runs"] = runs
+
+        return metrics
+
+    def _implementation_points(self, tool, fmax_search):
+        # Implementation-only sweep axes from the YAML "implementation" section.
+        # These aren't RTL parameters, so each RTL combination is synthesized once
+        # and then implemented for every point.
+        supported = {
+            "vivado": ["clk_period", "phys_opt"],
+            "quartus": ["clk_period", "seed"],
+            "yosys": ["clk_period", "seed"],
+        }
+
+        knobs = {}
+        for knob, values in self.config.get("implementation", {}).items():
+            if knob not in supported[tool]:
+                sys.exit(f"ERROR: Unsupported {tool} implementation option: {knob}")
+            knobs[knob] = values if isinstance(values, list) else [values]
+
+        # The fMax search chooses the clock period itself
+        if fmax_search:
+            knobs.pop("clk_period", None)
+
+        return [dict(zip(knobs.keys(), v)) for v in itertools.product(*knobs.values())]
+
+    def _synth_sweep(
+        self,
+        tool,
+        csv_filename,
+        clk_period,
+        jobs,
+        fmax_search,
+        fmax_tolerance,
+        fmax_max_runs,
+        session,
+        flow_files,
+        run_flow,
+        run_synth,
+        run_impl,
+        synth_metrics,
+        netlist_file,
+        timed=True,
+        flow_script=None,
+    ):
+        impl_points = self._implementation_points(tool, fmax_search)
+        periods = [float(i.get("clk_period", clk_period)) for i in impl_points]
+        self._sources_hash = None
+        pruner = []
+
+        self._prune_seed = None
+        if self.prune:
+            self._prune_seed = self.prune_results
+            if self._prune_seed is None:
+                self._prune_seed = self._prune_history(
+                    tool,
+                    clk_period,
+                    flow_files,
+                    impl_points,
+                    fmax_search,
+                    fmax_tolerance,
+                    fmax_max_runs,
+                    flow_script,
+                )
+
+        # Synthesis is only split from implementation when a combination has more
+        # than one implementation run, or when combinations may be pruned after
+        # synthesis. Otherwise, the whole flow runs at once.
+        split = fmax_search or len(impl_points) > 1 or bool(self.prune) or self.dedup
+        netlists = {}
+        netlists_lock = threading.Lock()
+
+        def run_combination(c, log_name, ran):
+            synth_lock = threading.RLock()
+            synth_dir = []
+            netlist = []
+
+            def checkpoint():
+                # Synthesize once, on the first implementation run that isn't cached.
+                # Synthesis uses the tightest clock period of the sweep. Returns None
+                # if synthesis failed.
+                with synth_lock:
+                    if not synth_dir:
+                        # The netlist of an earlier synthesis must never be hashed
+                        build_dir = os.path.join(self.artifacts.root, f"build_{tool}")
+                        path = os.path.join(build_dir, self._build_name(c), netlist_file)
+                        pathlib.Path(path).unlink(missing_ok=True)
+
+                        ran.append("synth")
+                        synth_dir.append(run_synth(c, min(periods), log_name))
+                    return synth_dir[0]
+
+            def netlist_hash():
+                # Hash of the netlist of this synthesis, or None (no deduplication)
+                # if synthesis failed or wrote no netlist
+                with synth_lock:
+                    if not netlist:
+                        if checkpoint() is None:
+                            netlist.append(None)
+                            return None
+                        path = os.path.join(checkpoint(), netlist_file)
+                        try:
+                            netlist.append(hash_netlist(path))
+                        except OSError:
+                            print(f"ERROR: No post-synthesis netlist found at {path}.")
+                            netlist.append(None)
+                    return netlist[0]
+
+            def deduplicated(impl, period, run):
+                # Combinations whose netlists are identical get the same results for
+                # the same implementation options, so only the first one (in this
+                # sweep, or in the cache) is implemented, and the others copy it.
+                h = netlist_hash()
+                if h is None:
+                    return run()
+
+                key = self._cache_key(tool, {"netlist": h}, period, flow_files, impl, flow_script)
+                with netlists_lock:
+                    entry = netlists.get(key)
+                    first = entry is None
+                    if first:
+                        entry = netlists[key] = {"point": dict(c), "done": threading.Event()}
+
+                if first:
+                    try:
+                        stored = self.cache.get(key, entry=True) if self.cache else None
+                        if stored is not None:
+                            entry["point"] = stored["point"]
+                            entry["metrics"] = stored["metrics"]
+                        else:
+                            entry["metrics"] = run()
+                            metrics = entry["metrics"]
+                            complete = metrics is not None and not (
+                                timed and metrics.get("fMax") == "n/a"
+                            )
+                            if complete and self.cache is not None:
+                                self.cache.put(key, metrics, point=dict(c))
+                    finally:
+                        entry["done"].set()
+                else:
+                    entry["done"].wait()
+
+                if entry.get("metrics") is None:
+                    return None if first else run()
+
+                metrics = dict(entry["metrics"], **{"Netlist Hash": h})
+                if entry["point"] != dict(c):
+                    point = ", ".join(f"{k}={v}" for k, v in entry["point"].items())
+                    metrics["Deduplicated From"] = point
+                return metrics
+
+            def run_period(impl, period):
+                key = self._cache_key(tool, c, period, flow_files, impl, flow_script)
+                if split:
+
+                    def run():
+                        # Without a checkpoint, there is nothing to implement (and
+                        # nothing to cache)
+                        synth_dir = checkpoint()
+                        if synth_dir is None:
+                            return None
+                        ran.append("impl")
+                        return run_impl(c, synth_dir, impl, period, log_name)
+
+                    if self.dedup:
+                        return self._cached_run(key, lambda: deduplicated(impl, period, run), timed)
+                    return self._cached_run(key, run, timed)
+
+                def run():
+                    ran.append("flow")
+                    return run_flow(c, impl, period, log_name)
+
+                return self._cached_run(key, run, timed)
+
+            def run_point(impl):
+                # Returns the hash that identifies the result, and the metrics
+                period = float(impl.get("clk_period", clk_period))
+                key = self._cache_key(tool, c, period, flow_files, impl, flow_script)
+                if fmax_search:
+                    metrics = self._fmax_search(
+                        lambda p: run_period(impl, p), period, fmax_tolerance, fmax_max_runs
+                    )
+                    return hash_inputs(key, "fmax_search", fmax_tolerance, fmax_max_runs), metrics
+                return key, run_period(impl, period)
+
+            # Post-synthesis estimates decide whether the combination is implemented
+            # at all. They are cached like any other result.
+            def estimate():
+                synth_dir = checkpoint()
+                return synth_metrics(synth_dir) if synth_dir is not None else None
+
+            estimates = {}
+            if pruner:
+                synth_key = self._cache_key(
+                    tool, c, min(periods), flow_files, {"stage": "synth"}, flow_script
+                )
+                estimates = self._cached_run(synth_key, estimate)
+                if estimates is None:
+                    return []
+
+                reason = pruner[0].check(estimates)
+                if reason is not None:
+                    if log_name is None:
+                        print(f"Pruned after synthesis ({reason}): {c}")
+                    metrics = synth_columns(estimates)
+                    metrics["Pruned"] = reason
+                    return [(hash_inputs(synth_key, "pruned", reason), dict(c), metrics)]
+
+            # Fan out the implementation runs from the shared synthesis results
+            if len(impl_points) == 1:
+                results = [run_point(impl_points[0])]
+            else:
+                with concurrent.futures.ThreadPoolExecutor(len(impl_points)) as executor:
+                    results = list(executor.map(run_point, impl_points))
+
+            rows = []
+            for impl, (key, metrics) in zip(impl_points, results):
+                if metrics is not None:
+                    row = dict(c)
+                    row.update(impl)
+                    metrics = dict(metrics, **synth_columns(estimates))
+                    rows.append((key, row, metrics))
+
+            return rows
+
+        def run(c, log_name):
+            # Once the combination finishes, only the artifacts that the retention
+            # policy keeps are left in (or copied back to) its build directory.
+            # Combinations whose results all came from the cache didn't build.
+            ran = []
+            rows = None
+            try:
+                rows = run_combination(c, log_name, ran)
+                return rows
+            finally:
+                if ran:
+                    failed = not rows or (
+                        "Pruned" not in rows[0][2] and len(rows) < len(impl_points)
+                    )
+                    build_dir = os.path.join(f"build_{tool}", self._build_name(c))
+                    self.artifacts.finalize(build_dir, failed)
+
+        def local_sweep():
+            # In session mode, each worker drives a long-lived tool process instead
+            # of launching the tool for every run.
+            if session:
+                build_dir = os.path.join(self.artifacts.root, f"build_{tool}")
+                pathlib.Path(build_dir).mkdir(parents=True, exist_ok=True)
+                self._sessions = SessionPool(SESSION_COMMANDS, build_dir)
+
+            # Implemented results (earlier ones of the same flow included) are what
+            # later combinations have to beat to be implemented
+            if self.prune:
+                try:
+                    pruner.append(Pruner(self.prune, self._prune_seed))
+                except ValueError as e:
+                    sys.exit(f"ERROR: {e}")
+
+            try:
+                for c, rows in self._run_parallel(run, jobs, tool):
+                    for key, row, metrics in rows:
+                        if pruner:
+                            if "Pruned" in metrics:
+                                pruner[0].pruned += 1
+                            else:
+                                pruner[0].add(metrics)
+                        yield key, row, metrics
+            finally:
+                if self._sessions is not None:
+                    self._sessions.close()
+                    self._sessions = None
+
+            if pruner:
+                print(f"Pruned after synthesis: {pruner[0].pruned} combinations")
+            self._cache_summary()
+            self.artifacts.summary()
+
+        # Other backends (e.g., a cluster) run the sweep elsewhere, with the same
+        # options, and return its results.
+        if self.backend is None:
+            rows = local_sweep()
+        else:
+            options = dict(
+                clk_period=clk_period,
+                fmax_search=fmax_search,
+                fmax_tolerance=fmax_tolerance,
+                fmax_max_runs=fmax_max_runs,
+                session=session,
+            )
+            rows = self.backend.sweep(self, tool, options, local_sweep)
+
+        # Collect results as each combination completes
+        knobs = set().union(*impl_points)
+        results = []
+        try:
+            for key, row, metrics in rows:
+                self.db.add(key, tool, self.config.get("device"), self.config["top"], row, metrics)
+                if csv_filename:
+                    self._write_csv_row(csv_filename, row, metrics)
+                results.append((row, metrics))
+
+                if self._on_result is not None:
+                    parameters = {k: v for k, v in row.items() if k not in knobs}
+                    build_dir = os.path.join(f"build_{tool}", self._build_name(parameters))
+                    self._on_result(row, metrics, build_dir)
+        finally:
+            self._close_csv()
+
+        return results
+
+    def vivado_synth(
+        self,
+        csv_filename=None,
+        clk_period=1.0,
+        jobs=1,
+        fmax_search=False,
+        fmax_tolerance=0.05,
+        fmax_max_runs=8,
+        session=False,
+    ):
+        vivado_tcl_file = os.path.join(os.path.dirname(__file__), "tcl", "vivado_flow.tcl")
+
+        def run_flow(c, impl, period, log_name):
+            vivado_dir = self._vivado_run(c, period, log_name, "all", impl)
+            return self._vivado_metrics(vivado_dir) if vivado_dir is not None else None
+
+        def run_synth(c, period, log_name):
+            return self._vivado_run(c, period, log_name, "synth")
+
+        def run_impl(c, synth_dir, impl, period, log_name):
+            impl_dir = self._vivado_impl_run(synth_dir, impl, period, log_name)
+            return self._vivado_metrics(impl_dir) if impl_dir is not None else None
+
+        def synth_metrics(synth_dir):
+            return self._vivado_metrics(synth_dir, "synth_report.txt")
+
+        return self._synth_sweep(
+            "vivado",
+            csv_filename,
+            clk_period,
+            jobs,
+            fmax_search,
+            fmax_tolerance,
+            fmax_max_runs,
+            session,
+            [vivado_tcl_file],
+            run_flow,
+            run_synth,
+            run_impl,
+            synth_metrics,
+            VIVADO_NETLIST,
+            timed=True,
+        )
+
+    def _quartus_metrics(self, output):
+        result_headers = []
+        result_values = []
 
         lines = output.split("\n")
 
@@ -204,165 +1056,792 @@ class FlexConfig:
                 # Strip off the "VALUES: " prefix
                 result_values = line[len("VALUES: ") :].split(",")
 
-        if not os.path.exists(csv_filename):
-            # Create the CSV column headers
-            headers = [x for x in parameters.keys()]
-            headers.extend(result_headers)
-
-            # A little lazy here to close the file and then re-open it again.
-            with open(csv_filename, "w", newline="") as csv_file:
-                csv_writer = csv.writer(csv_file)
-                csv_writer.writerow(headers)
+        if not result_headers:
+            return None
 
-        with open(csv_filename, "a") as csv_file:
-            csv_writer = csv.writer(csv_file)
+        return dict(zip(result_headers, result_values))
 
-            row = [x for x in parameters.values()]
-            row.extend(result_values)
+    def process_quartus_results(self, parameters, output, csv_filename):
+        metrics = self._quartus_metrics(output)
+        if metrics is not None:
+            self._write_csv_row(csv_filename, parameters, metrics)
+            self._close_csv()
+
+    def _quartus_write_sdc(self, quartus_dir, clk_period):
+        # Create the SDC file (only if clock provided in config)
+        if "clock" in self.config:
+            with open(f"{quartus_dir}/{self.config['top']}.sdc", "w") as sdc:
+                # fmt: off
+                sdc.write("set_time_format -unit ns -decimal_places 3\n")
+                sdc.write(f"create_clock -name {{clk}} -period {clk_period} -waveform {{ 0.000 {clk_period/2.0} }} [get_ports {{{self.config['clock']}}}]\n" )
+                sdc.write("set_clock_uncertainty -rise_from [get_clocks {clk}] -rise_to [get_clocks {clk}]  0.020\n" )
+                sdc.write("set_clock_uncertainty -rise_from [get_clocks {clk}] -fall_to [get_clocks {clk}]  0.020\n" )
+                sdc.write("set_clock_uncertainty -fall_from [get_clocks {clk}] -rise_to [get_clocks {clk}]  0.020\n" )
+                sdc.write("set_clock_uncertainty -fall_from [get_clocks {clk}] -fall_to [get_clocks {clk}]  0.020\n" )
+                # fmt: on
+
+    def _quartus_write_seed(self, quartus_dir, impl):
+        if "seed" in impl:
+            with open(f"{quartus_dir}/{self.config['top']}.qsf", "a") as qsf:
+                qsf.write(f"set_global_assignment -name SEED {impl['seed']}\n")
 
-            csv_writer.writerow(row)
+    def _quartus_results(self, quartus_dir, csv_filename):
+        quartus_results_tcl_file = os.path.join(
+            os.path.dirname(__file__), "tcl", "quartus_results.tcl"
+        )
 
-    def quartus_synth(self, csv_filename="", clk_period=1.0):
+        result_args = (
+            f"-q {self.config['top']} -f {os.path.abspath(csv_filename or self.results_file)}"
+        )
+        result_cmd = f"quartus_sh -t {quartus_results_tcl_file} {result_args}"
+        result_cmd_list = result_cmd.split()
+        session_script = (
+            "catch {project_close}\n"
+            + f"set quartus(args) [list {result_args}]\n"
+            + f"source {{{quartus_results_tcl_file}}}"
+        )
+        returncode, output = self._run_tcl(
+            "quartus", result_cmd_list, session_script, quartus_dir, capture=True, stage="results"
+        )
 
-        clk_period = float(clk_period)
-        quartus_dir = "build_quartus"
-        try:
-            os.mkdir(quartus_dir)
-        except FileExistsError:
-            print(f"Directory '{quartus_dir}' already exists.")
-            sys.exit(1)
+        metrics = self._quartus_metrics(output) if returncode == 0 else None
+        if metrics is None:
+            print(f"ERROR: No Quartus results found in {quartus_dir}.")
+            return None
+
+        metrics.update(profile_metrics(load_profile(quartus_dir)))
+        return metrics
+
+    def _quartus_synth_metrics(self, quartus_dir):
+        # Post-synthesis resource estimates, named like the fitter's results
+        tcl_file = os.path.join(os.path.dirname(__file__), "tcl", "quartus_synth_results.tcl")
+        session_script = (
+            "catch {project_close}\n"
+            + f"set quartus(args) [list {self.config['top']}]\n"
+            + f"source {{{tcl_file}}}"
+        )
+        returncode, output = self._run_tcl(
+            "quartus",
+            ["quartus_sh", "-t", tcl_file, self.config["top"]],
+            session_script,
+            quartus_dir,
+            capture=True,
+            stage="synth_results",
+        )
 
+        estimates = self._quartus_metrics(output) if returncode == 0 else None
+        if estimates is None:
+            print(f"ERROR: No Quartus synthesis results found in {quartus_dir}.")
+            return None
+
+        names = {
+            "Estimate of Logic utilization (ALMs needed)": "ALMs",
+            "Combinational ALUT usage for logic": "ALUTs",
+            "Dedicated logic registers": "REGs",
+            "Total DSP Blocks": "DSPs",
+            "Total block memory bits": "MemBits",
+        }
+        return {names.get(k, k): v for k, v in estimates.items()}
+
+    def _quartus_tcl(self, quartus_dir, tcl, log_name=None, stage="startup"):
+        # Runs Tcl commands (separated by semicolons) with quartus_sh, and returns
+        # the return code
+        tcl_cmd_list = ["quartus_sh", "--tcl_eval"] + tcl.split()
+        session_script = "catch {project_close}\n" + tcl + ";project_close"
+        return self._run_tcl(
+            "quartus", tcl_cmd_list, session_script, quartus_dir, log_name, stage=stage
+        )[0]
+
+    def _quartus_run(self, p, clk_period, log_name=None, stage="all", impl=None):
+        impl = impl if impl else {}
         using_clock = "clock" in self.config
         using_reset = "reset" in self.config
 
-        quartus_results_tcl_file = os.path.join(
-            os.path.dirname(__file__), "tcl", "quartus_results.tcl"
+        # Each combination gets its own project in a sandboxed build directory.
+        # Any stale project from a previous run is removed first.
+        quartus_dir = os.path.join(self.artifacts.root, "build_quartus", self._build_name(p))
+        shutil.rmtree(quartus_dir, ignore_errors=True)
+        pathlib.Path(quartus_dir).mkdir(parents=True)
+
+        self._quartus_write_sdc(quartus_dir, clk_period)
+
+        # Create the project.
+        create_project_cmd = (
+            f"project_new -overwrite {self.config['top']} -part {self.config['device']}"
         )
 
-        for p in self.combinations:
+        try:
+            returncode = self._quartus_tcl(quartus_dir, create_project_cmd, log_name, "project_new")
+        except FileNotFoundError:
+            print("Ensure Quartus' (quartus_sh) is installed or active in your environment.")
+            return None
+        if returncode != 0:
+            print(f"ERROR: Quartus failed to create a project in {quartus_dir}.")
+            return None
+
+        # Create the QSF.
+        with open(f"{quartus_dir}/{self.config['top']}.qsf", "a") as qsf:
+            # Add files to the QSF file with a different assignment type based on each file type.
+
+            # Dictionary used to lookup assignment name type based on file's extension.
+            assignment_names = {
+                ".v": "VERILOG_FILE",
+                ".sv": "SYSTEMVERILOG_FILE",
+                ".vhd": "VHDL_FILE",
+                ".sdc": "SDC_FILE",
+            }
 
-            # Create the SDC file (only if clock provided in config)
-            if using_clock:
-                with open(f"{quartus_dir}/{self.config['top']}.sdc", "w") as sdc:
-                    # fmt: off
-                    sdc.write("set_time_format -unit ns -decimal_places 3\n")
-                    sdc.write(f"create_clock -name {{clk}} -period {clk_period} -waveform {{ 0.000 {clk_period/2.0} }} [get_ports {{{self.config['clock']}}}]\n" )
-                    sdc.write("set_clock_uncertainty -rise_from [get_clocks {clk}] -rise_to [get_clocks {clk}]  0.020\n" )
-                    sdc.write("set_clock_uncertainty -rise_from [get_clocks {clk}] -fall_to [get_clocks {clk}]  0.020\n" )
-                    sdc.write("set_clock_uncertainty -fall_from [get_clocks {clk}] -rise_to [get_clocks {clk}]  0.020\n" )
-                    sdc.write("set_clock_uncertainty -fall_from [get_clocks {clk}] -fall_to [get_clocks {clk}]  0.020\n" )
-                    # fmt: on
+            for f in self.files:
+                ext = pathlib.Path(f).suffix
+                try:
+                    qsf.write(f"set_global_assignment -name {assignment_names[ext]} {f}\n")
+                except KeyError as k:
+                    print(f"Extension {k} from file in filelist is not supported: {f}.")
 
-            # Create the project.
-            create_project_cmd = f"quartus_sh --tcl_eval project_new -overwrite {self.config['top']} -part {self.config['device']}"
-            create_project_cmd_list = create_project_cmd.split()
+            # Define the parameters
+            for k, v in p.items():
+                qsf.write(f"set_parameter -name {k} {v}\n")
 
-            try:
-                subprocess.run(create_project_cmd_list, cwd=quartus_dir)
-            except FileNotFoundError:
-                print("Ensure Quartus' (quartus_sh) is installed or active in your environment.")
+            if self.threads:
+                qsf.write(f"set_global_assignment -name NUM_PARALLEL_PROCESSORS {self.threads}\n")
 
-            # Create the QSF.
-            with open(f"{quartus_dir}/{self.config['top']}.qsf", "a") as qsf:
-                # Add files to the QSF file with a different assignment type based on each file type.
-
-                # Dictionary used to lookup assignment name type based on file's extension.
-                assignment_names = {
-                    ".v": "VERILOG_FILE",
-                    ".sv": "SYSTEMVERILOG_FILE",
-                    ".vhd": "VHDL_FILE",
-                    ".sdc": "SDC_FILE",
-                }
-
-                for f in self.files:
-                    ext = pathlib.Path(f).suffix
-                    try:
-                        qsf.write(f"set_global_assignment -name {assignment_names[ext]} {f}\n")
-                    except KeyError as k:
-                        print(f"Extension {k} from file in filelist is not supported: {f}.")
-
-                # Define the parameters
-                for k, v in p.items():
-                    qsf.write(f"set_parameter -name {k} {v}\n")
-
-            # Open the project and set virtual pins
-            tcl_cmd = (
-                f"quartus_sh --tcl_eval project_open {self.config['top']}.qpf;"
-                + 'set_instance_assignment -to "*" -name VIRTUAL_PIN ON;'
-            )
+        self._quartus_write_seed(quartus_dir, impl)
 
-            # Only disable clk/rst virtual pins if they are present.
-            if using_clock:
-                tcl_cmd += (
-                    f'set_instance_assignment -to {self.config["clock"]} -name VIRTUAL_PIN OFF;'
-                )
-            if using_reset:
-                tcl_cmd += (
-                    f'set_instance_assignment -to {self.config["reset"]} -name VIRTUAL_PIN OFF;'
-                )
+        # Open the project and set virtual pins
+        tcl_cmd = (
+            f"project_open {self.config['top']}.qpf;"
+            + 'set_instance_assignment -to "*" -name VIRTUAL_PIN ON;'
+        )
+
+        # Only disable clk/rst virtual pins if they are present.
+        if using_clock:
+            tcl_cmd += f'set_instance_assignment -to {self.config["clock"]} -name VIRTUAL_PIN OFF;'
+        if using_reset:
+            tcl_cmd += f'set_instance_assignment -to {self.config["reset"]} -name VIRTUAL_PIN OFF;'
 
-            # Compile
+        # Compile (only analysis & synthesis for the synth stage). The stage markers
+        # are used to profile each step.
+        tcl_cmd += "load_package flow;" + "puts OPENFLEX_STAGE:map;" + "execute_module -tool map"
+
+        # The post-synthesis (VQM) netlist is hashed to find duplicate combinations
+        if stage == "synth" and self.dedup:
+            tcl_cmd += ";" + f"execute_module -tool cdb -args --vqm={QUARTUS_NETLIST}"
+        if stage == "all":
             tcl_cmd += (
-                "load_package flow;"
-                + "execute_module -tool map;"
+                ";"
+                + "puts OPENFLEX_STAGE:fit;"
                 + "execute_module -tool fit;"
+                + "puts OPENFLEX_STAGE:sta;"
                 + "execute_module -tool sta"
-                # + "execute_flow -compile"
             )
+            # + "execute_flow -compile"
+
+        if log_name is None:
+            print(tcl_cmd)
+
+        # Returns None if the compile failed, so that nothing runs from (or reads
+        # results of) a failed compile
+        if self._quartus_tcl(quartus_dir, tcl_cmd, log_name) != 0:
+            print(f"ERROR: Quartus failed in {quartus_dir}.")
+            return None
+        return quartus_dir
+
+    def _quartus_impl_run(self, synth_dir, impl, clk_period, log_name=None):
+        # Copy the synthesized project so that each implementation run has its own
+        # project directory, then only run the fitter and timing analysis.
+        impl_dir = os.path.join(synth_dir, self._impl_name(impl, clk_period))
+        shutil.rmtree(impl_dir, ignore_errors=True)
+        shutil.copytree(synth_dir, impl_dir, ignore=shutil.ignore_patterns("impl_*"))
+
+        self._quartus_write_sdc(impl_dir, clk_period)
+        self._quartus_write_seed(impl_dir, impl)
+
+        tcl_cmd = (
+            f"project_open {self.config['top']}.qpf;"
+            + "load_package flow;"
+            + "puts OPENFLEX_STAGE:fit;"
+            + "execute_module -tool fit;"
+            + "puts OPENFLEX_STAGE:sta;"
+            + "execute_module -tool sta"
+        )
 
+        if log_name is None:
             print(tcl_cmd)
 
-            tcl_cmd_list = tcl_cmd.split()
-            subprocess.run(tcl_cmd_list, cwd=quartus_dir)
+        if self._quartus_tcl(impl_dir, tcl_cmd, log_name) != 0:
+            print(f"ERROR: Quartus failed in {impl_dir}.")
+            return None
+        return impl_dir
+
+    def quartus_synth(
+        self,
+        csv_filename=None,
+        clk_period=1.0,
+        jobs=1,
+        fmax_search=False,
+        fmax_tolerance=0.05,
+        fmax_max_runs=8,
+        session=False,
+    ):
+        clk_period = float(clk_period)
+        quartus_results_tcl_file = os.path.join(
+            os.path.dirname(__file__), "tcl", "quartus_results.tcl"
+        )
+
+        def run_flow(p, impl, period, log_name):
+            quartus_dir = self._quartus_run(p, period, log_name, "all", impl)
+            if quartus_dir is None:
+                return None
+            return self._quartus_results(quartus_dir, csv_filename)
+
+        def run_synth(p, period, log_name):
+            return self._quartus_run(p, period, log_name, "synth")
+
+        def run_impl(p, synth_dir, impl, period, log_name):
+            impl_dir = self._quartus_impl_run(synth_dir, impl, float(period), log_name)
+            if impl_dir is None:
+                return None
+            return self._quartus_results(impl_dir, csv_filename)
+
+        quartus_synth_tcl_file = os.path.join(
+            os.path.dirname(__file__), "tcl", "quartus_synth_results.tcl"
+        )
+
+        return self._synth_sweep(
+            "quartus",
+            csv_filename,
+            clk_period,
+            jobs,
+            fmax_search,
+            fmax_tolerance,
+            fmax_max_runs,
+            session,
+            [quartus_results_tcl_file, quartus_synth_tcl_file],
+            run_flow,
+            run_synth,
+            run_impl,
+            self._quartus_synth_metrics,
+            QUARTUS_NETLIST,
+            timed="clock" in self.config,
+        )
 
-            result_cmd = f"quartus_sh -t {quartus_results_tcl_file} -q {self.config['top']} -f {os.path.abspath(csv_filename)}"
-            result_cmd_list = result_cmd.split()
-            output = subprocess.check_output(
-                result_cmd_list, universal_newlines=True, cwd=quartus_dir
+    def _yosys_options(self):
+        # Options of the open-source flow from the YAML "yosys" section
+        options = dict(self.config.get("yosys", {}))
+        family = options.get("family", "generic")
+        nextpnr = str(options.get("nextpnr", "false")).lower() in ("true", "1", "yes")
+        if nextpnr and family not in NEXTPNR_FAMILIES:
+            sys.exit(
+                f"ERROR: nextpnr requires one of the families {', '.join(NEXTPNR_FAMILIES)}"
+                + f" (got {family})."
             )
-            self.process_quartus_results(p, output, csv_filename)
 
-    def questa_sim(self):
-        contains_sv = False
         for f in self.files:
-            contains_sv = ".sv" in f
-            break
+            ext = pathlib.Path(f).suffix
+            if ext not in (".v", ".sv"):
+                print(f"Extension {ext} from file in filelist is not supported by Yosys: {f}.")
+
+        return {
+            "family": family,
+            "lut_size": int(options.get("lut_size", 6)),
+            "nextpnr": nextpnr,
+            "nextpnr_args": str(options.get("nextpnr_args", "")).split(),
+        }
+
+    def _yosys_script(self, parameters, options):
+        # Yosys script that elaborates the top module with the parameter values,
+        # synthesizes it, and writes the netlist and the synthesis estimates
+        top = self.config["top"]
+        script = []
+        for f in self.files:
+            ext = pathlib.Path(f).suffix
+            if ext == ".v":
+                script.append(f'read_verilog -defer "{f}"')
+            elif ext == ".sv":
+                script.append(f'read_verilog -sv -defer "{f}"')
+
+        hierarchy = f"hierarchy -top {top}"
+        for k, v in parameters.items():
+            value = v if re.fullmatch(r"-?\d+|\d*'[sS]?[bBoOdDhH][\w?]+", str(v)) else f'"{v}"'
+            hierarchy += f" -chparam {k} {value}"
+        script.append(hierarchy)
+
+        if options["family"] == "generic":
+            script.append(f"synth -flatten -top {top} -lut {options['lut_size']}")
+        else:
+            script.append(f"synth_{options['family']} -top {top}")
+
+        # The netlist is placed and routed by nextpnr, and hashed to find duplicate
+        # combinations
+        script.append("write_json openflex_netlist.json")
+        if self.dedup:
+            script.append(f"write_verilog -noattr {YOSYS_NETLIST}")
+
+        script.append("tee -q -o yosys_stat.json stat -json")
+        script.append("tee -q -o yosys_ltp.txt ltp -noff")
+        return "\n".join(script) + "\n"
+
+    def _yosys_synth_metrics(self, yosys_dir):
+        # Post-synthesis estimates: the cell counts and the logic depth (the longest
+        # path in cells, excluding flip-flops)
+        try:
+            with open(os.path.join(yosys_dir, "yosys_stat.json"), "r") as file:
+                stat = json.load(file)
+            with open(os.path.join(yosys_dir, "yosys_ltp.txt"), "r") as file:
+                ltp = file.read()
+        except (OSError, ValueError):
+            print(f"ERROR: No Yosys results found in {yosys_dir}.")
+            return None
+
+        design = stat.get("design")
+        if design is None:
+            design = stat["modules"].get("\\" + self.config["top"], {})
+
+        metrics = {"Cells (Used)": design.get("num_cells", 0)}
+        for cell, count in sorted(design.get("num_cells_by_type", {}).items()):
+            metrics[f"{cell} (Used)"] = count
+
+        depth = re.search(r"length=(\d+)", ltp)
+        metrics["Logic Depth"] = depth.group(1) if depth else "n/a"
+        return metrics
+
+    def _yosys_metrics(self, yosys_dir, synth_dir=None):
+        # Results in the same schema as the vendor tools: fMax (from nextpnr's
+        # timing analysis, if it ran) and resource usage, with the synthesis cell
+        # counts of the netlist
+        metrics = self._yosys_synth_metrics(synth_dir or yosys_dir)
+        if metrics is None:
+            return None
+
+        metrics = dict({"fMax": "n/a"}, **metrics)
+        report_file = os.path.join(yosys_dir, "nextpnr_report.json")
+        if os.path.exists(report_file):
+            try:
+                with open(report_file, "r") as file:
+                    report = json.load(file)
+            except ValueError:
+                print(f"ERROR: Invalid nextpnr report in {yosys_dir}.")
+                return None
 
-        # Create build directory for the current test case
-        sim_dir = pathlib.Path("build_questa")
-        sim_dir.mkdir(exist_ok=True)
+            # The slowest clock domain limits the design
+            achieved = [c["achieved"] for c in report.get("fmax", {}).values()]
+            if achieved:
+                metrics["fMax"] = min(achieved)
+            for bel, usage in report.get("utilization", {}).items():
+                metrics[f"{bel} (Used)"] = usage["used"]
+                metrics[f"{bel} (Total)"] = usage["available"]
 
-        tests_failed = 0
-        failed_tests = []
+        metrics.update(profile_metrics(load_profile(yosys_dir)))
+        return metrics
 
-        # Iterate over all parameter combinations and build each one
-        for test_case in self.combinations:
-            test_name = "build_" + self.config["top"]
-            # print(f"test_case {test_case}")
-            for param, value in test_case.items():
-                test_name += f"_{param}_{value}"
+    def _yosys_run(self, parameters, options, log_name=None):
+        # Each combination gets its own sandboxed build directory
+        yosys_dir = os.path.join(self.artifacts.root, "build_yosys", self._build_name(parameters))
+        shutil.rmtree(yosys_dir, ignore_errors=True)
+        pathlib.Path(yosys_dir).mkdir(parents=True)
+
+        with open(os.path.join(yosys_dir, "openflex.ys"), "w") as file:
+            file.write(self._yosys_script(parameters, options))
+
+        try:
+            returncode, _ = self._run_tool(
+                ["yosys", "-s", "openflex.ys"], yosys_dir, log_name, stage="synth"
+            )
+        except FileNotFoundError:
+            print("Ensure Yosys (yosys) is installed or active in your environment.")
+            return None
+
+        # Returns None if Yosys failed, so that nothing runs from its outputs
+        if returncode != 0:
+            print(f"ERROR: Yosys failed in {yosys_dir}.")
+            return None
+        return yosys_dir
+
+    def _nextpnr_command(self, netlist, impl, clk_period, options):
+        cmd = [
+            f"nextpnr-{options['family']}",
+            "--json",
+            netlist,
+            "--freq",
+            f"{1000.0 / float(clk_period):g}",
+            "--report",
+            "nextpnr_report.json",
+        ]
+        if "seed" in impl:
+            cmd += ["--seed", str(impl["seed"])]
+        return cmd + options["nextpnr_args"]
+
+    def _nextpnr_run(self, synth_dir, impl, clk_period, options, log_name=None, impl_dir=None):
+        # Places and routes the synthesized netlist, in its own directory (for
+        # implementation runs) or in the synthesis directory
+        if impl_dir is None:
+            impl_dir = synth_dir
+        else:
+            shutil.rmtree(impl_dir, ignore_errors=True)
+            pathlib.Path(impl_dir).mkdir(parents=True)
+
+            # Each implementation run's profile includes the synthesis run
+            if os.path.exists(os.path.join(synth_dir, PROFILE_FILE)):
+                shutil.copy(os.path.join(synth_dir, PROFILE_FILE), impl_dir)
+
+        netlist = os.path.abspath(os.path.join(synth_dir, "openflex_netlist.json"))
+        cmd = self._nextpnr_command(netlist, impl, clk_period, options)
+        try:
+            returncode, _ = self._run_tool(cmd, impl_dir, log_name, stage="place_route")
+        except FileNotFoundError:
+            print(f"Ensure nextpnr ({cmd[0]}) is installed or active in your environment.")
+            return None
+
+        if returncode != 0:
+            print(f"ERROR: nextpnr failed in {impl_dir}.")
+            return None
+        return impl_dir
+
+    def yosys_synth(
+        self,
+        csv_filename=None,
+        clk_period=1.0,
+        jobs=1,
+        fmax_search=False,
+        fmax_tolerance=0.05,
+        fmax_max_runs=8,
+        session=False,
+    ):
+        # Open-source flow for quick estimates: Yosys synthesis, optionally placed
+        # and routed with nextpnr for timing. Results use the same schema as the
+        # vendor flows, so cheap sweeps can screen combinations for them.
+        options = self._yosys_options()
+        if session:
+            sys.exit("ERROR: Session mode isn't supported for Yosys.")
+        if fmax_search and not options["nextpnr"]:
+            sys.exit("ERROR: The fMax search requires nextpnr (yosys: nextpnr: true).")
+
+        def run_flow(c, impl, period, log_name):
+            yosys_dir = self._yosys_run(c, options, log_name)
+            if yosys_dir is None:
+                return None
+            if options["nextpnr"]:
+                if self._nextpnr_run(yosys_dir, impl, period, options, log_name) is None:
+                    return None
+            return self._yosys_metrics(yosys_dir)
+
+        def run_synth(c, period, log_name):
+            return self._yosys_run(c, options, log_name)
+
+        def flow_script(c, period, impl):
+            # The generated Yosys script and nextpnr command are the flow, like
+            # the Tcl files of the vendor flows
+            script = self._yosys_script(c, options)
+            if options["nextpnr"]:
+                cmd = self._nextpnr_command("openflex_netlist.json", impl, period, options)
+                script += " ".join(cmd) + "\n"
+            return script
+
+        def run_impl(c, synth_dir, impl, period, log_name):
+            # Without nextpnr, implementation results are the synthesis results
+            if not options["nextpnr"]:
+                return self._yosys_metrics(synth_dir)
+
+            impl_dir = os.path.join(synth_dir, self._impl_name(impl, period))
+            if self._nextpnr_run(synth_dir, impl, period, options, log_name, impl_dir) is None:
+                return None
+            return self._yosys_metrics(impl_dir, synth_dir)
+
+        return self._synth_sweep(
+            "yosys",
+            csv_filename,
+            clk_period,
+            jobs,
+            fmax_search,
+            fmax_tolerance,
+            fmax_max_runs,
+            session,
+            [],
+            run_flow,
+            run_synth,
+            run_impl,
+            self._yosys_synth_metrics,
+            YOSYS_NETLIST,
+            timed=options["nextpnr"],
+            flow_script=flow_script,
+        )
+
+    def _synth_function(self, tool):
+        synth = {
+            "vivado": self.vivado_synth,
+            "quartus": self.quartus_synth,
+            "yosys": self.yosys_synth,
+        }.get(tool)
+        if synth is None:
+            sys.exit("ERROR: Invalid synthesis tool.")
+        return synth
+
+    def _sweep(self, mode, tool, csv_filename, clk_period, jobs, options):
+        # The simulations or synthesis sweep of a mode and tool (by default, the
+        # YAML's), as a function that runs it
+        mode = mode if mode else self.config["mode"]
+        tool = tool if tool else self.config["tool"]
+
+        if mode == "sim":
+            if tool != "questa":
+                sys.exit("ERROR: Invalid simulator.")
+            return lambda: self.questa_sim(jobs=jobs, **options)
+        elif mode == "synth":
+            synth = self._synth_function(tool)
+            return lambda: synth(csv_filename, clk_period, jobs=jobs, **options)
+
+        sys.exit("ERROR: Invalid mode.")
+
+    def run(
+        self,
+        mode=None,
+        tool=None,
+        csv_filename=None,
+        clk_period=1.0,
+        jobs=1,
+        timeout=None,
+        **options,
+    ):
+        # Runs the simulations or the synthesis sweep in the background, and
+        # returns an iterator over the results (see stream.py) as each combination
+        # finishes, e.g.:
+        #     for result in dut.run(jobs=4):
+        #         print(result.parameters, result.metrics["fMax"])
+        # Other options are passed to questa_sim() or the synthesis function. The
+        # iterator's cancel() (or leaving a with block) stops the sweep, and after
+        # timeout seconds, the sweep is cancelled and TimeoutError is raised.
+        # Set run_timeout to limit each tool run instead.
+        sweep = self._sweep(mode, tool, csv_filename, clk_period, jobs, options)
+        return ResultStream(self, sweep, timeout)
+
+    def run_async(
+        self,
+        mode=None,
+        tool=None,
+        csv_filename=None,
+        clk_period=1.0,
+        jobs=1,
+        timeout=None,
+        **options,
+    ):
+        # Asynchronous run(), e.g.:
+        #     async for result in dut.run_async(jobs=4):
+        #         ...
+        sweep = self._sweep(mode, tool, csv_filename, clk_period, jobs, options)
+        return AsyncResultStream(self, sweep, timeout)
+
+    def explore(
+        self,
+        objective="fmax",
+        budget=20,
+        csv_filename=None,
+        clk_period=1.0,
+        jobs=1,
+        tool=None,
+        pool=500,
+        seed=None,
+        **options,
+    ):
+        # Searches the combinations for the best results for an objective ("fmax",
+        # "area", "pareto", or e.g. "max:fMax,min:CLB LUTs (Used)") within a budget
+        # of combinations, instead of running all of them. Results of earlier runs
+        # of the design are used too. Other options are passed to vivado_synth(),
+        # quartus_synth(), or yosys_synth(). Returns the best results (the Pareto front).
+        tool = tool if tool else self.config["tool"]
+        synth = self._synth_function(tool)
+
+        jobs = int(jobs) if jobs else 1
+        try:
+            explorer = Explorer(
+                objective,
+                budget,
+                jobs if jobs > 0 else os.cpu_count() or 1,
+                pool,
+                seed=None if seed is None else int(seed),
+            )
+        except ValueError as e:
+            sys.exit(f"ERROR: {e}")
+
+        combinations = self.combinations
+
+        def run_batch(points):
+            self.combinations = points
+            synth(csv_filename, clk_period, jobs=jobs, **options)
+
+        try:
+            best = explorer.run(combinations, lambda: self.results(tool).rows, run_batch)
+        finally:
+            self.combinations = combinations
+
+        print("Best results:")
+        for row in best:
+            parameters = {n: row[n] for n in explorer.names if n in row}
+            metrics = {m: row.get(m) for m in explorer.metrics()}
+            print(f"  {parameters}: {metrics}")
+
+        return best
+
+    def _questa_compile(self, contains_sv):
+        # Compiles every file once into a shared library (build_questa/openflex_lib)
+        # that each test case then elaborates with its own generics. When files
+        # change, only they (and the files that include them or import their
+        # packages) are recompiled.
+        build_dir = pathlib.Path("build_questa")
+        library = build_dir / "openflex_lib"
+        stamp = library / "openflex.hash"
+        dependencies = DependencyMap(self.files)
+        inputs = hash_inputs(self.files, contains_sv)
+        hashes = {f: hash_files([f]) for f in dependencies.sources()}
+
+        try:
+            previous = json.loads(stamp.read_text())
+            if previous["inputs"] != inputs:
+                previous = None
+        except (OSError, ValueError, KeyError, TypeError):
+            previous = None
+
+        if previous is None:
+            shutil.rmtree(library, ignore_errors=True)
+            build_dir.mkdir(parents=True, exist_ok=True)
+            returncode, _ = self._run_tool(["vlib", "openflex_lib"], build_dir, stage="vlib")
+            files = self.files
+        else:
+            changed = {f for f, h in hashes.items() if previous["files"].get(f) != h}
+            if not changed:
+                print(f"Questa library {library} is up to date.")
+                return os.path.abspath(library)
+
+            stale = dependencies.dependents(changed, compile_only=True)
+            files = [f for f in self.files if f in stale]
+            print(f"Recompiling {len(files)} of {len(self.files)} files into {library}.")
+            returncode = 0
+
+        # Files are compiled in order, with one command per run of Verilog or
+        # VHDL files.
+        for vhdl, group in itertools.groupby(
+            files, lambda f: pathlib.Path(f).suffix in (".vhd", ".vhdl")
+        ):
+            if returncode != 0:
+                break
+
+            if vhdl:
+                compile_cmd = ["vcom", "-64", "-work", "openflex_lib"]
+                stage = "vcom"
+            else:
+                compile_cmd = ["vlog", "-64", "-work", "openflex_lib"]
+                if contains_sv:
+                    compile_cmd.append("-sv")
+                compile_cmd.append("-timescale=1ns/100ps")
+                stage = "vlog"
+
+            returncode, _ = self._run_tool(compile_cmd + list(group), build_dir, stage=stage)
+
+        if returncode != 0:
+            # The next run compiles everything again
+            stamp.unlink(missing_ok=True)
+            sys.exit("ERROR: Compilation of the Questa library failed.")
+
+        stamp.write_text(json.dumps({"inputs": inputs, "files": hashes}))
+        return os.path.abspath(library)
+
+    def _questa_elaborate(self, test_case, sim_dir, library, log_name=None):
+        # Optimizes (elaborates) the top level with this test case's generics into
+        # a local work library, and simulates it. The shared library is mapped
+        # read-only, so test cases can run in parallel.
+        opt_cmd = ["vopt", "-64", "-L", "openflex_lib"]
+        for param, value in test_case.items():
+            opt_cmd.append("-g")
+            opt_cmd.append(f"{param}={value}")
+        opt_cmd += [f"openflex_lib.{self.config['top']}", "-o", "openflex_opt"]
+
+        sim_cmd = ["vsim", "-64", "-c", "-L", "openflex_lib", "openflex_opt"]
+        sim_cmd += ["-do", "run -all; quit -f"]
+
+        shutil.rmtree(sim_dir / "work", ignore_errors=True)
+        for cmd, stage in [
+            (["vlib", "work"], "vlib"),
+            (["vmap", "openflex_lib", library], "vmap"),
+            (opt_cmd, "vopt"),
+            (sim_cmd, "vsim"),
+        ]:
+            returncode, _ = self._run_tool(cmd, sim_dir, log_name, stage=stage)
+            if returncode != 0:
+                break
+
+        return returncode
+
+    def _questa_run(self, test_case, contains_sv, log_name=None, library=None):
+        test_name = "build_" + self._build_name(test_case)
+
+        # Create build directory for the current test case
+        sim_dir = pathlib.Path(self.artifacts.root, "build_questa", test_name)
+        sim_dir.mkdir(parents=True, exist_ok=True)
+        (sim_dir / PROFILE_FILE).unlink(missing_ok=True)
 
+        if log_name is None:
             print("\n")
             print("----------------------------------------------------------------------")
             print(f"    RUNNING TEST: {test_name}")
             print("----------------------------------------------------------------------")
 
-            build_cmd = []
-            build_cmd.append("qrun")
-            build_cmd.append("-64")
-            if contains_sv:
-                build_cmd.append("-sv")
-            build_cmd.append("-timescale=1ns/100ps")
-            for param, value in test_case.items():
-                build_cmd.append("-g")
-                build_cmd.append(f"{param}={value}")
-            for f in self.files:
-                build_cmd.append(f)
-            build_cmd.append("-top")
-            build_cmd.append(self.config["top"])
-            ret = subprocess.run(build_cmd, cwd=sim_dir)
+        if library is not None:
+            return test_name, self._questa_elaborate(test_case, sim_dir, library, log_name)
+
+        build_cmd = []
+        build_cmd.append("qrun")
+        build_cmd.append("-64")
+        if contains_sv:
+            build_cmd.append("-sv")
+        build_cmd.append("-timescale=1ns/100ps")
+        for param, value in test_case.items():
+            build_cmd.append("-g")
+            build_cmd.append(f"{param}={value}")
+        for f in self.files:
+            build_cmd.append(f)
+        build_cmd.append("-top")
+        build_cmd.append(self.config["top"])
+        returncode, _ = self._run_tool(build_cmd, sim_dir, log_name, stage="qrun")
+
+        return test_name, returncode
+
+    def questa_sim(self, jobs=1, profile=False, compile_once=False):
+        contains_sv = any(pathlib.Path(f).suffix in (".sv", ".svh") for f in self.files)
+
+        # Compile once, then only elaborate and simulate each test case
+        library = self._questa_compile(contains_sv) if compile_once else None
 
-            if ret.returncode != 0:
+        tests_failed = 0
+        tests_cancelled = 0
+        failed_tests = []
+        profiles = []
+        results = []
+
+        def run(test_case, log_name):
+            test_name, returncode = self._questa_run(test_case, contains_sv, log_name, library)
+            metrics = profile_metrics(
+                load_profile(os.path.join(self.artifacts.root, "build_questa", test_name))
+            )
+
+            # Tests that were terminated, or never started, because the run was
+            # cancelled didn't fail
+            cancelled = returncode != 0 and self._cancelled.is_set()
+            failed = returncode != 0 and not cancelled
+            self.artifacts.finalize(os.path.join("build_questa", test_name), failed)
+            return test_name, returncode, metrics, cancelled
+
+        # Iterate over all parameter combinations and build each one
+        for test_case, (test_name, returncode, metrics, cancelled) in self._run_parallel(run, jobs):
+            profiles.append(metrics)
+            if cancelled:
+                status = "CANCELLED"
+            else:
+                status = "PASS" if returncode == 0 else "FAIL"
+            results.append((test_case, dict(profiles[-1], Status=status)))
+            if self._on_result is not None:
+                self._on_result(test_case, results[-1][1], os.path.join("build_questa", test_name))
+            if cancelled:
+                tests_cancelled += 1
+            elif returncode != 0:
                 tests_failed += 1
                 failed_tests.append(test_name)
 
@@ -377,3 +1856,51 @@ class FlexConfig:
             print("----------------------------------------------------------------------")
         # else:
         #    print(f"\nSUCCESS: All tests passed.")
+        if tests_cancelled > 0:
+            print(f"Tests cancelled: {tests_cancelled}")
+
+        # Simulation results aren't stored, so the profiles are summarized here
+        if profile:
+            print_profile_summary(profile_summary(profiles))
+        self.artifacts.summary()
+
+        return results
+
+    def watch(self, run, interval=1.0):
+        # Runs run() (e.g., lambda: dut.questa_sim(compile_once=True)), and runs
+        # it again whenever a source file that the top level depends on changes,
+        # printing what passed or failed and which metrics changed. Results of
+        # combinations whose inputs didn't change come from the cache, and only
+        # changed files are recompiled into the Questa library. Stop with Ctrl+C.
+        self._dependencies = DependencyMap(self.files)
+        watcher = FileWatcher(self._dependencies.sources())
+        previous = None
+        try:
+            while True:
+                self._sources_hash = None
+                try:
+                    results = run()
+                    print_summary(previous, results)
+                    previous = results if results is not None else previous
+                except SystemExit as e:
+                    # Errors (e.g., a file that doesn't compile) are fixed by the
+                    # next edit
+                    print(e.code)
+
+                print(f"Watching {len(watcher.state)} files for changes (Ctrl+C to stop)...")
+                while True:
+                    changed = watcher.wait(interval)
+
+                    # Edits can add or remove dependencies (and included files)
+                    self._dependencies = DependencyMap(self.files)
+                    watcher.watch(self._dependencies.sources())
+
+                    used = set(self._dependencies.top_sources(self.config["top"]))
+                    affected = self._dependencies.dependents(changed) & used
+                    names = ", ".join(os.path.basename(f) for f in sorted(changed))
+                    if affected:
+                        print(f"Changed: {names}")
+                        break
+                    print(f"Changed: {names} (not used by {self.config['top']}, nothing to run)")
+        except KeyboardInterrupt:
+            print("Stopped watching.")
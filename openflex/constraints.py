@@ -0,0 +1,358 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import ast
+import math
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Combinations are checked in blocks of this many points at once with NumPy
+CHUNK_SIZE = 65536
+
+# Functions that expressions may call, as (scalar, NumPy) implementations
+FUNCTIONS = {
+    "min": (min, lambda *a: _reduce(numpy.minimum, a)),
+    "max": (max, lambda *a: _reduce(numpy.maximum, a)),
+    "abs": (abs, lambda a: numpy.abs(a)),
+    "log2": (math.log2, lambda a: numpy.log2(a)),
+    "clog2": (
+        lambda a: max(int(a) - 1, 0).bit_length(),
+        lambda a: numpy.ceil(numpy.log2(numpy.maximum(a, 1))).astype(int),
+    ),
+    "ceil": (math.ceil, lambda a: numpy.ceil(a)),
+    "floor": (math.floor, lambda a: numpy.floor(a)),
+    "int": (int, lambda a: numpy.trunc(a).astype(int)),
+}
+
+# Helpers that the compiled expressions use for logic, which is element-wise
+# with NumPy
+SCALAR_HELPERS = {
+    "_and": lambda a, b: a and b,
+    "_or": lambda a, b: a or b,
+    "_not": lambda a: not a,
+    "_where": lambda c, a, b: a if c else b,
+}
+
+# Integer arithmetic that NumPy would let wrap around silently, as the helpers
+# that check it in the vectorized expressions
+CHECKED = {ast.Add: "_add", ast.Sub: "_sub", ast.Mult: "_mul", ast.Pow: "_pow"}
+
+# Integer results at least this large (int64 ends at 2**63, and this leaves a
+# margin for the rounding of the floating-point estimate) are evaluated like
+# apply() does, with Python's unbounded integers
+INT_LIMIT = 2.0**62
+
+OPERATORS = (
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.USub,
+    ast.UAdd,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+)
+
+
+def _reduce(f, args):
+    result = args[0]
+    for a in args[1:]:
+        result = f(result, a)
+    return result
+
+
+def _checked(f):
+    # f (an operator), raising OverflowError for integer results that may have
+    # wrapped around, which a floating-point estimate of the result detects
+    def checked(a, b):
+        result = f(a, b)
+        if isinstance(result, (numpy.ndarray, numpy.generic)) and result.dtype.kind in "iu":
+            estimate = f(numpy.asarray(a, dtype=float), numpy.asarray(b, dtype=float))
+            if numpy.any(numpy.abs(estimate) >= INT_LIMIT):
+                raise OverflowError("integer overflow")
+        return result
+
+    return checked
+
+
+VECTOR_HELPERS = {name: _checked(getattr(operator, name[1:])) for name in CHECKED.values()}
+
+
+def to_value(value):
+    # YAML values are strings; numbers are compared as numbers
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            pass
+
+    return value
+
+
+def from_value(value):
+    # A computed value as a parameter value: integral results are integers, so
+    # that e.g. "WIDTH / 2" gives 8 rather than 8.0
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class _Rewriter(ast.NodeTransformer):
+    # Only arithmetic, comparisons, logic, conditionals, and the FUNCTIONS are
+    # allowed. Logic and conditionals are rewritten as calls of the helpers, and
+    # chained comparisons as a conjunction of comparisons. With checked, the
+    # CHECKED arithmetic is rewritten as calls of its helpers too.
+
+    def __init__(self, expression, checked=False) -> None:
+        self.expression = expression
+        self.checked = checked
+        self.names = set()
+
+    def error(self, node):
+        return ValueError(f"Unsupported {type(node).__name__} in expression '{self.expression}'.")
+
+    def generic_visit(self, node):
+        if isinstance(node, OPERATORS + (ast.Expression, ast.Load)):
+            return super().generic_visit(node)
+        if isinstance(node, (ast.BinOp, ast.UnaryOp)) and not isinstance(node.op, ast.Not):
+            return super().generic_visit(node)
+        raise self.error(node)
+
+    def visit_BinOp(self, node):
+        node = self.generic_visit(node)
+        if self.checked and type(node.op) in CHECKED:
+            return self._call(CHECKED[type(node.op)], [node.left, node.right])
+        return node
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float, str)):
+            raise self.error(node)
+        return node
+
+    def visit_Name(self, node):
+        self.names.add(node.id)
+        return node
+
+    def _call(self, name, args):
+        return ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise self.error(node)
+        node.args = [self.visit(a) for a in node.args]
+        return node
+
+    def visit_BoolOp(self, node):
+        helper = "_and" if isinstance(node.op, ast.And) else "_or"
+        values = [self.visit(v) for v in node.values]
+        return _reduce(lambda a, b: self._call(helper, [a, b]), values)
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return self._call("_not", [self.visit(node.operand)])
+        return self.generic_visit(node)
+
+    def visit_IfExp(self, node):
+        return self._call(
+            "_where", [self.visit(node.test), self.visit(node.body), self.visit(node.orelse)]
+        )
+
+    def visit_Compare(self, node):
+        for op in node.ops:
+            if not isinstance(op, OPERATORS):
+                raise self.error(op)
+
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        comparisons = [
+            ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]])
+            for i, op in enumerate(node.ops)
+        ]
+        return _reduce(lambda a, b: self._call("_and", [a, b]), comparisons)
+
+
+class Expression:
+    # An expression over parameter values (e.g., "DEPTH * WIDTH <= 65536"),
+    # compiled once, that is evaluated either for one combination (a dict) or
+    # column-wise, for NumPy arrays of many combinations' values at once.
+
+    def __init__(self, expression) -> None:
+        self.expression = str(expression)
+        try:
+            tree = ast.parse(self.expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression '{self.expression}': {e.msg}")
+
+        # The rewriters change the tree, so the vectorized version gets a copy
+        vector_tree = ast.parse(self.expression.strip(), mode="eval")
+        rewriter = _Rewriter(self.expression)
+        tree = ast.fix_missing_locations(rewriter.visit(tree))
+        vector_tree = ast.fix_missing_locations(_Rewriter(self.expression, True).visit(vector_tree))
+        self.names = rewriter.names - set(FUNCTIONS)
+        self.code = compile(tree, f"<{self.expression}>", "eval")
+        self.vector_code = compile(vector_tree, f"<{self.expression}>", "eval")
+
+    def evaluate(self, values, vectorized=False):
+        if vectorized:
+            namespace = {"_and": numpy.logical_and, "_or": numpy.logical_or}
+            namespace.update({"_not": numpy.logical_not, "_where": numpy.where})
+            namespace.update({name: f[1] for name, f in FUNCTIONS.items()})
+            namespace.update(VECTOR_HELPERS)
+            code = self.vector_code
+        else:
+            namespace = dict(SCALAR_HELPERS)
+            namespace.update({name: f[0] for name, f in FUNCTIONS.items()})
+            code = self.code
+
+        namespace.update(values)
+        try:
+            return eval(code, {"__builtins__": {}}, namespace)
+        except NameError as e:
+            raise ValueError(f"Unknown parameter in expression '{self.expression}': {e}.")
+        except (ArithmeticError, TypeError) as e:
+            raise ValueError(f"Can't evaluate expression '{self.expression}': {e}")
+
+
+class Constraints:
+    # The YAML "derived" parameters (name: expression, computed in order, so
+    # later ones can use earlier ones) and "constraints" (expressions that a
+    # combination must satisfy to be run), e.g.:
+    #     derived:
+    #       OUTPUT_WIDTH: 2 * INPUT_WIDTH
+    #     constraints:
+    #       - DEPTH * WIDTH <= 65536
+
+    def __init__(self, derived=None, constraints=None) -> None:
+        self.derived = [(name, Expression(e)) for name, e in dict(derived or {}).items()]
+        if isinstance(constraints, (str, int, float)):
+            constraints = [constraints]
+        self.constraints = [Expression(e) for e in constraints or []]
+
+    @classmethod
+    def from_config(cls, config):
+        if not config.get("derived") and not config.get("constraints"):
+            return None
+        return cls(config.get("derived"), config.get("constraints"))
+
+    def check(self, parameters):
+        # Raises ValueError for expressions that use unknown names, and derived
+        # parameters that are also parameters
+        known = set(parameters)
+        for name, expression in self.derived:
+            if name in parameters:
+                raise ValueError(f"Derived parameter {name} is also a parameter.")
+            self._check(expression, known)
+            known.add(name)
+
+        for expression in self.constraints:
+            self._check(expression, known)
+
+    def _check(self, expression, known):
+        unknown = sorted(expression.names - known)
+        if unknown:
+            raise ValueError(
+                f"Unknown parameter {unknown[0]} in expression '{expression.expression}'."
+            )
+
+    def names(self):
+        # The names of the derived parameters, in order
+        return [name for name, _ in self.derived]
+
+    def apply(self, points):
+        # Adds the derived parameters to each combination (a dict), and skips the
+        # combinations that violate a constraint
+        for p in points:
+            values = {k: to_value(v) for k, v in p.items()}
+            for name, expression in self.derived:
+                values[name] = expression.evaluate(values)
+
+            if all(c.evaluate(values) for c in self.constraints):
+                p = dict(p)
+                for name, _ in self.derived:
+                    p[name] = from_value(values[name])
+                yield p
+
+    def evaluate(self, columns, shape):
+        # Column-wise version of apply() for an array (of the given shape) of
+        # combinations. columns maps each parameter to an array of its values
+        # that broadcasts to the shape (or a single value). Returns the mask of
+        # the combinations that satisfy the constraints, and the arrays of the
+        # derived parameters. Floating-point errors (e.g., a division by zero)
+        # and integer overflow raise rather than giving inf, nan, or wrapped
+        # around values, and when NumPy can't evaluate the block, each
+        # combination is evaluated like apply() does, which only raises for the
+        # combinations that pass the earlier constraints.
+        try:
+            with numpy.errstate(all="raise"):
+                return self._evaluate(columns, shape)
+        except ValueError:
+            return self._evaluate_each(columns, shape)
+
+    def _evaluate(self, columns, shape):
+        columns = dict(columns)
+        derived = {}
+        for name, expression in self.derived:
+            derived[name] = columns[name] = expression.evaluate(columns, True)
+
+        mask = numpy.ones(shape, dtype=bool)
+        for c in self.constraints:
+            mask &= numpy.asarray(c.evaluate(columns, True), dtype=bool)
+
+        return mask, {k: numpy.broadcast_to(v, shape) for k, v in derived.items()}
+
+    def _evaluate_each(self, columns, shape):
+        names = list(columns)
+        rows = zip(*(numpy.broadcast_to(columns[n], shape).ravel().tolist() for n in names))
+
+        size = math.prod(shape)
+        mask = numpy.zeros(size, dtype=bool)
+        derived = {name: numpy.empty(size, dtype=object) for name in self.names()}
+        for i, row in enumerate(rows):
+            values = dict(zip(names, row))
+            for name, expression in self.derived:
+                values[name] = derived[name][i] = expression.evaluate(values)
+            mask[i] = all(c.evaluate(values) for c in self.constraints)
+
+        return mask.reshape(shape), {k: v.reshape(shape) for k, v in derived.items()}
+
+
+def value_array(values):
+    # NumPy array of a parameter's values: numeric if they all are, otherwise an
+    # array of objects, so that e.g. the 8 of [8, auto] still compares as a number
+    # and operations on the strings behave as they do in apply()
+    converted = [to_value(v) for v in values]
+    if all(isinstance(v, (int, float)) for v in converted):
+        return numpy.array(converted)
+
+    array = numpy.empty(len(converted), dtype=object)
+    array[:] = converted
+    return array
@@ -0,0 +1,374 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import math
+import random
+
+from .results import ResultsTable, to_number
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Objective aliases: "area" is the tool's logic utilization (LUTs or ALMs)
+OBJECTIVES = {
+    "fmax": [("fMax", 1)],
+    "area": [("area", -1)],
+    "luts": [("area", -1)],
+    "alms": [("area", -1)],
+    "pareto": [("fMax", 1), ("area", -1)],
+}
+
+
+def parse_objectives(spec):
+    # Returns a list of (metric, direction), where direction is 1 to maximize and
+    # -1 to minimize. spec is an alias (see OBJECTIVES) or a comma-separated list
+    # of "max:<metric>"/"min:<metric>", e.g., "max:fMax,min:Registers (Used)".
+    if isinstance(spec, str) and spec.lower() in OBJECTIVES:
+        return list(OBJECTIVES[spec.lower()])
+
+    items = spec.split(",") if isinstance(spec, str) else list(spec)
+    objectives = []
+    for item in items:
+        direction, _, metric = item.strip().partition(":")
+        if direction not in ("max", "min") or not metric:
+            raise ValueError(f"Invalid objective '{item}' (expected max:<metric> or min:<metric>).")
+        objectives.append((metric, 1 if direction == "max" else -1))
+
+    return objectives
+
+
+def area_metric(rows):
+    # The logic utilization column of a tool's results, e.g., "CLB LUTs (Used)"
+    # (Vivado) or "ALMs" (Quartus). Post-synthesis estimates ("Synth ...") are
+    # not results.
+    for unit in ("alm", "lut"):
+        for row in rows:
+            for column in row:
+                name = column.lower()
+                if unit in name and "(total)" not in name and not name.startswith("synth "):
+                    return column
+
+    return None
+
+
+def dominates(a, b):
+    # Objective values are oriented so that larger is better
+    return all(x >= y for x, y in zip(a, b)) and any(x > y for x, y in zip(a, b))
+
+
+def pareto_front(points):
+    # Indices of the non-dominated points (lists of objective values)
+    return [
+        i
+        for i, p in enumerate(points)
+        if not any(dominates(q, p) for j, q in enumerate(points) if j != i)
+    ]
+
+
+def cholesky(a):
+    # Lower-triangular L with L * L^T = a (a must be positive definite)
+    if numpy is not None:
+        return numpy.linalg.cholesky(numpy.array(a)).tolist()
+
+    n = len(a)
+    L = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            s = a[i][j] - sum(L[i][k] * L[j][k] for k in range(j))
+            if i == j:
+                if s <= 0.0:
+                    raise ValueError("matrix is not positive definite")
+                L[i][j] = math.sqrt(s)
+            else:
+                L[i][j] = s / L[j][j]
+
+    return L
+
+
+def solve_lower(L, b):
+    x = []
+    for i, row in enumerate(L):
+        x.append((b[i] - sum(row[k] * x[k] for k in range(i))) / row[i])
+
+    return x
+
+
+def solve_upper_t(L, b):
+    # Solves L^T * x = b
+    n = len(L)
+    x = [0.0] * n
+    for i in reversed(range(n)):
+        x[i] = (b[i] - sum(L[k][i] * x[k] for k in range(i + 1, n))) / L[i][i]
+
+    return x
+
+
+class GaussianProcess:
+    # Gaussian process regression with a squared-exponential kernel over feature
+    # vectors scaled to [0, 1]. The length scale is picked from a small grid by
+    # marginal likelihood. Pure Python, with NumPy used for the factorization
+    # when it's installed; the explorer keeps the number of observations small.
+
+    LENGTH_SCALES = (0.1, 0.2, 0.4, 0.8)
+
+    def __init__(self, noise=1e-3) -> None:
+        self.noise = noise
+
+    def _kernel(self, a, b):
+        d = sum((x - y) ** 2 for x, y in zip(a, b))
+        return math.exp(-0.5 * d / self.length_scale**2)
+
+    def _factor(self, length_scale):
+        self.length_scale = length_scale
+        n = len(self.X)
+        K = [[self._kernel(self.X[i], self.X[j]) for j in range(n)] for i in range(n)]
+        for i in range(n):
+            K[i][i] += self.noise
+
+        L = cholesky(K)
+        alpha = solve_upper_t(L, solve_lower(L, self.y))
+        fit = -0.5 * sum(a * y for a, y in zip(alpha, self.y)) - sum(
+            math.log(L[i][i]) for i in range(n)
+        )
+        return fit, L, alpha
+
+    def fit(self, X, y):
+        self.X = X
+        self.mean = sum(y) / len(y)
+        self.std = math.sqrt(sum((v - self.mean) ** 2 for v in y) / len(y)) or 1.0
+        self.y = [(v - self.mean) / self.std for v in y]
+
+        best = None
+        for length_scale in self.LENGTH_SCALES:
+            try:
+                result = (self._factor(length_scale), length_scale)
+            except ValueError:
+                continue
+            if best is None or result[0][0] > best[0][0]:
+                best = result
+
+        (_, self.L, self.alpha), self.length_scale = best
+        return self
+
+    def predict(self, x):
+        # Returns the mean and standard deviation at x
+        k = [self._kernel(x, xi) for xi in self.X]
+        mean = sum(a * b for a, b in zip(k, self.alpha))
+        v = solve_lower(self.L, k)
+        variance = max(1.0 + self.noise - sum(a * a for a in v), 1e-12)
+
+        return self.mean + self.std * mean, self.std * math.sqrt(variance)
+
+
+class Encoder:
+    # Maps combinations to feature vectors in [0, 1]: numeric parameters are
+    # scaled to their range, and other parameters are one-hot encoded.
+
+    def __init__(self, points) -> None:
+        values = {}
+        for p in points:
+            for name, value in p.items():
+                values.setdefault(name, set()).add(str(value))
+
+        self.features = []
+        for name in sorted(values):
+            numbers = [to_number(v) for v in values[name]]
+            if None not in numbers:
+                low, high = min(numbers), max(numbers)
+                self.features.append((name, "number", (low, (high - low) or 1.0)))
+            else:
+                self.features.append((name, "category", sorted(values[name])))
+
+    def encode(self, p):
+        x = []
+        for name, kind, info in self.features:
+            value = p.get(name)
+            if kind == "number":
+                number = to_number(value)
+                x.append(0.5 if number is None else (number - info[0]) / info[1])
+            else:
+                x.extend(1.0 if str(value) == v else 0.0 for v in info)
+
+        return x
+
+
+def point_key(point):
+    return tuple(sorted((k, str(v)) for k, v in point.items()))
+
+
+class Explorer:
+    # Model-based design-space exploration. Candidates are sampled from the
+    # combinations (so YAML parameters, groups, filters, and added parameters all
+    # apply), and every round runs a batch of candidates picked by a Gaussian
+    # process surrogate per objective, fit to every result of the design so far
+    # (including earlier sweeps in the results database).
+    #
+    # Each pick maximizes an upper confidence bound of a randomly weighted sum of
+    # the (normalized) objectives, so multi-objective runs spread out along the
+    # Pareto front, and the random bound widths keep the picks of a batch apart.
+    #
+    # Fitting a surrogate takes O(n^3) in the number of observations, so with a
+    # long history only MAX_OBSERVATIONS are used: the best ones for each
+    # objective, and a random sample of the others.
+
+    MAX_OBSERVATIONS = 200
+
+    def __init__(self, objectives, budget, batch=1, pool=500, initial=None, seed=None) -> None:
+        self.objectives = parse_objectives(objectives)
+        self.budget = int(budget)
+        self.batch = max(1, int(batch))
+        self.pool = int(pool)
+        self.initial = initial
+        self.random = random.Random(seed)
+        self.area = None
+        self.names = []
+
+    def _observations(self, rows, names):
+        # The best row of each combination (e.g., over its implementation runs),
+        # keyed by point_key(). names are the parameter names of the candidates.
+        observed = {}
+        for row in rows:
+            values = self._values(row)
+            if values is None:
+                continue
+
+            for n in names:
+                if all(name in row for name in n):
+                    key = tuple((name, str(row[name])) for name in n)
+                    if key not in observed or values > observed[key][1]:
+                        observed[key] = (row, values)
+
+        return observed
+
+    def metrics(self):
+        # Names of the objective metrics (after the first results are in)
+        return [self.area if metric == "area" else metric for metric, _ in self.objectives]
+
+    def _values(self, row):
+        # Objective values of a row, oriented so that larger is better
+        values = []
+        for metric, direction in self.objectives:
+            number = to_number(row.get(self.area if metric == "area" else metric))
+            if number is None:
+                return None
+            values.append(direction * number)
+
+        return values
+
+    def _training(self, observed):
+        # At most MAX_OBSERVATIONS of the observations
+        if len(observed) <= self.MAX_OBSERVATIONS:
+            return observed
+
+        keys = list(observed)
+        best = self.MAX_OBSERVATIONS // (2 * len(self.objectives))
+        kept = set()
+        for i in range(len(self.objectives)):
+            ranked = sorted(keys, key=lambda k: observed[k][1][i], reverse=True)
+            kept.update(ranked[:best])
+
+        others = [k for k in keys if k not in kept]
+        kept.update(self.random.sample(others, self.MAX_OBSERVATIONS - len(kept)))
+        return {k: observed[k] for k in keys if k in kept}
+
+    def _pick(self, candidates, observed, encoder, count):
+        # Fits one surrogate per objective and picks count candidates
+        observed = self._training(observed)
+        X = [encoder.encode(dict(key)) for key in observed]
+        models = []
+        for i in range(len(self.objectives)):
+            y = [values[i] for _, values in observed.values()]
+            models.append(GaussianProcess().fit(X, y))
+
+        predictions = []
+        for key in candidates:
+            x = encoder.encode(dict(key))
+            predictions.append([m.predict(x) for m in models])
+
+        # Objectives are normalized by their observed spread
+        spreads = [m.std for m in models]
+
+        picks = []
+        remaining = list(range(len(candidates)))
+        for _ in range(min(count, len(candidates))):
+            weights = [self.random.random() for _ in self.objectives]
+            weights = [w / (sum(weights) or 1.0) for w in weights]
+            beta = self.random.uniform(0.5, 3.0)
+
+            def score(i):
+                return sum(
+                    w * (mean + beta * std) / s
+                    for w, (mean, std), s in zip(weights, predictions[i], spreads)
+                )
+
+            best = max(remaining, key=score)
+            remaining.remove(best)
+            picks.append(candidates[best])
+
+        return picks
+
+    def run(self, combinations, history, run_batch):
+        # history() returns every stored result row of the design, and
+        # run_batch(points) runs a list of combinations. Returns the best results:
+        # the Pareto front for several objectives.
+        try:
+            pool = combinations.sample(self.pool, self.random)
+        except ValueError:
+            # Fewer combinations than the pool: all of them are candidates
+            pool = combinations
+        candidates = {point_key(p): p for p in pool}
+        names = {tuple(k for k, _ in key) for key in candidates}
+        self.names = sorted({n for key in names for n in key})
+        tried = set()
+
+        runs = 0
+        while runs < self.budget:
+            rows = history()
+            self.area = area_metric(rows)
+            observed = self._observations(rows, names)
+
+            # Candidates that were run but have no results (failed) aren't retried
+            unexplored = [k for k in candidates if k not in observed and k not in tried]
+            if not unexplored:
+                break
+
+            encoder = Encoder(list(candidates.values()) + [dict(k) for k in observed])
+            initial = self.initial or max(4, min(2 * len(encoder.features) + 2, self.budget // 2))
+
+            count = min(self.batch, self.budget - runs)
+            if len(observed) < initial:
+                picks = self.random.sample(unexplored, min(count, len(unexplored)))
+            else:
+                picks = self._pick(unexplored, observed, encoder, count)
+
+            print(f"Explore: running {len(picks)} of {len(unexplored)} unexplored candidates")
+            run_batch([candidates[k] for k in picks])
+            tried.update(picks)
+            runs += len(picks)
+
+        rows = history()
+        self.area = area_metric(rows)
+        best = list(self._observations(rows, names).values())
+        front = pareto_front([values for _, values in best])
+
+        return ResultsTable(
+            sorted((best[i][0] for i in front), key=lambda r: self._values(r), reverse=True)
+        )
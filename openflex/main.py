@@ -20,19 +20,149 @@
 import sys
 import click
 from .config import FlexConfig
+from .backend import BACKENDS, backend_from_config
+from .artifacts import RETENTION, ArtifactPolicy
 
 
 @click.command()
 @click.argument("config_file")
 @click.option("-m", "--mode", help="sim or synth")
-@click.option("-t", "--tool", help="questa, quartus, vivado")
+@click.option("-t", "--tool", help="questa, quartus, vivado, yosys")
 @click.option("-c", "--synth_csv", help="results csv file for synthesis runs")
 @click.option("-p", "--clk_period", help="clock period", default="1.0")
 @click.option("-s", "--sample", help="randomly sample specified amount")
+@click.option(
+    "-j", "--jobs", type=int, default=1, help="combinations to run concurrently (0 = all cores)"
+)
+@click.option("--fmax-search", is_flag=True, help="search for the tightest passing clock period")
+@click.option("--fmax-tolerance", type=float, default=0.05, help="fMax search tolerance (ns)")
+@click.option("--fmax-max-runs", type=int, default=8, help="maximum tool runs per fMax search")
+@click.option("--session", is_flag=True, help="drive one long-lived tool process per worker")
+@click.option("--db", help="results database (default: openflex_results.db)")
+@click.option("--cache-dir", help="directory of the persistent result cache")
+@click.option("--no-cache", is_flag=True, help="always re-run the tools, ignoring cached results")
+@click.option("--profile", is_flag=True, help="print per-stage runtime and peak memory")
+@click.option("--memory-limit", type=float, help="total peak memory (MB) of concurrent jobs")
+@click.option("--licenses", type=int, help="maximum number of concurrent tool licenses")
+@click.option("--threads", type=int, help="threads per tool run (Vivado general.maxThreads)")
+@click.option(
+    "--compile-once", is_flag=True, help="compile sources once, elaborate each simulation"
+)
+@click.option("--explore", help="search toward an objective: fmax, area, pareto, max:<m>,min:<m>")
+@click.option("--budget", type=int, help="combinations to run when exploring (default: 20)")
+@click.option("--prune", help="drop combinations dominated after synthesis (e.g., pareto)")
+@click.option(
+    "--prune-max",
+    multiple=True,
+    help="drop combinations whose post-synthesis estimate exceeds METRIC=VALUE",
+)
+@click.option("--dedup", is_flag=True, help="reuse results of combinations with identical netlists")
+@click.option("--nextpnr", is_flag=True, help="place and route yosys runs with nextpnr")
+@click.option("--watch", is_flag=True, help="re-run when source files change")
+@click.option(
+    "--retention", type=click.Choice(RETENTION), help="build artifacts kept after each run"
+)
+@click.option("--scratch", help="local scratch directory (e.g., a tmpfs) to build in")
+@click.option("--backend", type=click.Choice(BACKENDS), help="where synthesis runs execute")
+@click.option("--shared-dir", help="shared filesystem directory for cluster jobs and builds")
 @click.version_option()
-def run(config_file, mode, tool, synth_csv, clk_period, sample):
+def run(
+    config_file,
+    mode,
+    tool,
+    synth_csv,
+    clk_period,
+    sample,
+    jobs,
+    fmax_search,
+    fmax_tolerance,
+    fmax_max_runs,
+    session,
+    db,
+    cache_dir,
+    no_cache,
+    profile,
+    memory_limit,
+    licenses,
+    threads,
+    backend,
+    shared_dir,
+    compile_once,
+    explore,
+    budget,
+    prune,
+    prune_max,
+    dedup,
+    nextpnr,
+    watch,
+    retention,
+    scratch,
+):
     dut = FlexConfig(config_file)
 
+    if db:
+        dut.results_file = db
+
+    if no_cache:
+        dut.cache = None
+    elif cache_dir:
+        dut.cache.cache_dir = cache_dir
+
+    if memory_limit:
+        dut.memory_limit = memory_limit
+    if licenses:
+        dut.licenses = licenses
+    if threads:
+        dut.threads = threads
+
+    # The command line can add to the prune section of the YAML
+    if prune or prune_max:
+        prune_config = dict(dut.prune or {})
+        if prune:
+            prune_config["objective"] = prune
+        if prune_max:
+            limits = dict(prune_config.get("max", {}))
+            for limit in prune_max:
+                metric, _, value = limit.rpartition("=")
+                if not metric:
+                    sys.exit(f"ERROR: Invalid --prune-max '{limit}' (expected METRIC=VALUE).")
+                limits[metric] = value
+            prune_config["max"] = limits
+        dut.prune = prune_config
+
+    if dedup:
+        dut.dedup = True
+
+    if nextpnr:
+        dut.config["yosys"] = dict(dut.config.get("yosys", {}), nextpnr="true")
+
+    # The command line can override the artifacts section of the YAML
+    if retention or scratch:
+        artifacts_config = dut.artifacts.to_config()
+        if retention:
+            artifacts_config["retention"] = retention
+        if scratch:
+            artifacts_config["scratch"] = scratch
+        try:
+            dut.artifacts = ArtifactPolicy.from_config(artifacts_config)
+        except ValueError as e:
+            sys.exit(f"ERROR: {e}")
+
+    # The command line can override the backend section of the YAML
+    if backend or shared_dir:
+        backend_config = dut.config.get("backend") or {}
+        if isinstance(backend_config, str):
+            backend_config = {"type": backend_config}
+        backend_config = dict(backend_config)
+        if backend:
+            backend_config["type"] = backend
+        if shared_dir:
+            backend_config["shared_dir"] = shared_dir
+        try:
+            dut.backend = backend_from_config(backend_config)
+        except ValueError as e:
+            sys.exit(f"ERROR: {e}")
+
     # The command line can override the mode and tool of the YAML
     mode = mode if mode else dut.config["mode"]
     tool = tool if tool else dut.config["tool"]
@@ -40,19 +170,54 @@ def run(config_file, mode, tool, synth_csv, clk_period, sample):
     if sample:
         dut.sample(sample)
 
-    if mode == "sim":
-        if tool == "questa":
-            dut.questa_sim()
-        else:
-            sys.exit("ERROR: Invalid simulator.")
-    elif mode == "synth":
-        if not synth_csv:
-            sys.exit("ERROR: Missing CSV filename")
-        if tool == "vivado":
-            dut.vivado_synth(synth_csv, clk_period)
-        elif tool == "quartus":
-            dut.quartus_synth(synth_csv, clk_period)
+    def run_once():
+        # Returns the results, which watch mode compares between runs
+        if mode == "sim":
+            if tool == "questa":
+                return dut.questa_sim(
+                    jobs=jobs, profile=profile, compile_once=compile_once or watch
+                )
+            else:
+                sys.exit("ERROR: Invalid simulator.")
+        elif mode == "synth":
+            search = dict(
+                fmax_search=fmax_search,
+                fmax_tolerance=fmax_tolerance,
+                fmax_max_runs=fmax_max_runs,
+                session=session,
+            )
+            # Explore the combinations instead of running all of them
+            results = None
+            explore_config = dut.config.get("explore")
+            if explore or budget or explore_config:
+                explore_config = dict(explore_config or {})
+                dut.explore(
+                    explore if explore else explore_config.get("objective", "fmax"),
+                    budget if budget else int(explore_config.get("budget", 20)),
+                    synth_csv,
+                    clk_period,
+                    jobs,
+                    tool,
+                    int(explore_config.get("pool", 500)),
+                    explore_config.get("seed"),
+                    **search,
+                )
+            elif tool == "vivado":
+                results = dut.vivado_synth(synth_csv, clk_period, jobs=jobs, **search)
+            elif tool == "quartus":
+                results = dut.quartus_synth(synth_csv, clk_period, jobs=jobs, **search)
+            elif tool == "yosys":
+                results = dut.yosys_synth(synth_csv, clk_period, jobs=jobs, **search)
+            else:
+                sys.exit("ERROR: Invalid synthesis tool.")
+
+            if profile:
+                dut.profile(tool)
+            return results
         else:
-            sys.exit("ERROR: Invalid synthesis tool.")
+            sys.exit("ERROR: Invalid mode.")
+
+    if watch:
+        dut.watch(run_once)
     else:
-        sys.exit("ERROR: Invalid mode.")
+        run_once()
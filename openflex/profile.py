@@ -0,0 +1,359 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import sys
+import json
+import time
+import threading
+import signal
+import subprocess
+
+# Flow scripts print this marker (followed by the stage name) at the start of
+# each stage, e.g., "OPENFLEX_STAGE:place_design".
+STAGE_MARKER = "OPENFLEX_STAGE:"
+
+PROFILE_FILE = "openflex_profile.json"
+
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = None
+    PAGE_SIZE = None
+
+
+def _proc_stat(pid):
+    # Returns (ppid, cpu seconds including reaped children) from /proc/<pid>/stat
+    with open(f"/proc/{pid}/stat", "r") as file:
+        fields = file.read().rsplit(")", 1)[1].split()
+
+    cpu = sum(int(f) for f in fields[11:15]) / CLOCK_TICKS
+    return int(fields[1]), cpu
+
+
+def _proc_rss(pid):
+    with open(f"/proc/{pid}/statm", "r") as file:
+        return int(file.read().split()[1]) * PAGE_SIZE
+
+
+def _process_tree(root):
+    # A process and all of its descendants (parents first), and the CPU times of
+    # all processes. Returns None without /proc.
+    if CLOCK_TICKS is None or not os.path.isdir("/proc"):
+        return None
+
+    parents = {}
+    cpu_times = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                parents[int(entry)], cpu_times[int(entry)] = _proc_stat(entry)
+            except (OSError, IndexError, ValueError):
+                pass
+
+    if root not in parents:
+        return None
+
+    tree = [root]
+    children = {}
+    for pid, ppid in parents.items():
+        children.setdefault(ppid, []).append(pid)
+    for pid in tree:
+        tree.extend(children.get(pid, []))
+
+    return tree, cpu_times
+
+
+def terminate_process_tree(process):
+    # Tools are started through wrapper scripts, so their descendants are
+    # terminated too. Parents go first: a wrapper that saw its child terminate
+    # first could still exit with 0, and the run wouldn't look cancelled.
+    found = _process_tree(process.pid)
+    if found is None:
+        process.terminate()
+        return
+
+    for pid in found[0]:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def process_tree_usage(root):
+    # Total CPU time (s) and resident memory (bytes) of a process and all of its
+    # descendants. Tools like Vivado are started through wrapper scripts, so the
+    # direct child alone doesn't tell us much. Returns None without /proc.
+    found = _process_tree(root)
+    if found is None:
+        return None
+
+    tree, cpu_times = found
+
+    cpu = 0.0
+    rss = 0
+    for pid in tree:
+        try:
+            rss += _proc_rss(pid)
+            cpu += cpu_times[pid]
+        except (OSError, IndexError, ValueError):
+            pass
+
+    return cpu, rss
+
+
+class ProcessMonitor:
+    # Records wall time, CPU time, and peak memory of a tool run, broken down into
+    # the stages reported by the flow's stage markers. Memory is sampled
+    # periodically in a background thread, so short peaks may be missed.
+
+    def __init__(self, pid, stage="startup", interval=1.0) -> None:
+        self.pid = pid
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.stages = {}
+
+        self.start_time = time.monotonic()
+        usage = process_tree_usage(pid)
+        self.start_cpu = usage[0] if usage else None
+        self._begin(stage, usage)
+
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+
+    def _begin(self, stage, usage):
+        self.stage = stage
+        self.stage_time = time.monotonic()
+        self.stage_cpu = usage[0] if usage else None
+        self.stage_rss = usage[1] if usage else 0
+
+    def _end(self, usage, cpu=None):
+        wall = time.monotonic() - self.stage_time
+        if cpu is None and usage is not None and self.stage_cpu is not None:
+            cpu = usage[0] - self.stage_cpu
+        if usage is not None:
+            self.stage_rss = max(self.stage_rss, usage[1])
+
+        merge_stage(self.stages, self.stage, wall, cpu, self.stage_rss / 2**20)
+
+    def _sample(self):
+        while not self.done.wait(self.interval):
+            usage = process_tree_usage(self.pid)
+            if usage is not None:
+                with self.lock:
+                    self.stage_rss = max(self.stage_rss, usage[1])
+
+    def mark(self, stage):
+        usage = process_tree_usage(self.pid)
+        with self.lock:
+            self._end(usage)
+            self._begin(stage, usage)
+
+    def stop(self, rusage=None):
+        # rusage (from wait4) gives exact totals for a process that has exited.
+        # Otherwise (e.g., a session that stays alive), the totals are the change
+        # in the process tree's usage since the monitor started.
+        self.done.set()
+        self.thread.join()
+
+        usage = process_tree_usage(self.pid)
+        profile = {"wall": time.monotonic() - self.start_time}
+
+        with self.lock:
+            if rusage is not None:
+                cpu = rusage.ru_utime + rusage.ru_stime
+                # The last stage gets whatever CPU time wasn't sampled at a marker
+                sampled = sum(s["cpu"] or 0.0 for s in self.stages.values())
+                self._end(usage, max(cpu - sampled, 0.0) if self.stage_cpu is not None else None)
+                profile["cpu"] = cpu
+                # ru_maxrss is in KB on Linux (bytes on macOS)
+                maxrss = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+                profile["peak_rss"] = max(maxrss / 2**20, max_peak(self.stages))
+            else:
+                self._end(usage)
+                profile["cpu"] = (
+                    usage[0] - self.start_cpu if usage and self.start_cpu is not None else None
+                )
+                profile["peak_rss"] = max_peak(self.stages)
+
+        profile["stages"] = self.stages
+        return profile
+
+
+def merge_stage(stages, name, wall, cpu, peak_rss):
+    if name not in stages:
+        stages[name] = {"wall": 0.0, "cpu": None, "peak_rss": 0.0}
+
+    s = stages[name]
+    s["wall"] += wall
+    if cpu is not None:
+        s["cpu"] = (s["cpu"] or 0.0) + cpu
+    s["peak_rss"] = max(s["peak_rss"], peak_rss)
+
+
+def max_peak(stages):
+    return max([s["peak_rss"] for s in stages.values()] + [0.0])
+
+
+def merge_profiles(a, b):
+    # Combines the profiles of consecutive tool runs for the same result
+    if not a:
+        return b
+
+    merged = {
+        "wall": a["wall"] + b["wall"],
+        "cpu": None if a["cpu"] is None or b["cpu"] is None else a["cpu"] + b["cpu"],
+        "peak_rss": max(a["peak_rss"], b["peak_rss"]),
+        "stages": json.loads(json.dumps(a["stages"])),
+    }
+    for name, s in b["stages"].items():
+        merge_stage(merged["stages"], name, s["wall"], s["cpu"], s["peak_rss"])
+
+    return merged
+
+
+def record_profile(run_dir, profile):
+    path = os.path.join(run_dir, PROFILE_FILE)
+    try:
+        with open(path, "r") as file:
+            profile = merge_profiles(json.load(file), profile)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    with open(path, "w") as file:
+        json.dump(profile, file)
+
+
+def load_profile(run_dir):
+    try:
+        with open(os.path.join(run_dir, PROFILE_FILE), "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def profile_metrics(profile):
+    # Flattens a profile into result columns
+    metrics = {}
+    if not profile:
+        return metrics
+
+    metrics["Time (s)"] = round(profile["wall"], 3)
+    if profile["cpu"] is not None:
+        metrics["CPU Time (s)"] = round(profile["cpu"], 3)
+    metrics["Peak Memory (MB)"] = round(profile["peak_rss"], 1)
+
+    for name, s in profile["stages"].items():
+        metrics[f"{name} Time (s)"] = round(s["wall"], 3)
+        metrics[f"{name} Peak Memory (MB)"] = round(s["peak_rss"], 1)
+
+    return metrics
+
+
+def run_monitored(cmd, cwd, out=None, capture=False, stage="startup", started=None, **kwargs):
+    # Runs a tool, copying its output to out (a file, or None for no copy), while
+    # monitoring its stages. started (if given) is called with the process, e.g.,
+    # to be able to terminate it. Returns the return code, the output (if
+    # captured), and the profile of the run.
+    process = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        bufsize=1,
+        **kwargs,
+    )
+    monitor = ProcessMonitor(process.pid, stage)
+    if started is not None:
+        started(process)
+
+    output = []
+    for line in process.stdout:
+        if line.startswith(STAGE_MARKER):
+            monitor.mark(line[len(STAGE_MARKER) :].strip())
+        if out is not None:
+            out.write(line)
+            out.flush()
+        if capture:
+            output.append(line)
+
+    rusage = None
+    if hasattr(os, "wait4"):
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    else:
+        process.wait()
+
+    profile = monitor.stop(rusage)
+    return process.returncode, "".join(output), profile
+
+
+def profile_summary(rows):
+    # Aggregates the profile columns of result rows per stage: the number of runs,
+    # total/mean/max wall time (s) and peak memory (MB). The whole run is "total".
+    summary = {}
+    for row in rows:
+        for column, value in row.items():
+            if column == "Time (s)":
+                stage, memory = "total", row.get("Peak Memory (MB)")
+            elif column.endswith(" Time (s)") and column != "CPU Time (s)":
+                stage = column[: -len(" Time (s)")]
+                memory = row.get(f"{stage} Peak Memory (MB)")
+            else:
+                continue
+
+            try:
+                wall = float(value)
+                memory = float(memory) if memory not in (None, "") else 0.0
+            except (TypeError, ValueError):
+                continue
+
+            s = summary.setdefault(
+                stage, {"runs": 0, "time": 0.0, "max_time": 0.0, "peak_rss": 0.0}
+            )
+            s["runs"] += 1
+            s["time"] += wall
+            s["max_time"] = max(s["max_time"], wall)
+            s["peak_rss"] = max(s["peak_rss"], memory)
+
+    for s in summary.values():
+        s["mean_time"] = s["time"] / s["runs"]
+
+    return summary
+
+
+def print_profile_summary(summary):
+    if not summary:
+        print("No profiling data found.")
+        return
+
+    print(
+        f"{'Stage':<20}{'Runs':>6}{'Total (s)':>12}{'Mean (s)':>12}{'Max (s)':>12}{'Peak (MB)':>12}"
+    )
+    # Stages in order of their total time, the whole run last
+    stages = sorted((k for k in summary if k != "total"), key=lambda k: -summary[k]["time"])
+    for stage in stages + (["total"] if "total" in summary else []):
+        s = summary[stage]
+        print(
+            f"{stage:<20}{s['runs']:>6}{s['time']:>12.1f}{s['mean_time']:>12.1f}"
+            f"{s['max_time']:>12.1f}{s['peak_rss']:>12.1f}"
+        )
@@ -0,0 +1,94 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import threading
+
+from .results import to_number
+from .explore import area_metric, dominates, parse_objectives
+
+# Prefix of the columns of post-synthesis estimates in the results
+SYNTH_PREFIX = "Synth "
+
+
+class Pruner:
+    # Decides, from the post-synthesis estimates of a combination, whether it is
+    # worth implementing. A combination is pruned when an estimate exceeds a
+    # threshold (e.g., max: {"CLB LUTs (Used)": 20000}, min: {fMax: 250}), or
+    # when its estimates are dominated by a result that was already implemented
+    # for the objectives (e.g., "pareto"). Estimated fMax is an upper bound, as
+    # routing only adds delay, and estimated area is close to the final area.
+    # margin (a fraction) only prunes points that are dominated by that much.
+
+    def __init__(self, config, rows=()) -> None:
+        config = dict(config)
+        self.max = {k: float(v) for k, v in dict(config.get("max", {})).items()}
+        self.min = {k: float(v) for k, v in dict(config.get("min", {})).items()}
+        self.objectives = parse_objectives(config["objective"]) if "objective" in config else []
+        self.margin = float(config.get("margin", 0.0))
+        self.lock = threading.Lock()
+        self.results = []
+        self.pruned = 0
+
+        for row in rows:
+            self.add(row)
+
+    def _values(self, metrics):
+        # Objective values (larger is better), or None if any is missing
+        values = []
+        for metric, direction in self.objectives:
+            number = to_number(metrics.get(area_metric([metrics]) if metric == "area" else metric))
+            if number is None:
+                return None
+            values.append(direction * number)
+
+        return values
+
+    def add(self, metrics):
+        # Adds an implemented result
+        values = self._values(metrics) if self.objectives else None
+        if values is not None:
+            with self.lock:
+                self.results.append(values)
+
+    def check(self, estimates):
+        # Returns the reason to prune a combination, or None to implement it
+        for metric, limit in self.max.items():
+            number = to_number(estimates.get(metric))
+            if number is not None and number > limit:
+                return f"{metric} {number:g} > {limit:g}"
+
+        for metric, limit in self.min.items():
+            number = to_number(estimates.get(metric))
+            if number is not None and number < limit:
+                return f"{metric} {number:g} < {limit:g}"
+
+        values = self._values(estimates) if self.objectives else None
+        if values is not None:
+            with self.lock:
+                results = list(self.results)
+
+            for r in results:
+                if dominates([x - self.margin * abs(v) for x, v in zip(r, values)], values):
+                    return "dominated"
+
+        return None
+
+
+def synth_columns(estimates):
+    return {SYNTH_PREFIX + k: v for k, v in estimates.items()}
@@ -0,0 +1,269 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import csv
+import json
+import time
+import sqlite3
+import threading
+
+
+def to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CsvWriter:
+    # Appends rows (dicts) to a CSV file. The columns always follow the file's
+    # existing header; if a row has new columns, the file is rewritten with the
+    # union of the headers so that columns never silently misalign. The header
+    # is only read once, and the file stays open between rows (until close()),
+    # so a sweep doesn't open and read the file again for every row.
+
+    def __init__(self, csv_filename) -> None:
+        self.csv_filename = csv_filename
+        self.headers = None
+        self.file = None
+        self.writer = None
+
+    def write(self, row):
+        if self.headers is None:
+            self.headers = []
+            if os.path.exists(self.csv_filename):
+                with open(self.csv_filename, "r", newline="") as csv_file:
+                    self.headers = next(csv.reader(csv_file), [])
+
+        if not self.headers:
+            self.close()
+            self.headers = list(row.keys())
+            self._open("w").writerow(self.headers)
+        elif any(h not in self.headers for h in row.keys()):
+            self.close()
+            with open(self.csv_filename, "r", newline="") as csv_file:
+                rows = list(csv.DictReader(csv_file))
+            rows.append(row)
+            self.headers += [h for h in row.keys() if h not in self.headers]
+            write_csv(self.csv_filename, rows, self.headers)
+            return
+
+        writer = self.writer if self.file is not None else self._open("a")
+        writer.writerow([row.get(h, "") for h in self.headers])
+        self.file.flush()
+
+    def _open(self, mode):
+        self.file = open(self.csv_filename, mode, newline="")
+        self.writer = csv.writer(self.file)
+        return self.writer
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
+
+
+def append_csv_row(csv_filename, row):
+    # Appends one row (see CsvWriter)
+    writer = CsvWriter(csv_filename)
+    try:
+        writer.write(row)
+    finally:
+        writer.close()
+
+
+def write_csv(csv_filename, rows, headers=None):
+    if headers is None:
+        headers = []
+        for row in rows:
+            headers.extend(h for h in row.keys() if h not in headers)
+
+    with open(csv_filename, "w", newline="") as csv_file:
+        csv_writer = csv.DictWriter(csv_file, fieldnames=headers, restval="")
+        csv_writer.writeheader()
+        csv_writer.writerows(rows)
+
+
+class ResultsTable:
+    # Query results: a list of rows (dicts) with the union of their columns.
+    # columns() returns a dict of lists, which can be passed directly to
+    # pandas.DataFrame() or converted to NumPy arrays.
+
+    def __init__(self, rows) -> None:
+        self.rows = rows
+
+        self.headers = []
+        for row in rows:
+            self.headers.extend(h for h in row.keys() if h not in self.headers)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def columns(self, numeric=True):
+        # Values that are numbers are converted to floats (unless numeric=False)
+        columns = {}
+        for h in self.headers:
+            values = [row.get(h) for row in self.rows]
+            if numeric:
+                numbers = [to_number(v) for v in values]
+                if all(n is not None for n, v in zip(numbers, values) if v not in (None, "")):
+                    values = [n if n is not None else float("nan") for n in numbers]
+            columns[h] = values
+
+        return columns
+
+    def to_pandas(self):
+        import pandas
+
+        return pandas.DataFrame(self.columns(), columns=self.headers)
+
+    def to_csv(self, csv_filename):
+        write_csv(csv_filename, self.rows, self.headers)
+
+
+class ResultsDB:
+    # SQLite store of run results. Every run is identified by its hash (the same
+    # content hash used by the result cache), and is indexed by tool, device, top,
+    # and by each parameter value. The database uses write-ahead logging with a
+    # busy timeout, so several processes can write to it at the same time.
+
+    def __init__(self, filename) -> None:
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename, timeout=60, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY,
+                    run_hash TEXT UNIQUE,
+                    tool TEXT,
+                    device TEXT,
+                    top TEXT,
+                    time REAL,
+                    parameters TEXT,
+                    metrics TEXT
+                );
+                CREATE INDEX IF NOT EXISTS runs_design ON runs (top, tool, device);
+                CREATE TABLE IF NOT EXISTS run_parameters (
+                    run_id INTEGER REFERENCES runs (id) ON DELETE CASCADE,
+                    name TEXT,
+                    value TEXT,
+                    number REAL
+                );
+                CREATE INDEX IF NOT EXISTS run_parameters_value ON run_parameters (name, value);
+                CREATE INDEX IF NOT EXISTS run_parameters_number ON run_parameters (name, number);
+                CREATE INDEX IF NOT EXISTS run_parameters_run ON run_parameters (run_id);
+                """)
+
+    def add(self, run_hash, tool, device, top, parameters, metrics):
+        # A re-run (or cache hit) of the same inputs replaces the earlier result
+        parameters = {k: str(v) for k, v in parameters.items()}
+
+        with self.lock, self.connection:
+            cursor = self.connection.execute("SELECT id FROM runs WHERE run_hash = ?", (run_hash,))
+            old = cursor.fetchone()
+            if old is not None:
+                self.connection.execute("DELETE FROM run_parameters WHERE run_id = ?", old)
+                self.connection.execute("DELETE FROM runs WHERE id = ?", old)
+
+            cursor = self.connection.execute(
+                "INSERT INTO runs (run_hash, tool, device, top, time, parameters, metrics) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_hash,
+                    tool,
+                    device,
+                    top,
+                    time.time(),
+                    json.dumps(parameters),
+                    json.dumps(metrics),
+                ),
+            )
+            self.connection.executemany(
+                "INSERT INTO run_parameters (run_id, name, value, number) VALUES (?, ?, ?, ?)",
+                [(cursor.lastrowid, k, v, to_number(v)) for k, v in parameters.items()],
+            )
+
+    def query(self, tool=None, device=None, top=None, run_hash=None, **parameters):
+        sql = "SELECT run_hash, tool, device, top, time, parameters, metrics FROM runs WHERE 1"
+        args = []
+
+        for column, value in [
+            ("tool", tool),
+            ("device", device),
+            ("top", top),
+            ("run_hash", run_hash),
+        ]:
+            if value is not None:
+                sql += f" AND {column} = ?"
+                args.append(value)
+
+        # Parameter values are matched as numbers when possible (so 8 matches "8.0")
+        for name, value in parameters.items():
+            if to_number(value) is not None:
+                sql += (
+                    " AND id IN (SELECT run_id FROM run_parameters WHERE name = ? AND number = ?)"
+                )
+                args.extend([name, to_number(value)])
+            else:
+                sql += " AND id IN (SELECT run_id FROM run_parameters WHERE name = ? AND value = ?)"
+                args.extend([name, str(value)])
+
+        sql += " ORDER BY id"
+
+        rows = []
+        with self.lock:
+            for r in self.connection.execute(sql, args):
+                row = json.loads(r[5])
+                row.update(json.loads(r[6]))
+                row.update(
+                    {"tool": r[1], "device": r[2], "top": r[3], "time": r[4], "run_hash": r[0]}
+                )
+                rows.append(row)
+
+        return ResultsTable(rows)
+
+    def runs(self, tool=None, device=None, top=None):
+        # (run hash, parameters, metrics) of each stored run, in order, with the
+        # parameters and metrics kept apart
+        sql = "SELECT run_hash, parameters, metrics FROM runs WHERE 1"
+        args = []
+        for column, value in [("tool", tool), ("device", device), ("top", top)]:
+            if value is not None:
+                sql += f" AND {column} = ?"
+                args.append(value)
+        sql += " ORDER BY id"
+
+        with self.lock:
+            return [
+                (r[0], json.loads(r[1]), json.loads(r[2]))
+                for r in self.connection.execute(sql, args)
+            ]
+
+    def close(self):
+        self.connection.close()
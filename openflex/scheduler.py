@@ -0,0 +1,288 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import math
+import heapq
+import itertools
+
+from .results import to_number
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Combinations are ordered in windows of up to this many, so that scheduling a
+# very large (lazily generated) parameter space still takes bounded memory
+SCHEDULE_WINDOW = 10000
+
+
+def total_memory_mb():
+    # Physical memory of this machine, or None if it can't be determined
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 2**20
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class RuntimePredictor:
+    # Predicts the runtime (s) and peak memory (MB) of a combination from the
+    # profiled results of earlier runs of the same design. Combinations that were
+    # run before use the average of their own results. New ones use a linear fit
+    # over the numeric parameters (so that, e.g., a wider width than any before
+    # is predicted to take longer), blended with the k nearest results, where
+    # numeric parameters are compared relative to their range and any other
+    # parameters only match when they're equal. The history is aggregated into
+    # its distinct combinations once, rather than scanned for every prediction.
+
+    def __init__(self, rows, k=3) -> None:
+        self.k = k
+        self.fits = {}
+        self.points = {}
+        self.history = []
+        for row in rows:
+            time = to_number(row.get("Time (s)"))
+            if time is not None:
+                memory = to_number(row.get("Peak Memory (MB)")) or 0.0
+                self.history.append((row, time, memory))
+
+        self.ranges = {}
+        for row, _, _ in self.history:
+            for name, value in row.items():
+                number = to_number(value)
+                if number is not None:
+                    low, high = self.ranges.get(name, (number, number))
+                    self.ranges[name] = (min(low, number), max(high, number))
+
+    def __bool__(self):
+        return bool(self.history)
+
+    def _points(self, names):
+        # The history aggregated once per set of parameter names: maps the values
+        # of each distinct combination that was run to [average runtime, peak
+        # memory], so that predictions compare against every distinct
+        # combination rather than every row.
+        if names not in self.points:
+            groups = {}
+            for row, time, memory in self.history:
+                key = tuple(_value(row.get(n)) for n in names)
+                group = groups.setdefault(key, [0.0, 0, 0.0])
+                group[0] += time
+                group[1] += 1
+                group[2] = max(group[2], memory)
+
+            self.points[names] = {
+                key: (total / count, memory) for key, (total, count, memory) in groups.items()
+            }
+
+        return self.points[names]
+
+    def _distance(self, names, a, b):
+        distance = 0.0
+        for name, x, y in zip(names, a, b):
+            if isinstance(x, str) or isinstance(y, str):
+                distance += float(x != y)
+            else:
+                low, high = self.ranges.get(name, (x, x))
+                distance += ((x - y) / (high - low)) ** 2 if high > low else float(x != y)
+
+        return math.sqrt(distance)
+
+    def _nearest(self, names, values):
+        # NumPy version of the k nearest distinct combinations. The numeric values
+        # of each parameter are a column of numbers (nan for strings), and the
+        # other values a column of strings (None for numbers).
+        if (names, None) not in self.points:
+            points = self._points(names)
+            keys = list(points) or [()]
+            numbers = [[v if not isinstance(v, str) else math.nan for v in k] for k in keys]
+            strings = [[v if isinstance(v, str) else None for v in k] for k in keys]
+            self.points[names, None] = (
+                list(points.values()),
+                numpy.array(numbers, dtype=float).reshape(len(keys), len(names)),
+                numpy.array(strings, dtype=object).reshape(len(keys), len(names)),
+            )
+
+        predictions, numbers, strings = self.points[names, None]
+        distance = numpy.zeros(len(predictions))
+        for i, (name, x) in enumerate(zip(names, values)):
+            if isinstance(x, str):
+                distance += strings[:, i] != x
+                continue
+
+            low, high = self.ranges.get(name, (x, x))
+            column = numbers[:, i]
+            if high > low:
+                difference = ((x - column) / (high - low)) ** 2
+            else:
+                difference = column != x
+            distance += numpy.where(numpy.isnan(column), 1.0, difference)
+
+        # Only the k nearest are sorted (ties in the order of the history)
+        distance = numpy.sqrt(distance)
+        k = min(self.k, len(distance))
+        kth = numpy.partition(distance, k - 1)[k - 1]
+        candidates = numpy.flatnonzero(distance <= kth)
+        order = candidates[numpy.argsort(distance[candidates], kind="stable")][:k]
+        return [(float(distance[i]), predictions[i]) for i in order]
+
+    def predict(self, parameters):
+        # Returns (runtime, memory), or (None, None) without any history
+        if not self.history:
+            return None, None
+
+        names = tuple(parameters)
+        values = tuple(_value(v) for v in parameters.values())
+        points = self._points(names)
+        if values in points:
+            return points[values]
+
+        # Inverse-distance weighted average of the nearest results
+        if numpy is not None:
+            nearest = self._nearest(names, values)
+        else:
+            nearest = heapq.nsmallest(
+                self.k,
+                ((self._distance(names, values, key), p) for key, p in points.items()),
+                key=lambda d: d[0],
+            )
+        weights = [1.0 / d for d, _ in nearest]
+        time = sum(w * p[0] for w, (_, p) in zip(weights, nearest)) / sum(weights)
+        memory = sum(w * p[1] for w, (_, p) in zip(weights, nearest)) / sum(weights)
+
+        # Linear fits extrapolate beyond the values seen so far, which the nearest
+        # results can't. They are only used when they predict more.
+        names = [n for n in parameters if to_number(parameters[n]) is not None]
+        if names:
+            x = [to_number(parameters[n]) for n in names]
+            time = max(time, self._fit(names, 1).predict(x))
+            memory = max(memory, self._fit(names, 2).predict(x))
+
+        return time, memory
+
+    def _fit(self, names, column):
+        key = (tuple(names), column)
+        if key not in self.fits:
+            xs, ys = [], []
+            for h in self.history:
+                x = [to_number(h[0].get(n)) for n in names]
+                if None not in x:
+                    xs.append(x)
+                    ys.append(h[column])
+            self.fits[key] = LinearFit(xs, ys)
+
+        return self.fits[key]
+
+
+def _value(value):
+    # A parameter value as compared by the predictor: a number if it is one (so
+    # that 8 and 8.0 match), otherwise a string
+    number = to_number(value)
+    return number if number is not None else str(value)
+
+
+class LinearFit:
+    # Least-squares fit of y = b0 + b1*x1 + ... (with a little ridge regularization
+    # so that parameters that never changed don't make it singular). Small enough
+    # to solve with Gaussian elimination, without NumPy.
+
+    def __init__(self, xs, ys, ridge=1e-6) -> None:
+        self.coefficients = None
+        if len(xs) < 2:
+            return
+
+        # Normal equations, with each parameter scaled to its range
+        n = len(xs[0])
+        self.low = [min(x[i] for x in xs) for i in range(n)]
+        self.scale = [(max(x[i] for x in xs) - self.low[i]) or 1.0 for i in range(n)]
+        rows = [[1.0] + self._scaled(x) for x in xs]
+
+        a = [[sum(r[i] * r[j] for r in rows) for j in range(n + 1)] for i in range(n + 1)]
+        b = [sum(r[i] * y for r, y in zip(rows, ys)) for i in range(n + 1)]
+        for i in range(n + 1):
+            a[i][i] += ridge * len(xs)
+
+        self.coefficients = solve(a, b)
+
+    def _scaled(self, x):
+        return [(v - low) / scale for v, low, scale in zip(x, self.low, self.scale)]
+
+    def predict(self, x):
+        if self.coefficients is None:
+            return 0.0
+
+        terms = [1.0] + self._scaled(x)
+        return sum(c * t for c, t in zip(self.coefficients, terms))
+
+
+def solve(a, b):
+    # Solves a*x = b with Gaussian elimination and partial pivoting, or returns
+    # None if the system is singular.
+    n = len(b)
+    m = [row[:] + [v] for row, v in zip(a, b)]
+
+    for i in range(n):
+        pivot = max(range(i, n), key=lambda r: abs(m[r][i]))
+        if abs(m[pivot][i]) < 1e-12:
+            return None
+        m[i], m[pivot] = m[pivot], m[i]
+
+        for r in range(i + 1, n):
+            f = m[r][i] / m[i][i]
+            for c in range(i, n + 1):
+                m[r][c] -= f * m[i][c]
+
+    x = [0.0] * n
+    for i in reversed(range(n)):
+        x[i] = (m[i][n] - sum(m[i][c] * x[c] for c in range(i + 1, n))) / m[i][i]
+
+    return x
+
+
+def size_estimate(parameters):
+    # Without any history, larger parameter values (e.g., widths) are assumed to
+    # take longer.
+    numbers = [to_number(v) for v in parameters.values()]
+    return sum(abs(n) for n in numbers if n is not None)
+
+
+def schedule(combinations, predictor=None, window=SCHEDULE_WINDOW):
+    # Yields (combination, runtime, memory) with the longest predicted jobs first,
+    # which minimizes the makespan of a parallel sweep. Predictions are None when
+    # there is no history, and the combinations are ordered by size_estimate().
+    # Each window is sorted as a whole before any of its jobs is dispatched.
+    combinations = iter(combinations)
+    while True:
+        chunk = []
+        for c in itertools.islice(combinations, window):
+            if predictor:
+                time, memory = predictor.predict(c)
+            else:
+                time, memory = None, None
+            chunk.append((c, time, memory))
+
+        if not chunk:
+            return
+
+        chunk.sort(
+            key=lambda j: j[1] if j[1] is not None else size_estimate(j[0]),
+            reverse=True,
+        )
+        yield from chunk
@@ -0,0 +1,150 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import queue
+import threading
+import subprocess
+
+from .profile import STAGE_MARKER
+
+
+class ToolSession:
+    # A long-lived tool process (e.g., `vivado -mode tcl` or `quartus_sh -s`) that
+    # reads Tcl commands from stdin. Each request is wrapped in a catch and is
+    # followed by a unique marker line, so the output of a request (and whether it
+    # failed) can be read back over the same channel.
+
+    def __init__(self, cmd, cwd=None) -> None:
+        self.cmd = cmd
+        self.count = 0
+        self.process = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            bufsize=1,
+        )
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def run(self, script, cwd, log=None, on_stage=None):
+        # Returns (status, output), where status is 0 if the script succeeded.
+        # Output is also written to the log (if given) as it is received, and
+        # on_stage is called with the name of every stage marker in the output.
+        self.count += 1
+        marker = f"OPENFLEX_DONE_{self.count}"
+
+        request = (
+            f"set openflex_status [catch {{\n"
+            f"cd {{{cwd}}}\n"
+            f"{script}\n"
+            f"}} openflex_result]\n"
+            f'puts "{marker} $openflex_status [string map {{"\\n" " "}} $openflex_result]"\n'
+            f"flush stdout\n"
+        )
+
+        try:
+            self.process.stdin.write(request)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            return 1, ""
+
+        output = []
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                # The tool exited or crashed. It is reaped, so that the pool never
+                # hands out this session again.
+                self.close()
+                return 1, "".join(output)
+
+            if marker in line:
+                status_line = line[line.index(marker) + len(marker) :].split(maxsplit=1)
+                status = int(status_line[0]) if status_line else 1
+                if status != 0 and log is not None:
+                    log.write(f"ERROR: {status_line[1] if len(status_line) > 1 else ''}\n")
+                return status, "".join(output)
+
+            if on_stage is not None and line.startswith(STAGE_MARKER):
+                on_stage(line[len(STAGE_MARKER) :].strip())
+
+            output.append(line)
+            if log is not None:
+                log.write(line)
+                log.flush()
+
+    def close(self):
+        if self.alive():
+            try:
+                self.process.stdin.write("exit\n")
+                self.process.stdin.close()
+            except (BrokenPipeError, OSError, ValueError):
+                pass
+
+        try:
+            self.process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class SessionPool:
+    # Idle sessions are reused by whichever worker needs one next. The number of
+    # concurrent tool runs is already bounded by the caller, so at most that many
+    # sessions are ever started.
+
+    def __init__(self, commands, cwd=None) -> None:
+        self.commands = commands
+        self.cwd = cwd
+        self.idle = {tool: queue.SimpleQueue() for tool in commands}
+        self.sessions = []
+        self.lock = threading.Lock()
+
+    def acquire(self, tool):
+        while True:
+            try:
+                session = self.idle[tool].get_nowait()
+            except queue.Empty:
+                session = ToolSession(self.commands[tool], self.cwd)
+                with self.lock:
+                    self.sessions.append(session)
+                return session
+
+            if session.alive():
+                return session
+
+    def release(self, tool, session):
+        # Sessions that exited (or were terminated) are dropped
+        if session.alive():
+            self.idle[tool].put(session)
+            return
+
+        session.close()
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions = []
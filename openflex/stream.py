@@ -0,0 +1,186 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import time
+import queue
+import asyncio
+import threading
+
+from .results import to_number
+
+# Marks the end of a stream in its queue
+_DONE = object()
+
+
+class Result:
+    # One finished combination: its parameters (including implementation options)
+    # and metrics, the build directory and the tool log (None when the result
+    # came from the cache or another machine), the tool runtime in seconds (if
+    # profiled), and the seconds since the run started.
+
+    def __init__(self, parameters, metrics, build_dir=None, elapsed=None) -> None:
+        self.parameters = dict(parameters)
+        self.metrics = dict(metrics)
+        self.build_dir = build_dir if build_dir and os.path.isdir(build_dir) else None
+        self.log = None
+        if self.build_dir and os.path.exists(os.path.join(self.build_dir, "openflex.log")):
+            self.log = os.path.join(self.build_dir, "openflex.log")
+        self.time = to_number(self.metrics.get("Time (s)"))
+        self.elapsed = elapsed
+
+    @property
+    def status(self):
+        # "PASS", "FAIL", or "CANCELLED" (the run was cancelled before the test
+        # finished) for simulations, "Pruned" for pruned combinations
+        if "Pruned" in self.metrics:
+            return "Pruned"
+        return self.metrics.get("Status")
+
+    def to_dict(self):
+        row = dict(self.parameters)
+        row.update(self.metrics)
+        return row
+
+    def __repr__(self):
+        return f"Result({self.parameters}, {self.metrics})"
+
+
+class ResultStream:
+    # Iterator over the results of a sweep as each combination finishes. The
+    # sweep (sweep()) runs in a background thread, and reports every result
+    # through dut._on_result. cancel() stops starting new runs and terminates the
+    # running tools. With a timeout (seconds), the sweep is cancelled and
+    # iterating raises TimeoutError once it expires. Errors of the sweep are
+    # raised when iterating.
+
+    def __init__(self, dut, sweep, timeout=None) -> None:
+        self.dut = dut
+        self.queue = queue.Queue()
+        self.start = time.monotonic()
+        self.deadline = None if timeout is None else self.start + float(timeout)
+        self.cancelled = False
+        self.error = None
+
+        def report(parameters, metrics, build_dir=None):
+            elapsed = time.monotonic() - self.start
+            self.queue.put(Result(parameters, metrics, build_dir, elapsed))
+
+        def run():
+            try:
+                sweep()
+            except BaseException as e:
+                self.error = e
+            finally:
+                self.dut._on_result = None
+                self.dut._cancelled.clear()
+                self.queue.put(_DONE)
+
+        dut._cancelled.clear()
+        dut._on_result = report
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled = True
+        if self.thread.is_alive():
+            self.dut._cancel()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            timeout = None
+            if self.deadline is not None:
+                timeout = max(self.deadline - time.monotonic(), 0.0)
+
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self.cancel()
+                self.thread.join()
+                raise TimeoutError("The run didn't finish within its timeout.")
+
+            if item is not _DONE:
+                if self.cancelled:
+                    continue
+                return item
+
+            # Errors after a cancellation are only the cancelled runs failing
+            self.queue.put(_DONE)
+            if self.error is not None and not self.cancelled:
+                raise self.error
+            raise StopIteration
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        # Leaving the block early (e.g., break) cancels the rest of the sweep
+        if self.thread.is_alive():
+            self.cancel()
+            self.thread.join()
+
+    def close(self):
+        self.__exit__()
+
+
+class AsyncResultStream:
+    # Asynchronous iterator over the results of a sweep (see ResultStream).
+    # Cancelling the task that iterates cancels the sweep.
+
+    def __init__(self, dut, sweep, timeout=None) -> None:
+        self.stream = ResultStream(dut, sweep, timeout)
+
+    def cancel(self):
+        self.stream.cancel()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, self._next)
+        except asyncio.CancelledError:
+            self.stream.cancel()
+            raise
+
+        if result is _DONE:
+            raise StopAsyncIteration
+        return result
+
+    def _next(self):
+        # StopIteration can't cross the executor's future
+        try:
+            return next(self.stream)
+        except StopIteration:
+            return _DONE
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.stream.thread.is_alive():
+            self.stream.cancel()
+            await asyncio.get_running_loop().run_in_executor(None, self.stream.thread.join)
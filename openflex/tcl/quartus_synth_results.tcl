@@ -0,0 +1,49 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# Collects the post-synthesis (Analysis & Synthesis) resource estimates of a
+# project, which OpenFLEX uses to prune combinations before the fitter runs.
+# Usage: quartus_sh -t quartus_synth_results.tcl <project>
+
+load_package report
+
+set project [lindex $quartus(args) 0]
+
+project_open $project
+load_report $project
+
+set panel {*Analysis & Synthesis Resource Usage Summary*}
+set headers {}
+set values {}
+
+# Each row of the summary is a resource name and its estimated usage
+if { ![catch {set num_rows [get_number_of_rows -name $panel]} err] } {
+    for {set i 1} {$i < $num_rows} {incr i} {
+        set name [get_report_panel_data -name $panel -row $i -col 0]
+        set value [get_report_panel_data -name $panel -row $i -col 1]
+        lappend headers [string trim [regsub -all "," $name ""]]
+        lappend values [string trim [regsub -all "," $value ""]]
+    }
+}
+
+puts "HEADERS: [join $headers ,]"
+puts "VALUES: [join $values ,]"
+
+unload_report $project
+project_close
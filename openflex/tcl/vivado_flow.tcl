@@ -20,7 +20,7 @@
 set num_args [llength $argv]
 
 if {$num_args < 2} {
-    error "ERROR: usage <top_module_name> <device_name> [clock_period]"
+    error "ERROR: usage <top_module_name> <device_name> [clock_period] [stage] [phys_opt] [max_threads] [write_netlist]"
 }
 
 set top [lindex $argv 0]
@@ -34,77 +34,172 @@ if {$num_args > 2} {
     puts "INFO: Using default clock constraint of 1 ns."
 }
 
-# Get file names
-set filelist_path "filelist.txt"
-set fileID [open $filelist_path r]
-set file_names [split [read $fileID] "\n"]
-close $fileID
+# The flow can be run in stages:
+#   all   - synthesis and implementation (default)
+#   synth - synthesis only, writing outputs/post_synth.dcp
+#   impl  - implementation only, starting from ../outputs/post_synth.dcp
+#           (i.e., the checkpoint of the synthesis run in the parent directory)
+if {$num_args > 3} {
+    set stage [lindex $argv 3]
+} else {
+    set stage all
+}
+
+# Physical optimization: auto (only when there are setup violations), on, or off
+if {$num_args > 4} {
+    set phys_opt [lindex $argv 4]
+} else {
+    set phys_opt auto
+}
+
+# Maximum number of threads per run (0 for Vivado's default), so that parallel
+# runs don't oversubscribe the machine
+if {$num_args > 5 && [lindex $argv 5] > 0} {
+    set_param general.maxThreads [lindex $argv 5]
+}
+
+# Write the post-synthesis netlist (1), which OpenFLEX hashes to find
+# combinations that synthesize to the same hardware
+if {$num_args > 6} {
+    set write_netlist [lindex $argv 6]
+} else {
+    set write_netlist 0
+}
 
 # define the output directory
 set output_dir ./outputs
 file mkdir $output_dir
 
-puts "----------------------------------------"
-puts " Reading design files"
-puts "----------------------------------------"
+# Marks the start of a flow stage, so OpenFLEX can profile runtime and memory
+# usage per stage.
+proc openflex_stage {name} {
+    puts "OPENFLEX_STAGE:$name"
+    flush stdout
+}
 
-set num_files [llength $file_names]
-puts "Num Files = $num_files"
+# Writes the fMax (from the worst negative slack) and the resource utilization
+# of the design in memory to a report for OpenFLEX
+proc openflex_write_report {filename clock_period} {
+    # Get WNS
+    set wns ""
+    foreach timing_entry [get_timing_paths -delay_type max] {
+        set slack [lindex [get_property SLACK $timing_entry] 0]
+        if {$wns eq "" || $slack < $wns} {
+            set wns $slack
+        }
+    }
 
-foreach file $file_names {
-    if {![string is space $file]} {
-    
-        puts "Processing file ->$file<-"
-        read_verilog -sv $file
+    if {$wns ne ""} {
+        set fMax [expr (1000 / ($clock_period - $wns))]
+    } else {
+        set fMax "n/a"
     }
+
+    # Capture resource utilization
+    set utilization_output [get_utilization]
+
+    # Write the outputs to the file
+    set file_id [open $filename "w"]
+    puts $file_id $fMax
+    puts $file_id $utilization_output
+    close $file_id
 }
 
+if {$stage ne "impl"} {
+    openflex_stage read_design
 
-set pairs_list {}
-set parameters_path "parameters.txt"
-set fileID [open $parameters_path r]
+    # Get file names
+    set filelist_path "filelist.txt"
+    set fileID [open $filelist_path r]
+    set file_names [split [read $fileID] "\n"]
+    close $fileID
 
-# Read each line from the file
-while {[gets $fileID line] != -1} {
-    # Split the line into two strings using whitespace as the delimiter
-    set pair [split $line]
+    puts "----------------------------------------"
+    puts " Reading design files"
+    puts "----------------------------------------"
 
-    # Append the pair to the list
-    lappend pairs_list $pair
-}
-close $fileID
+    set num_files [llength $file_names]
+    puts "Num Files = $num_files"
 
-# load constraints
-# NOTE: remove `-mode out_of_context` argument for full 
-# implementation w/ top level design and real FPGA/board,
-# or specify a different XDC file for that case.
-read_xdc vivado.xdc
+    foreach file $file_names {
+        if {![string is space $file]} {
 
-# set parameters/generics
-# set_property generic parameter_name=value [get_filesets sources_1]
+            puts "Processing file ->$file<-"
+            read_verilog -sv $file
+        }
+    }
 
 
-puts "----------------------------------------"
-puts " Running out-of-contex synthesis"
-puts "----------------------------------------"
+    set pairs_list {}
+    set parameters_path "parameters.txt"
+    set fileID [open $parameters_path r]
 
-# --------------------------------------------------------
-# Run synthesis, write design checkpoint, report timing, 
-# and utilization estimates
-# --------------------------------------------------------
-set synth_cmd "synth_design -top $top -part $device -mode out_of_context"
-foreach pair $pairs_list {
-    #puts "Pair 1: [lindex $pair 0], Pair 2: [lindex $pair 1]"
-    set pname [lindex $pair 0]
-    set pval [lindex $pair 1]
-    append synth_cmd " -generic $pname=$pval"
+    # Read each line from the file
+    while {[gets $fileID line] != -1} {
+        # Split the line into two strings using whitespace as the delimiter
+        set pair [split $line]
+
+        # Append the pair to the list
+        lappend pairs_list $pair
+    }
+    close $fileID
+
+    # load constraints
+    # NOTE: remove `-mode out_of_context` argument for full 
+    # implementation w/ top level design and real FPGA/board,
+    # or specify a different XDC file for that case.
+    read_xdc vivado.xdc
+
+    # set parameters/generics
+    # set_property generic parameter_name=value [get_filesets sources_1]
+
+
+    puts "----------------------------------------"
+    puts " Running out-of-contex synthesis"
+    puts "----------------------------------------"
+
+    # --------------------------------------------------------
+    # Run synthesis, write design checkpoint, report timing, 
+    # and utilization estimates
+    # --------------------------------------------------------
+    set synth_cmd "synth_design -top $top -part $device -mode out_of_context"
+    foreach pair $pairs_list {
+        #puts "Pair 1: [lindex $pair 0], Pair 2: [lindex $pair 1]"
+        set pname [lindex $pair 0]
+        set pval [lindex $pair 1]
+        append synth_cmd " -generic $pname=$pval"
+    }
+    openflex_stage synth_design
+    eval $synth_cmd
+
+    openflex_stage synth_reports
+    write_checkpoint -force $output_dir/post_synth.dcp
+    report_methodology -file $output_dir/post_synth_methodology.rpt
+    report_timing_summary -file $output_dir/post_synth_timing_summary.rpt
+    report_utilization -file $output_dir/post_synth_util.rpt
+    if {$write_netlist} {
+        write_verilog -force -mode funcsim $output_dir/post_synth_netlist.v
+    }
+
+    # Post-synthesis estimates, which are used to prune combinations before
+    # implementation
+    openflex_write_report "synth_report.txt" $clock_period
 }
-eval $synth_cmd
 
-write_checkpoint -force $output_dir/post_synth.dcp
-report_methodology -file $output_dir/post_synth_methodology.rpt
-report_timing_summary -file $output_dir/post_synth_timing_summary.rpt
-report_utilization -file $output_dir/post_synth_util.rpt
+if {$stage eq "synth"} {
+    puts "----------------------------------------"
+    puts " Synthesis complete"
+    puts "----------------------------------------"
+    return
+}
+
+if {$stage eq "impl"} {
+    # Reuse the synthesized design and apply this run's clock constraint, which
+    # overrides the clock that was used during synthesis.
+    openflex_stage open_checkpoint
+    open_checkpoint ../outputs/post_synth.dcp
+    read_xdc vivado.xdc
+}
 
 # TODO: From ug909: 
 # It is recommended to close the design in memory after synthesis, 
@@ -115,13 +210,19 @@ puts " Implementation (Optimization, P&R)"
 puts "----------------------------------------"
 # run logic optimization, placement and physical logic optimization, 
 # write design checkpoint, report utilization and timing estimates
+openflex_stage opt_design
 opt_design
+openflex_stage place_design
 place_design
 report_clock_utilization -file $output_dir/clock_util.rpt
 
 # Optionally run optimization if there are timing violations after placement
-if {[get_property SLACK [get_timing_paths -max_paths 1 -nworst 1 -setup]] < 0} {
+if {$phys_opt eq "on"} {
+    openflex_stage phys_opt_design
+    phys_opt_design
+} elseif {$phys_opt eq "auto" && [get_property SLACK [get_timing_paths -max_paths 1 -nworst 1 -setup]] < 0} {
     puts "Found setup timing violations => running physical optimization"
+    openflex_stage phys_opt_design
     phys_opt_design
 }
 write_checkpoint -force $output_dir/post_place.dcp
@@ -130,7 +231,9 @@ report_timing_summary -file $output_dir/post_place_timing_summary.rpt
 
 # run the router, write the post-route design checkpoint, report the routing
 # status, report timing, power, and DRC, and finally save the Verilog netlist.
+openflex_stage route_design
 route_design
+openflex_stage route_reports
 write_checkpoint -force $output_dir/post_route.dcp
 report_route_status -file $output_dir/post_route_status.rpt
 report_timing_summary -file $output_dir/post_route_timing_summary.rpt
@@ -143,36 +246,7 @@ report_timing -of [get_timing_paths -max_paths 1000 -slack_lesser_than 0] -file
 # write_verilog -force $output_dir/cpu_impl_netlist.v -mode timesim -sdf_anno true
 
 
-# Get WNS
-set wns ""
-foreach timing_entry [get_timing_paths -delay_type max] {
-    set slack [lindex [get_property SLACK $timing_entry] 0]    
-    if {$wns eq "" || $slack < $wns} {
-        set wns $slack
-    }
-}
-
-if {$wns ne ""} {    
-    set fMax [expr (1000 / ($clock_period - $wns))]
-} else {
-    set fMax "n/a"    
-}
-
-# Capture resource utilization
-set utilization_output [get_utilization]
-
-# Specify the file path where you want to save the utilization report
-set vivado_report_file "vivado_report.txt"
-
-# Open the file for writing
-set file_id [open $vivado_report_file "w"]
-
-# Write the outputs to the file
-puts $file_id $fMax
-puts $file_id $utilization_output
-
-# Close the file
-close $file_id
+openflex_write_report "vivado_report.txt" $clock_period
 
 
 # generate a bitstream
@@ -0,0 +1,251 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import re
+import time
+import hashlib
+
+from .results import to_number
+
+VHDL_EXTENSIONS = (".vhd", ".vhdl")
+
+# Design units defined by a source file (Verilog/SystemVerilog and VHDL)
+VERILOG_UNIT = re.compile(
+    r"\b(module|macromodule|interface|program|package|primitive)\s+"
+    + r"(?:automatic\s+|static\s+)?([A-Za-z_]\w*)"
+)
+VHDL_UNIT = re.compile(r"\b(entity|package)\s+(?!body\b)([A-Za-z_]\w*)\s+is\b", re.IGNORECASE)
+INCLUDE = re.compile(r'`include\s+"([^"]+)"')
+
+
+def _strip_comments(text, vhdl):
+    if vhdl:
+        return re.sub(r"--[^\n]*", "", text)
+    return re.sub(r"//[^\n]*|/\*.*?\*/", "", text, flags=re.DOTALL)
+
+
+class DependencyMap:
+    # Which source files depend on which, from the design units (modules,
+    # packages, interfaces, entities) each file defines and the names it uses,
+    # and from `include directives. Any use of a name that another file defines
+    # counts, so the map may over-approximate, but doesn't miss dependencies
+    # that are visible in the sources. Names are compared case-insensitively.
+
+    def __init__(self, files) -> None:
+        self.files = [os.path.abspath(f) for f in files]
+        self.defined = {}
+        self.packages = set()
+        self.names = {}
+        self.includes = {}
+
+        search_dirs = list(dict.fromkeys(os.path.dirname(f) for f in self.files))
+        # Files are read in the order of the file list, each followed by the
+        # files it includes
+        pending = self.files[::-1]
+        while pending:
+            f = pending.pop()
+            if f in self.names:
+                continue
+
+            try:
+                with open(f, "r", errors="replace") as file:
+                    text = file.read()
+            except OSError:
+                text = ""
+
+            vhdl = f.endswith(VHDL_EXTENSIONS)
+            self.includes[f] = []
+            if not vhdl:
+                # Included files are searched next to the file, then next to the
+                # other sources
+                for name in reversed(INCLUDE.findall(text)):
+                    for d in [os.path.dirname(f)] + search_dirs:
+                        path = os.path.join(d, name)
+                        if os.path.exists(path):
+                            self.includes[f].append(os.path.abspath(path))
+                            pending.append(os.path.abspath(path))
+                            break
+
+            text = _strip_comments(text, vhdl)
+            for kind, name in (VHDL_UNIT if vhdl else VERILOG_UNIT).findall(text):
+                self.defined.setdefault(name.lower(), f)
+                if kind.lower() == "package":
+                    self.packages.add(name.lower())
+
+            self.names[f] = {n.lower() for n in re.findall(r"[A-Za-z_]\w*", text)}
+
+    def sources(self):
+        # Every file the design reads, including the included files
+        return list(self.names)
+
+    def _direct(self, f, compile_only):
+        # The files f uses directly. A Verilog file only has to be recompiled when
+        # a file it includes or a package it imports changes; the modules it
+        # instantiates are bound when the design is elaborated.
+        deps = set(self.includes.get(f, []))
+        for name in self.names.get(f, ()):
+            other = self.defined.get(name)
+            if other is None or other == f:
+                continue
+            if compile_only and not f.endswith(VHDL_EXTENSIONS) and name not in self.packages:
+                continue
+            deps.add(other)
+
+        return deps
+
+    def dependencies(self, f, compile_only=False):
+        # f and every file it (transitively) depends on
+        f = os.path.abspath(f)
+        seen = {f}
+        pending = [f]
+        while pending:
+            for d in self._direct(pending.pop(), compile_only):
+                if d not in seen:
+                    seen.add(d)
+                    pending.append(d)
+
+        return seen
+
+    def dependents(self, changed, compile_only=False):
+        # The files that (transitively) depend on any of the changed files
+        changed = {os.path.abspath(f) for f in changed}
+        return {f for f in self.names if self.dependencies(f, compile_only) & changed}
+
+    def top_sources(self, top):
+        # The files the top level depends on (all files if it isn't found), in
+        # the order of the file list
+        f = self.defined.get(top.lower())
+        if f is None:
+            return self.sources()
+
+        deps = self.dependencies(f)
+        return [s for s in self.sources() if s in deps]
+
+
+def _file_hash(file_name):
+    try:
+        with open(file_name, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class FileWatcher:
+    # Polls files for changes of their contents. Saving a file without changing
+    # it (or touching it) isn't a change.
+
+    def __init__(self, files) -> None:
+        self.state = {}
+        self.watch(files)
+
+    def watch(self, files):
+        # (Re)sets the watched files, keeping the state of known files
+        state = {}
+        for f in files:
+            f = os.path.abspath(f)
+            state[f] = self.state.get(f) or self._stat(f)
+        self.state = state
+
+    def _stat(self, f):
+        try:
+            mtime = os.stat(f).st_mtime_ns
+        except OSError:
+            mtime = None
+        return mtime, _file_hash(f)
+
+    def changes(self):
+        changed = set()
+        for f, (mtime, digest) in self.state.items():
+            try:
+                current = os.stat(f).st_mtime_ns
+            except OSError:
+                current = None
+            if current == mtime:
+                continue
+
+            state = self._stat(f)
+            if state[1] != digest:
+                changed.add(f)
+            self.state[f] = state
+
+        return changed
+
+    def wait(self, interval=1.0):
+        # Blocks until files change, and returns them. Editors often write a file
+        # in several steps, so changes are collected until the files are stable.
+        changed = set()
+        while True:
+            time.sleep(interval)
+            new = self.changes()
+            if new:
+                changed |= new
+            elif changed:
+                return changed
+
+
+def _is_metric(column):
+    # Profile figures change on every run, so they aren't compared
+    return not column.endswith((" (s)", " (MB)", "(Total)"))
+
+
+def _label(row):
+    return ", ".join(f"{k}={v}" for k, v in row.items())
+
+
+def print_summary(previous, current):
+    # Live summary of a (re-)run: pass/fail of simulations, and the metrics that
+    # changed since the previous run. previous and current are lists of
+    # (parameters, metrics).
+    stamp = time.strftime("%H:%M:%S")
+    if current is None:
+        print(f"[{stamp}] Done.")
+        return
+
+    before = {_label(row): metrics for row, metrics in previous or []}
+    statuses = [metrics.get("Status") for _, metrics in current]
+    line = f"[{stamp}] {len(current)} results"
+    if any(statuses):
+        line += f": {statuses.count('PASS')} passed, {statuses.count('FAIL')} failed"
+        if "CANCELLED" in statuses:
+            line += f", {statuses.count('CANCELLED')} cancelled"
+    print(line)
+
+    for row, metrics in current:
+        label = _label(row)
+        old = before.get(label)
+        if old is None:
+            if previous is not None:
+                print(f"  {label}: new")
+            continue
+
+        changes = []
+        for column, value in metrics.items():
+            if not _is_metric(column) or old.get(column) == value:
+                continue
+
+            a, b = to_number(old.get(column)), to_number(value)
+            if a is not None and b is not None:
+                changes.append(f"{column} {old[column]} -> {value} ({b - a:+g})")
+            else:
+                changes.append(f"{column} {old.get(column)} -> {value}")
+
+        if changes:
+            print(f"  {label}: " + ", ".join(changes))
@@ -0,0 +1,66 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import sys
+import json
+
+from .config import FlexConfig
+from .backend import TaskResults
+
+# Runs one task of a cluster job (see backend.py):
+#     python -m openflex.worker <job directory> [task]
+# The task defaults to the Slurm array task ID.
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        sys.exit("ERROR: usage python -m openflex.worker <job_dir> [task]")
+
+    job_dir = os.path.abspath(argv[0])
+    task = int(argv[1] if len(argv) > 1 else os.environ["SLURM_ARRAY_TASK_ID"])
+
+    with open(os.path.join(job_dir, "job.json"), "r") as file:
+        job = json.load(file)
+    with open(os.path.join(job_dir, "tasks", f"{task}.json"), "r") as file:
+        combinations = json.load(file)
+
+    os.chdir(job["build_dir"])
+    dut = FlexConfig(os.path.join(job_dir, "config.yml"))
+    dut.combinations = combinations
+    dut.threads = job["threads"]
+    dut.licenses = job["licenses"]
+    dut.prune_results = job.get("prune_results")
+
+    if job["cache_dir"] is None:
+        dut.cache = None
+    else:
+        dut.cache.cache_dir = job["cache_dir"]
+
+    # Results are returned to the submitting process, which stores them
+    dut.results_file = ":memory:"
+    dut.backend = TaskResults(os.path.join(job_dir, f"results_{task}.json"))
+
+    synth = getattr(dut, f"{job['tool']}_synth")
+    synth(None, jobs=job["jobs"], **job["options"])
+
+
+if __name__ == "__main__":
+    main()
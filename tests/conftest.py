@@ -0,0 +1,67 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import pytest
+import yaml
+
+from openflex.config import FlexConfig
+
+# Stand-ins for the EDA tools (shared with the benchmarks)
+FAKEBIN = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fakebin"
+)
+
+RTL = "module top #(parameter WIDTH = 8) (input logic clk);\nendmodule\n"
+
+
+@pytest.fixture
+def fakebin(monkeypatch):
+    monkeypatch.setenv("PATH", FAKEBIN + os.pathsep + os.environ.get("PATH", ""))
+    for name in ("FAKE_FAIL", "FAKE_FAIL_STAGE"):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch, fakebin):
+    # Returns a function that writes openflex.yml (a small Vivado project unless
+    # overridden) in an empty working directory, and loads it. The result cache
+    # and results database live in the same directory.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENFLEX_CACHE_DIR", str(tmp_path / "cache"))
+    with open("top.sv", "w") as file:
+        file.write(RTL)
+
+    def load(**config):
+        base = {
+            "mode": "synth",
+            "tool": "vivado",
+            "top": "top",
+            "clock": "clk",
+            "device": "xc7a100tcsg324-1",
+            "files": ["top.sv"],
+            "parameters": {"WIDTH": [8, 16]},
+        }
+        base.update(config)
+        with open("openflex.yml", "w") as file:
+            yaml.safe_dump(base, file)
+        return FlexConfig("openflex.yml")
+
+    return load
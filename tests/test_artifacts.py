@@ -0,0 +1,160 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import shutil
+import tarfile
+import subprocess
+
+import pytest
+
+from openflex import artifacts
+from openflex.artifacts import ARCHIVE_EXTENSION, ArtifactPolicy
+
+FILES = {
+    "vivado_report.txt": "431.03\n",
+    "openflex_profile.json": "{}",
+    "openflex.log": "log\n" * 100,
+    "outputs/post_route.dcp": "x" * 1000,
+    "outputs/route_paths.rpx": "paths",
+}
+
+needs_zstd = pytest.mark.skipif(
+    artifacts.zstandard is None and shutil.which("zstd") is None, reason="needs zstd"
+)
+
+
+def build(root, name="build_vivado/build_top_WIDTH_8"):
+    for path, text in FILES.items():
+        path = os.path.join(root, name, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+    return name
+
+
+def files(directory):
+    return sorted(
+        os.path.relpath(os.path.join(root, f), directory)
+        for root, _, names in os.walk(directory)
+        for f in names
+    )
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def test_keep_all():
+    policy = ArtifactPolicy()
+    name = build(policy.root)
+    policy.finalize(name)
+
+    assert files(name) == sorted(FILES)
+
+
+def test_keep_on_failure():
+    policy = ArtifactPolicy("keep-on-failure")
+    passed = build(policy.root, "build_vivado/passed")
+    failed = build(policy.root, "build_vivado/failed")
+    policy.finalize(passed)
+    policy.finalize(failed, failed=True)
+
+    assert not os.path.exists(passed)
+    assert files(failed) == sorted(FILES)
+    assert policy.count == 2 and policy.retained == policy.produced // 2
+
+
+def test_metrics_only():
+    policy = ArtifactPolicy("metrics-only", keep=["*.rpx"])
+    name = build(policy.root)
+    policy.finalize(name)
+
+    assert files(name) == ["openflex_profile.json", "outputs/route_paths.rpx", "vivado_report.txt"]
+
+
+@needs_zstd
+def test_archive():
+    policy = ArtifactPolicy("archive")
+    name = build(policy.root)
+    policy.finalize(name)
+
+    assert not os.path.exists(name)
+    archive = name + ARCHIVE_EXTENSION
+    tar = subprocess.run(["zstd", "-dc", archive], stdout=subprocess.PIPE, check=True).stdout
+    with open("archive.tar", "wb") as file:
+        file.write(tar)
+    with tarfile.open("archive.tar") as file:
+        names = sorted(m.name for m in file.getmembers() if m.isfile())
+    assert names == sorted(f"build_top_WIDTH_8/{f}" for f in FILES)
+
+
+def test_scratch(tmp_path, capsys):
+    scratch = tmp_path / "scratch"
+    policy = ArtifactPolicy("metrics-only", scratch=str(scratch))
+    assert policy.root.startswith(str(scratch))
+
+    # An earlier run's artifacts are replaced
+    os.makedirs("build_vivado/build_top_WIDTH_8/old")
+    name = build(policy.root)
+    policy.finalize(name)
+
+    assert files(name) == ["openflex_profile.json", "vivado_report.txt"]
+    assert not os.path.exists(os.path.join(policy.root, name))
+
+    policy.summary()
+    assert not os.path.exists(policy.root)
+    out = capsys.readouterr().out
+    assert "Artifacts (metrics-only): 1 builds" in out and f"built in {scratch}" in out
+
+
+def test_configuration():
+    policy = ArtifactPolicy.from_config({"retention": "metrics-only", "keep": "*.rpt"})
+    assert policy.keep == ["*.rpt"]
+    assert ArtifactPolicy.from_config(policy.to_config()).to_config() == policy.to_config()
+
+    with pytest.raises(ValueError, match="Unknown artifact retention"):
+        ArtifactPolicy("keep-some")
+
+
+def test_sweep(project, monkeypatch):
+    # Failed combinations keep their build directories
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "all")
+    monkeypatch.setenv("FAKE_FAIL", "16")
+    dut = project(artifacts={"retention": "keep-on-failure"})
+    assert len(dut.vivado_synth(clk_period=2.0)) == 1
+
+    assert sorted(os.listdir("build_vivado")) == ["top_WIDTH_16"]
+    assert "parameters.txt" in os.listdir("build_vivado/top_WIDTH_16")
+
+
+def test_sweep_in_scratch(project, tmp_path):
+    scratch = tmp_path / "scratch"
+    dut = project(artifacts={"retention": "metrics-only", "scratch": str(scratch)})
+    assert len(dut.vivado_synth(clk_period=2.0)) == 2
+
+    assert sorted(os.listdir("build_vivado")) == ["top_WIDTH_16", "top_WIDTH_8"]
+    assert files("build_vivado/top_WIDTH_8") == [
+        "openflex_profile.json",
+        "synth_report.txt",
+        "vivado_report.txt",
+    ]
+    assert os.listdir(scratch) == []
@@ -0,0 +1,121 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from openflex.cache import ResultCache, hash_inputs
+from openflex.config import FlexConfig
+from openflex.watch import DependencyMap
+
+TOP = '`include "defs.svh"\nmodule top #(parameter WIDTH = `DEFAULT_WIDTH) (input logic clk);\nendmodule\n'
+
+
+def write(name, text):
+    with open(name, "w") as file:
+        file.write(text)
+
+
+def key(dut, parameters=None, clk_period=2.0, impl=None):
+    dut._sources_hash = None
+    return dut._cache_key("vivado", parameters or {"WIDTH": 8}, clk_period, [], impl)
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    k = hash_inputs("vivado", {"WIDTH": "8"})
+    assert cache.get(k) is None
+    cache.put(k, {"fMax": 431.03}, top="top")
+    assert cache.get(k) == {"fMax": 431.03}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key_inputs(project):
+    dut = project()
+    base = key(dut)
+    assert key(dut) == base
+    assert key(dut, {"WIDTH": 16}) != base
+    assert key(dut, clk_period=2.5) != base
+    assert key(dut, impl={"phys_opt": "on"}) != base
+
+    dut.config["device"] = "xc7z020clg400-1"
+    assert key(dut) != base
+
+
+def test_key_includes_included_files(project):
+    write("defs.svh", "`define DEFAULT_WIDTH 8\n")
+    write("top.sv", TOP)
+    write("other.sv", "module other;\nendmodule\n")
+    dut = project()
+    base = key(dut)
+
+    # Editing an included header changes the key; editing a file that the top
+    # level doesn't use doesn't
+    write("other.sv", "module other;\nwire x;\nendmodule\n")
+    assert key(dut) == base
+    write("defs.svh", "`define DEFAULT_WIDTH 16\n")
+    assert key(dut) != base
+
+
+def test_key_is_the_same_in_watch_mode(project):
+    write("defs.svh", "`define DEFAULT_WIDTH 8\n")
+    write("top.sv", TOP)
+    dut = project()
+    base = key(dut)
+    dut._dependencies = DependencyMap(dut.files)
+    assert key(dut) == base
+
+
+def test_header_edit_reruns(project):
+    write("defs.svh", "`define DEFAULT_WIDTH 8\n")
+    write("top.sv", TOP)
+    dut = project()
+    dut.vivado_synth(clk_period=2.0)
+
+    dut = FlexConfig("openflex.yml")
+    dut.vivado_synth(clk_period=2.0)
+    assert dut.cache.hits == 2
+
+    write("defs.svh", "`define DEFAULT_WIDTH 16\n")
+    dut = FlexConfig("openflex.yml")
+    dut.vivado_synth(clk_period=2.0)
+    assert dut.cache.hits == 0
+
+
+def test_failed_quartus_compile_is_not_cached(project, monkeypatch):
+    dut = project(tool="quartus")
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "compile")
+    monkeypatch.setenv("FAKE_FAIL", "WIDTH 16")
+    assert [r for r, _ in dut.quartus_synth(clk_period=2.0)] == [{"WIDTH": "8"}]
+
+    monkeypatch.delenv("FAKE_FAIL_STAGE")
+    dut = FlexConfig("openflex.yml")
+    assert len(dut.quartus_synth(clk_period=2.0)) == 2
+    assert (dut.cache.hits, dut.cache.misses) == (1, 1)
+
+
+def test_missing_fmax_is_not_cached(project, monkeypatch):
+    dut = project(tool="quartus")
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "timing")
+    results = dut.quartus_synth(clk_period=2.0)
+    assert [m["fMax"] for _, m in results] == ["n/a", "n/a"]
+
+    # The runs are stored, but run again next time
+    monkeypatch.delenv("FAKE_FAIL_STAGE")
+    dut = FlexConfig("openflex.yml")
+    assert [m["fMax"] for _, m in dut.quartus_synth(clk_period=2.0)] == ["402.41", "402.41"]
+    assert dut.cache.hits == 0
@@ -0,0 +1,141 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import random
+import pathlib
+import collections
+import importlib.util
+
+import pytest
+
+from openflex import combinations
+from openflex.combinations import Combinations, random_indices
+
+
+def space(size=10):
+    return Combinations.from_config({"parameters": {"A": [str(a) for a in range(size)]}})
+
+
+def expanded():
+    # A=0 expands to nine combinations, and every other point to one
+    def seeds(c, kwargs):
+        return range(9) if c["A"] == "0" else [0]
+
+    return space().add_parameter("SEED", seeds, {})
+
+
+def key(p):
+    return tuple(sorted(p.items()))
+
+
+def test_random_indices():
+    rng = random.Random(1)
+    for size in (0, 1, 7, 100):
+        assert sorted(random_indices(size, rng)) == list(range(size))
+
+
+def test_sample(large):
+    rng = random.Random(1)
+    c = space().filter(lambda p: int(p["A"]) % 2 == 0)
+    points = list(c.sample(3, rng))
+
+    assert len(points) == 3 and len({key(p) for p in points}) == 3
+    assert all(p in list(c) for p in points)
+    assert sorted(key(p) for p in c.sample(5, rng)) == sorted(key(p) for p in c)
+    assert list(c.sample(0, rng)) == []
+
+
+@pytest.fixture(params=[False, True])
+def large(request, monkeypatch):
+    # Samples as if the spaces were too large to enumerate
+    if request.param:
+        monkeypatch.setattr(combinations, "SAMPLE_ENUMERATE", 0)
+    return request.param
+
+
+@pytest.mark.parametrize("n", [6, 100, -1])
+def test_sample_larger_than_population(n, large):
+    c = space().filter(lambda p: int(p["A"]) % 2 == 0)
+    with pytest.raises(ValueError):
+        c.sample(n, random.Random(1))
+    with pytest.raises(ValueError):
+        Combinations.from_list([]).sample(max(n, 1))
+
+
+def test_sample_is_uniform_over_expanded_combinations():
+    rng = random.Random(1)
+    c = expanded()
+    everything = {key(p) for p in c}
+    assert len(everything) == 18
+
+    trials = 9000
+    single = collections.Counter(key(p) for _ in range(trials) for p in c.sample(1, rng))
+    several = collections.Counter(key(p) for _ in range(trials // 3) for p in c.sample(6, rng))
+
+    # Each combination is expected 500 times in single samples, and 1000 times
+    # in samples of six
+    assert set(single) == set(several) == everything
+    assert 400 < min(single.values()) and max(single.values()) < 600
+    assert 850 < min(several.values()) and max(several.values()) < 1150
+
+
+def test_sample_of_everything_expanded(large):
+    rng = random.Random(2)
+    c = expanded()
+
+    assert sorted(key(p) for p in c.sample(18, rng)) == sorted(key(p) for p in c)
+    with pytest.raises(ValueError):
+        c.sample(19, rng)
+
+
+def test_flexconfig_sample(project):
+    dut = project()
+    dut.sample(1)
+    assert len(list(dut.combinations)) == 1
+
+    with pytest.raises(SystemExit, match="Can't sample 3 combinations"):
+        project().sample(3)
+
+
+def test_large_sample_with_equal_expansions(monkeypatch):
+    monkeypatch.setattr(combinations, "SAMPLE_ENUMERATE", 0)
+    rng = random.Random(1)
+    c = space().add_parameter("SEED", lambda c, kwargs: range(3), {})
+
+    counts = collections.Counter(key(p) for _ in range(3000) for p in c.sample(5, rng))
+    assert len(counts) == 30
+    assert 400 < min(counts.values()) and max(counts.values()) < 600
+
+
+def test_blinky_count_is_the_same_every_pass(large):
+    # Stages run again on every pass over the combinations, so the example's
+    # random COUNT is derived from the combination
+    path = pathlib.Path(__file__).parents[1] / "examples" / "blinky" / "blinky.py"
+    spec = importlib.util.spec_from_file_location("blinky", path)
+    blinky = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(blinky)
+
+    c = space(20).add_parameter("COUNT", blinky.generate_count, {})
+    everything = sorted(key(p) for p in c)
+
+    assert sorted(key(p) for p in c) == everything
+    assert len(c) == len(everything) == 20
+    assert sorted(key(p) for p in c.sample(20, random.Random(3))) == everything
+    assert len({p["COUNT"] for p in c}) > 1
@@ -0,0 +1,136 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import itertools
+import math
+
+import pytest
+
+from openflex import combinations
+from openflex.combinations import Combinations, mixed_radix
+
+numpy = pytest.importorskip("numpy")
+
+
+def config(parameters, constraints=None, derived=None):
+    c = {"parameters": {k: [str(v) for v in values] for k, values in parameters.items()}}
+    if constraints is not None:
+        c["constraints"] = constraints
+    if derived is not None:
+        c["derived"] = derived
+    return c
+
+
+def both_paths(monkeypatch, c):
+    # The combinations from the vectorized path and from apply(), which is used
+    # without NumPy
+    vectorized = list(Combinations.from_config(c))
+    with monkeypatch.context() as m:
+        m.setattr(combinations, "numpy", None)
+        scalar = list(Combinations.from_config(c))
+    return vectorized, scalar
+
+
+def test_mixed_numbers_and_strings(monkeypatch):
+    c = config({"A": [8, "auto", 16], "B": [1, 2]}, ["A == 8 or A == 'auto'"])
+    vectorized, scalar = both_paths(monkeypatch, c)
+
+    assert vectorized == scalar
+    assert [p["A"] for p in vectorized] == ["8", "8", "auto", "auto"]
+
+
+def test_strings(monkeypatch):
+    c = config({"MODE": ["fast", "slow"], "N": [1, 2]}, ["MODE * N != 'fastfast'"])
+    vectorized, scalar = both_paths(monkeypatch, c)
+
+    assert vectorized == scalar
+    assert len(vectorized) == 3
+
+
+def test_division_by_zero_raises(monkeypatch):
+    c = config({"A": [4, 8], "B": [0, 2]}, ["A / B > 1"])
+    with pytest.raises(ValueError):
+        list(Combinations.from_config(c))
+    with monkeypatch.context() as m:
+        m.setattr(combinations, "numpy", None)
+        with pytest.raises(ValueError):
+            list(Combinations.from_config(c))
+
+
+def test_division_by_zero_after_failed_constraint(monkeypatch):
+    # apply() doesn't evaluate the later constraints of a combination that
+    # already failed one
+    c = config({"A": [4, 8], "B": [0, 2]}, ["B != 0", "A // B > 2", "A % B == 0"])
+    vectorized, scalar = both_paths(monkeypatch, c)
+
+    assert vectorized == scalar
+    assert vectorized == [{"A": "8", "B": "2"}]
+
+
+def test_derived(monkeypatch):
+    c = config(
+        {"WIDTH": [8, 12, 16], "DEPTH": [1, 1024]},
+        ["DEPTH * WIDTH <= 8192"],
+        {"HALF": "WIDTH / 2", "ADDR": "clog2(DEPTH)"},
+    )
+    vectorized, scalar = both_paths(monkeypatch, c)
+
+    assert vectorized == scalar
+    assert {"WIDTH": "8", "DEPTH": "1024", "HALF": 4, "ADDR": 10} in vectorized
+
+
+def test_integer_overflow(monkeypatch):
+    # int64 arithmetic would wrap around for W >= 63
+    c = config(
+        {"W": range(1, 70), "D": [-1, 1, 2]}, ["P * D > 0", "P - 2**W + D != 0"], {"P": "2**W"}
+    )
+    vectorized, scalar = both_paths(monkeypatch, c)
+
+    assert vectorized == scalar
+    assert {"W": "69", "D": "2", "P": 2**69} in vectorized
+    assert len(Combinations.from_config(c)) == len(scalar) == 69 * 2
+
+
+def test_blocks(monkeypatch):
+    # More combinations than fit in one block
+    monkeypatch.setattr(combinations, "CHUNK_SIZE", 7)
+    c = config({"A": range(5), "B": range(4), "C": range(3)}, ["(A + B) % 3 != C"])
+    vectorized, scalar = both_paths(monkeypatch, c)
+
+    assert vectorized == scalar
+    assert len(Combinations.from_config(c)) == len(scalar)
+
+
+def test_mixed_radix():
+    sizes = [3, 1, 4, 2]
+    digits = mixed_radix(numpy.arange(math.prod(sizes)), sizes)
+
+    assert list(zip(*(d.tolist() for d in digits))) == list(
+        itertools.product(*(range(n) for n in sizes))
+    )
+
+
+def test_point():
+    c = Combinations.from_config(config({"A": [1, 2, 3], "B": ["x", "y"]}))
+
+    assert [c.point(i) for i in range(c.product_size())] == list(c)
+    assert c.point(-1) == {"A": "3", "B": "y"}
+    with pytest.raises(IndexError):
+        c.point(6)
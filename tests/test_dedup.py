@@ -0,0 +1,52 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from openflex.config import FlexConfig
+
+PARAMETERS = {"WIDTH": [8, 16], "IGNORED": [0, 1]}
+
+
+def deduplicated(results):
+    return [r for r, m in results if "Deduplicated From" in m]
+
+
+def test_identical_netlists_are_implemented_once(project):
+    dut = project(parameters=PARAMETERS, dedup="true")
+    results = dut.vivado_synth(clk_period=2.0)
+
+    assert len(results) == 4
+    assert len(deduplicated(results)) == 2
+    assert len({m["Netlist Hash"] for _, m in results}) == 2
+
+
+def test_failed_synthesis_is_not_deduplicated(project, monkeypatch):
+    dut = project(parameters=PARAMETERS, dedup="true")
+    dut.vivado_synth(clk_period=2.0)
+
+    # After an edit that breaks synthesis of WIDTH=16, those combinations get
+    # no results, rather than ones reused through their earlier netlists
+    with open("top.sv", "a") as file:
+        file.write("// edit\n")
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "synth")
+    monkeypatch.setenv("FAKE_FAIL", "WIDTH 16")
+    results = FlexConfig("openflex.yml").vivado_synth(clk_period=2.0)
+
+    assert sorted(r["WIDTH"] for r, _ in results) == ["8", "8"]
+    assert len(deduplicated(results)) == 1
@@ -0,0 +1,113 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import random
+
+import pytest
+
+from openflex import explore
+from openflex.combinations import Combinations
+from openflex.explore import Explorer, dominates, pareto_front
+
+SIZE = 20
+
+
+def synthetic_tool(point):
+    # Stand-in for a tool's results: fMax peaks at A=13, B=6 (with a ridge along
+    # the way, so the neighbors of good results are good), and area grows with A.
+    a, b = int(point["A"]), int(point["B"])
+    fmax = 500.0 - 3.0 * (a - 13) ** 2 - 2.0 * (b - 6) ** 2 + 1.5 * (a - 13) * (b - 6)
+    return dict(point, **{"fMax": str(fmax), "LUT (Used)": str(10 * a + b)})
+
+
+OPTIMUM = max(
+    float(synthetic_tool({"A": a, "B": b})["fMax"]) for a in range(SIZE) for b in range(SIZE)
+)
+
+
+def space():
+    values = [str(v) for v in range(SIZE)]
+    return Combinations.from_config({"parameters": {"A": values, "B": values}})
+
+
+def explore_best(seed, budget):
+    rows = []
+    explorer = Explorer("fmax", budget, batch=2, pool=SIZE * SIZE, seed=seed)
+    explorer.run(
+        space(), lambda: list(rows), lambda points: rows.extend(map(synthetic_tool, points))
+    )
+
+    assert len(rows) == budget
+    return max(float(r["fMax"]) for r in rows)
+
+
+def random_best(seed, budget):
+    points = space().sample(budget, random.Random(seed))
+    return max(float(synthetic_tool(p)["fMax"]) for p in points)
+
+
+def test_search_beats_random_sampling():
+    budget = 24
+    seeds = range(6)
+    explored = [OPTIMUM - explore_best(seed, budget) for seed in seeds]
+    sampled = [OPTIMUM - random_best(seed, budget) for seed in seeds]
+
+    assert sum(explored) < sum(sampled) / 4
+    assert sum(regret == 0 for regret in explored) > sum(regret == 0 for regret in sampled)
+
+
+def test_training_set_is_capped(monkeypatch):
+    sizes = []
+    fit = explore.GaussianProcess.fit
+
+    def record(self, X, y):
+        sizes.append(len(X))
+        return fit(self, X, y)
+
+    monkeypatch.setattr(explore.GaussianProcess, "fit", record)
+    monkeypatch.setattr(Explorer, "MAX_OBSERVATIONS", 50)
+
+    # A long history, of which the best results are kept
+    history = [synthetic_tool(p) for p in space()][::3]
+    rows = list(history)
+    explorer = Explorer("pareto", 4, batch=2, pool=SIZE * SIZE, seed=1)
+    explorer.run(
+        space(), lambda: list(rows), lambda points: rows.extend(map(synthetic_tool, points))
+    )
+
+    assert sizes and max(sizes) == 50
+    observed = explorer._observations(history, {("A", "B")})
+    training = explorer._training(observed)
+    best = max(observed.values(), key=lambda o: o[1][0])
+    assert len(training) == 50 and any(t is best for t in training.values())
+
+
+def test_pareto_front():
+    points = [[3, -10], [2, -5], [3, -12], [1, -5], [0, -1]]
+
+    assert dominates(points[0], points[2]) and not dominates(points[0], points[1])
+    assert not dominates(points[1], points[1])
+    assert pareto_front(points) == [0, 1, 4]
+
+
+@pytest.mark.parametrize("spec", ["max:fMax,median:LUTs", "fastest", "max:"])
+def test_invalid_objectives(spec):
+    with pytest.raises(ValueError):
+        Explorer(spec, 10)
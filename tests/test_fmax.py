@@ -0,0 +1,105 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import pytest
+
+from openflex.config import FlexConfig
+
+
+class Tool:
+    # Synthetic tool: the design closes timing at periods of at least achievable
+    # (ns). Like a real tool, it works harder at tighter constraints, so the fMax
+    # extrapolated from a run's slack is only exact near the achievable period.
+    def __init__(self, achievable) -> None:
+        self.achievable = achievable
+        self.periods = []
+
+    def __call__(self, period):
+        self.periods.append(period)
+        if period >= self.achievable:
+            delay = self.achievable + 0.3 * (period - self.achievable)
+        else:
+            delay = self.achievable + 0.2 * (self.achievable - period)
+        return {"fMax": f"{1000.0 / delay:.2f}", "LUT (Used)": "100"}
+
+
+def search(tool, clk_period, tolerance=0.05, max_runs=8):
+    return FlexConfig._fmax_search(None, tool, clk_period, tolerance, max_runs)
+
+
+@pytest.mark.parametrize("clk_period", [1.0, 2.9, 3.1, 10.0])
+def test_converges_to_the_achievable_period(clk_period):
+    tool = Tool(3.0)
+    metrics = search(tool, clk_period)
+
+    # The tightest passing period found. The search stops at a bracket within
+    # the tolerance, or at a passing run whose slack is, which the tool's
+    # relaxing makes up to tolerance / 0.7 above the achievable period.
+    assert 3.0 <= metrics["Clock Period"] <= 3.0 + 0.05 / 0.7
+    assert metrics["Clock Period"] == min(p for p in tool.periods if p >= 3.0)
+    assert metrics["fMax Runs"] == len(tool.periods) <= 8
+    assert metrics["fMax"] == tool(metrics["Clock Period"])["fMax"]
+
+
+@pytest.mark.parametrize("max_runs", [1, 2, 3])
+def test_run_budget(max_runs):
+    tool = Tool(3.0)
+    metrics = search(tool, 10.0, tolerance=0.001, max_runs=max_runs)
+
+    assert len(tool.periods) == metrics["fMax Runs"] == max_runs
+    assert metrics["Clock Period"] >= 3.0
+
+
+def test_tighter_tolerance_takes_more_runs():
+    runs = [search(Tool(3.0), 1.0, tolerance=t, max_runs=50)["fMax Runs"] for t in (0.5, 0.001)]
+    assert runs[0] < runs[1] <= 50
+
+
+def test_timing_never_met():
+    # Every run fails timing by 1 ns
+    periods = []
+
+    def tool(period):
+        periods.append(period)
+        return {"fMax": f"{1000.0 / (period + 1.0):.2f}"}
+
+    metrics = search(tool, 2.0, max_runs=4)
+    assert len(periods) == 4
+    assert metrics["fMax"] == metrics["Clock Period"] == "n/a"
+    assert metrics["fMax Runs"] == 4
+
+
+def test_runs_without_fmax():
+    # Nothing to search on, e.g., a Quartus run without timing results
+    metrics = search(lambda period: {"fMax": "n/a"}, 2.0)
+    assert metrics["fMax Runs"] == 1
+    assert metrics["Clock Period"] == "n/a"
+
+    assert search(lambda period: None, 2.0) is None
+
+
+def test_sweep(project):
+    # The stand-in reports 431.03 MHz at any clock period
+    dut = project(parameters={"WIDTH": [8]})
+    [(row, metrics)] = dut.vivado_synth(clk_period=1.0, fmax_search=True)
+
+    assert row == {"WIDTH": "8"}
+    assert 1000.0 / 431.03 <= metrics["Clock Period"] <= 1000.0 / 431.03 + 0.05
+    assert 2 <= metrics["fMax Runs"] <= 8
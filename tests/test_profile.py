@@ -0,0 +1,155 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import sys
+
+import pytest
+
+from openflex.profile import (
+    load_profile,
+    merge_profiles,
+    profile_metrics,
+    profile_summary,
+    record_profile,
+    run_monitored,
+)
+
+needs_proc = pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+
+# A tool with four stages: starting up, holding 200 MB, spinning the CPU, and
+# sleeping. Each marker is printed while the stage before it still holds its
+# memory, which is when the monitor samples it.
+TOOL = """
+import sys, time
+def mark(stage):
+    print("OPENFLEX_STAGE:" + stage, flush=True)
+    time.sleep(0.2)
+mark("alloc")
+data = bytearray(200 * 2**20)
+for i in range(0, len(data), 4096):
+    data[i] = 1
+mark("spin")
+del data
+end = time.process_time() + 0.5
+while time.process_time() < end:
+    pass
+mark("idle")
+time.sleep(0.3)
+print("done")
+"""
+
+
+@needs_proc
+def test_stages(tmp_path):
+    started = []
+    returncode, output, profile = run_monitored(
+        [sys.executable, "-c", TOOL], tmp_path, capture=True, started=started.append
+    )
+
+    assert returncode == 0 and output.endswith("done\n")
+    assert "OPENFLEX_STAGE:spin" in output
+    assert len(started) == 1
+
+    stages = profile["stages"]
+    assert list(stages) == ["startup", "alloc", "spin", "idle"]
+
+    # Peak memory is attributed to the stage that allocated it
+    assert stages["alloc"]["peak_rss"] > 200
+    assert stages["startup"]["peak_rss"] < 100
+    assert profile["peak_rss"] > 200
+
+    # CPU time goes to the stage that spun, not the one that slept
+    assert stages["spin"]["cpu"] >= 0.4
+    assert stages["idle"]["cpu"] < 0.2
+    assert stages["idle"]["wall"] >= 0.3
+    assert profile["cpu"] >= stages["spin"]["cpu"]
+    assert profile["wall"] >= sum(s["wall"] for s in stages.values()) - 0.01
+
+    metrics = profile_metrics(profile)
+    assert metrics["alloc Peak Memory (MB)"] > 200
+    assert metrics["spin Time (s)"] >= 0.4
+    assert metrics["Peak Memory (MB)"] == round(profile["peak_rss"], 1)
+
+
+@needs_proc
+def test_failed_tool(tmp_path):
+    script = 'print("OPENFLEX_STAGE:synth", flush=True); raise SystemExit(3)'
+    returncode, output, profile = run_monitored([sys.executable, "-c", script], tmp_path)
+
+    assert returncode == 3 and output == ""
+    assert list(profile["stages"]) == ["startup", "synth"]
+
+
+def stage(wall, cpu, peak_rss):
+    return {"wall": wall, "cpu": cpu, "peak_rss": peak_rss}
+
+
+def test_profiles_of_consecutive_runs_are_merged(tmp_path):
+    # E.g., an implementation run's profile includes its synthesis run
+    synth = {"wall": 10.0, "cpu": 8.0, "peak_rss": 500.0, "stages": {"synth": stage(10, 8, 500)}}
+    impl = {
+        "wall": 20.0,
+        "cpu": None,
+        "peak_rss": 800.0,
+        "stages": {"synth": stage(1, None, 100), "route": stage(19, None, 800)},
+    }
+    record_profile(tmp_path, synth)
+    record_profile(tmp_path, impl)
+
+    assert load_profile(tmp_path) == merge_profiles(synth, impl)
+    assert load_profile(tmp_path) == {
+        "wall": 30.0,
+        "cpu": None,
+        "peak_rss": 800.0,
+        "stages": {"synth": stage(11, 8, 500), "route": stage(19, None, 800)},
+    }
+    assert load_profile(tmp_path / "missing") is None
+
+
+def test_summary():
+    rows = [
+        {"Time (s)": "30", "Peak Memory (MB)": "800", "route Time (s)": "19", "CPU Time (s)": "25"},
+        {"Time (s)": 10.0, "Peak Memory (MB)": 500.0, "route Time (s)": "n/a"},
+        {"WIDTH": "8"},
+    ]
+    summary = profile_summary(rows)
+
+    assert set(summary) == {"total", "route"}
+    assert summary["total"] == {
+        "runs": 2,
+        "time": 40.0,
+        "max_time": 30.0,
+        "peak_rss": 800.0,
+        "mean_time": 20.0,
+    }
+    assert summary["route"]["runs"] == 1 and summary["route"]["peak_rss"] == 0.0
+
+
+def test_sweep_profile(project):
+    # The stand-in prints the stage markers of vivado_flow.tcl
+    dut = project(parameters={"WIDTH": [8]})
+    [(_, metrics)] = dut.vivado_synth(clk_period=2.0)
+
+    for stage_name in ("read_design", "synth_design", "place_design", "route_design"):
+        assert f"{stage_name} Time (s)" in metrics
+        assert f"{stage_name} Peak Memory (MB)" in metrics
+    assert metrics["Time (s)"] > 0
+    assert set(dut.profile("vivado")) >= {"total", "synth_design", "route_design"}
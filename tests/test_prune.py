@@ -0,0 +1,135 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+
+from openflex import config
+from openflex.prune import Pruner
+
+# Post-synthesis estimates, with an optimistic fMax
+ESTIMATES = {"fMax": "400", "CLB LUTs (Used)": "1000", "CLB LUTs (Total)": "53200"}
+
+
+def result(fmax, luts):
+    return {"fMax": str(fmax), "CLB LUTs (Used)": str(luts), "CLB LUTs (Total)": "53200"}
+
+
+def test_thresholds():
+    pruner = Pruner({"max": {"CLB LUTs (Used)": "999"}, "min": {"fMax": "300"}})
+    assert pruner.check(ESTIMATES) == "CLB LUTs (Used) 1000 > 999"
+
+    pruner = Pruner({"max": {"CLB LUTs (Used)": "1000"}, "min": {"fMax": "450"}})
+    assert pruner.check(ESTIMATES) == "fMax 400 < 450"
+
+    # Missing estimates (e.g., no fMax from Quartus synthesis) never prune
+    pruner = Pruner({"min": {"fMax": "450", "ALMs": "10"}})
+    assert pruner.check({"CLB LUTs (Used)": "1000"}) is None
+
+
+def test_dominated_estimates_are_pruned():
+    pruner = Pruner({"objective": "pareto"}, [result(420, 900)])
+    assert pruner.check(ESTIMATES) == "dominated"
+
+    # Better in either objective, or equal, isn't dominated
+    for fmax, luts in ((380, 900), (420, 1100), (400, 1000)):
+        assert Pruner({"objective": "pareto"}, [result(fmax, luts)]).check(ESTIMATES) is None
+
+
+def test_single_objective():
+    pruner = Pruner({"objective": "fmax"})
+    assert pruner.check(ESTIMATES) is None
+
+    pruner.add(result(401, 5000))
+    assert pruner.check(ESTIMATES) == "dominated"
+    assert Pruner({"objective": "area"}, [result(100, 999)]).check(ESTIMATES) == "dominated"
+
+
+def test_margin():
+    # Only results better by at least the margin (5%) prune
+    rows = [result(410, 990)]
+    assert Pruner({"objective": "pareto"}, rows).check(ESTIMATES) == "dominated"
+    assert Pruner({"objective": "pareto", "margin": "0.05"}, rows).check(ESTIMATES) is None
+
+    rows = [result(430, 940)]
+    assert Pruner({"objective": "pareto", "margin": "0.05"}, rows).check(ESTIMATES) == "dominated"
+
+
+def test_results_without_objectives_are_ignored():
+    pruner = Pruner({"objective": "pareto"}, [{"fMax": "n/a", "CLB LUTs (Used)": "1"}])
+    assert pruner.results == []
+    assert pruner.check(ESTIMATES) is None
+
+
+def test_sweep(project, capsys):
+    # The stand-in estimates 1212 LUTs for every combination
+    dut = project(prune={"max": {"LUT (Used)": "1000"}})
+    results = dut.vivado_synth(clk_period=2.0)
+
+    assert [m["Pruned"] for _, m in results] == ["LUT (Used) 1212 > 1000"] * 2
+    assert all(m["Synth LUT (Used)"] == "1212" and "fMax" not in m for _, m in results)
+    assert "Pruned after synthesis: 2 combinations" in capsys.readouterr().out
+
+    dut = project(prune={"max": {"LUT (Used)": "2000"}})
+    results = dut.vivado_synth(clk_period=2.0)
+    assert [m["fMax"] for _, m in results] == [431.03, 431.03]
+    assert all("Pruned" not in m for _, m in results)
+
+
+def add_result(dut, parameters, clk_period=2.0, impl=None, key=None):
+    # A stored result that dominates the stand-in's estimates (512.82 MHz, 1212
+    # LUTs), under the hash the current sources and flow give (or key)
+    if key is None:
+        flow = os.path.join(os.path.dirname(config.__file__), "tcl", "vivado_flow.tcl")
+        key = dut._cache_key("vivado", parameters, clk_period, [flow], impl)
+    metrics = {"fMax": "900", "LUT (Used)": "10"}
+    row = dict(parameters, **(impl or {}))
+    dut.db.add(key, "vivado", dut.config.get("device"), "top", row, metrics)
+
+
+def pruned(results):
+    return sorted(r["WIDTH"] for r, m in results if "Pruned" in m)
+
+
+def test_earlier_results_of_the_same_flow_prune(project):
+    dut = project(prune={"objective": "pareto"})
+    add_result(dut, {"WIDTH": "8"})
+
+    assert pruned(dut.vivado_synth(clk_period=2.0)) == ["16", "8"]
+
+
+def test_stale_results_do_not_prune(project, tmp_path):
+    dut = project(prune={"objective": "pareto"})
+
+    # Results of older RTL, of another clock period, and of other implementation
+    # options
+    add_result(dut, {"WIDTH": "8"}, key="stale")
+    add_result(dut, {"WIDTH": "8"}, clk_period=2.5)
+    add_result(dut, {"WIDTH": "8"}, impl={"phys_opt": "true"})
+    results = dut.vivado_synth(clk_period=2.0)
+
+    assert pruned(results) == []
+    assert len(results) == 2
+
+    # Once the sources change, the results of the old ones don't apply
+    dut = project(prune={"objective": "pareto"})
+    add_result(dut, {"WIDTH": "8"})
+    (tmp_path / "top.sv").write_text("module top #(parameter WIDTH = 16) ();\nendmodule\n")
+    dut = config.FlexConfig("openflex.yml")
+    assert pruned(dut.vivado_synth(clk_period=2.0)) == []
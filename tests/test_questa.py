@@ -0,0 +1,152 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import pathlib
+import threading
+
+import pytest
+
+PARAMETERS = {"WIDTH": [8, 16, 24, 32, 40, 48]}
+
+
+@pytest.fixture
+def questa(project, monkeypatch):
+    monkeypatch.delenv("FAKE_SIM_DELAY", raising=False)
+    return lambda: project(mode="sim", tool="questa", parameters=PARAMETERS)
+
+
+def statuses(results):
+    return sorted(m["Status"] for _, m in results)
+
+
+def test_simulations(questa, monkeypatch, capsys):
+    monkeypatch.setenv("FAKE_FAIL", "WIDTH=16")
+    results = questa().questa_sim(jobs=2)
+
+    assert statuses(results) == ["FAIL"] + ["PASS"] * 5
+    out = capsys.readouterr().out
+    assert "Tests failed: 1" in out and "build_top_WIDTH_16" in out
+    assert "cancelled" not in out
+
+
+def test_cancelled_tests_are_not_failures(questa, monkeypatch, capsys):
+    monkeypatch.setenv("FAKE_SIM_DELAY", "0.5")
+    dut = questa()
+    results = []
+    with dut.run() as stream:
+        for result in stream:
+            results.append(result)
+            break
+
+    assert [r.status for r in results] == ["PASS"]
+    out = capsys.readouterr().out
+    assert "Tests failed" not in out
+    assert "Tests cancelled: " in out
+
+
+def test_cancelled_results(questa, monkeypatch, capsys):
+    # Cancelled while the second test runs
+    monkeypatch.setenv("FAKE_SIM_DELAY", "0.5")
+    dut = questa()
+    first = threading.Event()
+    dut._on_result = lambda *args: first.set()
+
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(dut.questa_sim()))
+    thread.start()
+    assert first.wait(10)
+    dut._cancel()
+    thread.join()
+
+    assert statuses(results) == ["CANCELLED", "PASS"]
+    out = capsys.readouterr().out
+    assert "Tests failed" not in out and "Tests cancelled: 1" in out
+
+
+@pytest.fixture
+def questa_log(tmp_path, monkeypatch):
+    log = tmp_path / "questa.log"
+    monkeypatch.setenv("FAKE_QUESTA_LOG", str(log))
+
+    def commands(tool, clear=True):
+        lines = log.read_text().splitlines() if log.exists() else []
+        if clear:
+            log.unlink(missing_ok=True)
+        return [line.split()[1:] for line in lines if line.split()[0] == tool]
+
+    return commands
+
+
+def test_compile_once(questa, questa_log, capsys):
+    results = questa().questa_sim(jobs=2, compile_once=True)
+
+    assert statuses(results) == ["PASS"] * 6
+    [vlog] = questa_log("vlog")
+    assert vlog[:-1] == ["-64", "-work", "openflex_lib", "-sv", "-timescale=1ns/100ps"]
+    assert vlog[-1].endswith("top.sv")
+    assert "Tests failed" not in capsys.readouterr().out
+
+
+def test_compile_once_elaborates_each_test(questa, questa_log):
+    questa().questa_sim(compile_once=True)
+
+    assert [cmd[0] for cmd in questa_log("vlib", clear=False)] == ["openflex_lib"] + ["work"] * 6
+    generics = sorted(cmd[cmd.index("-g") + 1] for cmd in questa_log("vopt"))
+    assert generics == sorted(f"WIDTH={w}" for w in PARAMETERS["WIDTH"])
+
+
+def test_compile_once_reuses_the_library(questa, questa_log, tmp_path, capsys):
+    dut = questa()
+    dut.questa_sim(compile_once=True)
+    questa_log("vlog")
+    capsys.readouterr()
+
+    dut.questa_sim(compile_once=True)
+    assert questa_log("vlog") == []
+    assert "is up to date" in capsys.readouterr().out
+
+    (tmp_path / "top.sv").write_text("module top #(parameter WIDTH=8) (); endmodule\n")
+    results = dut.questa_sim(compile_once=True)
+    assert [pathlib.Path(cmd[-1]).name for cmd in questa_log("vlog")] == ["top.sv"]
+    assert "Recompiling 1 of 1 files" in capsys.readouterr().out
+    assert statuses(results) == ["PASS"] * 6
+
+
+def test_compile_once_failures(questa, monkeypatch, capsys):
+    monkeypatch.setenv("FAKE_FAIL", "WIDTH=16")
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "vopt")
+    results = questa().questa_sim(jobs=2, compile_once=True)
+
+    assert statuses(results) == ["FAIL"] + ["PASS"] * 5
+    assert "Tests failed: 1" in capsys.readouterr().out
+
+    monkeypatch.delenv("FAKE_FAIL_STAGE")
+    results = questa().questa_sim(jobs=2, compile_once=True)
+    assert statuses(results) == ["FAIL"] + ["PASS"] * 5
+
+
+def test_compile_failure(questa, monkeypatch, tmp_path):
+    monkeypatch.setenv("FAKE_FAIL", "")
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "vlog")
+    with pytest.raises(SystemExit, match="Compilation of the Questa library failed"):
+        questa().questa_sim(compile_once=True)
+
+    # The next run compiles everything again
+    assert not (tmp_path / "build_questa/openflex_lib/openflex.hash").exists()
@@ -0,0 +1,113 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import csv
+
+from openflex import results
+from openflex.config import FlexConfig
+from openflex.results import CsvWriter, ResultsDB, append_csv_row
+
+
+def read(path):
+    with open(path, newline="") as file:
+        return list(csv.reader(file))
+
+
+def test_db_roundtrip(tmp_path):
+    db = ResultsDB(str(tmp_path / "results.db"))
+    db.add("a", "vivado", "xc7", "top", {"WIDTH": 8, "MODE": "fast"}, {"fMax": 431.03})
+    db.add("b", "vivado", "xc7", "top", {"WIDTH": 16, "MODE": "fast"}, {"fMax": 400.0})
+    db.add("c", "quartus", "agfb", "top", {"WIDTH": 8, "MODE": "slow"}, {"fMax": "n/a"})
+    db.close()
+
+    # Reopened, parameters are strings, and numbers match numerically
+    db = ResultsDB(str(tmp_path / "results.db"))
+    [row] = db.query("vivado", WIDTH="8.0")
+    assert row["WIDTH"] == "8" and row["MODE"] == "fast" and row["fMax"] == 431.03
+    assert row["run_hash"] == "a" and row["tool"] == "vivado" and row["device"] == "xc7"
+    assert [r["run_hash"] for r in db.query(MODE="fast")] == ["a", "b"]
+    assert [r["run_hash"] for r in db.query(top="top", WIDTH=8)] == ["a", "c"]
+    assert db.runs("quartus") == [("c", {"WIDTH": "8", "MODE": "slow"}, {"fMax": "n/a"})]
+
+    # A re-run of the same inputs replaces the earlier result
+    db.add("a", "vivado", "xc7", "top", {"WIDTH": 8, "MODE": "fast"}, {"fMax": 450.0})
+    assert [r["fMax"] for r in db.query("vivado", WIDTH=8)] == [450.0]
+    assert len(db.query()) == 3
+
+    table = db.query("vivado")
+    assert table.columns()["fMax"] == [400.0, 450.0]
+    assert table.headers[:2] == ["WIDTH", "MODE"]
+
+
+def test_csv_union_of_columns(tmp_path):
+    path = str(tmp_path / "results.csv")
+    writer = CsvWriter(path)
+    writer.write({"WIDTH": 8, "fMax": 431.03})
+    writer.write({"WIDTH": 16, "fMax": 400.0, "Pruned": "dominated"})
+    writer.write({"fMax": 380.0, "WIDTH": 24})
+    writer.close()
+
+    assert read(path) == [
+        ["WIDTH", "fMax", "Pruned"],
+        ["8", "431.03", ""],
+        ["16", "400.0", "dominated"],
+        ["24", "380.0", ""],
+    ]
+
+    # Appending later follows the existing header
+    append_csv_row(path, {"Pruned": "", "WIDTH": 32, "LUTs": 10})
+    assert read(path)[0] == ["WIDTH", "fMax", "Pruned", "LUTs"]
+    assert read(path)[-1] == ["32", "", "", "10"]
+
+
+def test_csv_is_opened_once(tmp_path, monkeypatch):
+    opened = []
+
+    def counting_open(*args, **kwargs):
+        opened.append(args[1] if len(args) > 1 else kwargs.get("mode", "r"))
+        return open(*args, **kwargs)
+
+    path = tmp_path / "results.csv"
+    path.write_text("WIDTH,fMax\n")
+    monkeypatch.setattr(results, "open", counting_open, raising=False)
+
+    writer = CsvWriter(str(path))
+    for width in range(100):
+        writer.write({"WIDTH": width, "fMax": 400.0})
+    writer.close()
+
+    assert opened == ["r", "a"]
+    assert len(read(path)) == 101
+
+
+def test_sweep_resumes_the_csv(project):
+    dut = project(parameters={"WIDTH": [8]})
+    dut.vivado_synth("results.csv", clk_period=2.0)
+    assert dut._csv_writers == {}
+
+    # A later sweep (cached, or with more combinations) appends to the same file
+    project(parameters={"WIDTH": [8, 16]})
+    dut = FlexConfig("openflex.yml")
+    dut.vivado_synth("results.csv", clk_period=2.0)
+
+    rows = read("results.csv")
+    assert [r[0] for r in rows] == ["WIDTH", "8", "8", "16"]
+    assert len({len(r) for r in rows}) == 1
+    assert len(dut.results("vivado")) == 2
@@ -0,0 +1,130 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import itertools
+
+import pytest
+
+from openflex import scheduler
+from openflex.scheduler import RuntimePredictor, schedule
+
+
+def row(width, mode, time, memory):
+    return {
+        "WIDTH": str(width),
+        "MODE": mode,
+        "Time (s)": str(time),
+        "Peak Memory (MB)": str(memory),
+    }
+
+
+ROWS = [
+    row(8, "fast", 10, 100),
+    row(8, "fast", 20, 300),
+    row(16, "fast", 40, 400),
+    row(32, "fast", 80, 800),
+    row(8, "slow", 30, 200),
+]
+
+
+def test_repeated_combinations_use_their_average():
+    predictor = RuntimePredictor(ROWS)
+
+    assert predictor.predict({"WIDTH": "8", "MODE": "fast"}) == (15.0, 300.0)
+    assert predictor.predict({"WIDTH": "8.0", "MODE": "slow"}) == (30.0, 200.0)
+
+
+def test_history_is_aggregated_once(monkeypatch):
+    predictor = RuntimePredictor(ROWS * 100)
+    predictor.predict({"WIDTH": "8", "MODE": "fast"})
+
+    # Later predictions only use the distinct combinations, not the rows
+    monkeypatch.setattr(predictor, "history", [None])
+    assert predictor.predict({"WIDTH": "16", "MODE": "fast"}) == (40.0, 400.0)
+    assert len(predictor.points[("WIDTH", "MODE")]) == 4
+
+
+def test_new_combinations():
+    predictor = RuntimePredictor(ROWS)
+
+    # Between the earlier results, and beyond them with the linear fit
+    time, _ = predictor.predict({"WIDTH": "24", "MODE": "fast"})
+    assert 40 < time < 80
+    time, memory = predictor.predict({"WIDTH": "64", "MODE": "fast"})
+    assert time > 80 and memory > 800
+
+
+def test_schedule_orders_longest_first():
+    predictor = RuntimePredictor(ROWS)
+    combinations = [{"WIDTH": str(w), "MODE": "fast"} for w in (8, 32, 16)]
+    jobs = list(schedule(combinations, predictor))
+
+    assert [c["WIDTH"] for c, _, _ in jobs] == ["32", "16", "8"]
+    assert [time for _, time, _ in jobs] == [80.0, 40.0, 15.0]
+
+    # Without a history, by the parameter values
+    assert [c["WIDTH"] for c, _, _ in schedule(combinations)] == ["32", "16", "8"]
+
+
+def test_largest_job_in_the_window_first():
+    # A width sweep where the widest combinations come last
+    combinations = [{"WIDTH": str(w), "N": str(n)} for w in (8, 16, 32, 64) for n in range(50)]
+    jobs = [c for c, _, _ in schedule(combinations, RuntimePredictor(ROWS))]
+
+    assert [c["WIDTH"] for c in jobs[:50]] == ["64"] * 50
+    assert [c["WIDTH"] for c in jobs[-50:]] == ["8"] * 50
+    assert [c["WIDTH"] for c, _, _ in schedule(combinations)][0] == "64"
+
+
+def test_window_is_read_before_dispatch():
+    read = []
+
+    def combinations():
+        for i in itertools.count():
+            read.append(i)
+            yield {"WIDTH": str(i)}
+
+    jobs = schedule(combinations(), RuntimePredictor(ROWS), window=100)
+    assert next(jobs)[0] == {"WIDTH": "99"}
+    assert len(read) == 100
+
+    # The next window is only read once this one is dispatched
+    list(itertools.islice(jobs, 99))
+    assert len(read) == 100
+    assert next(jobs)[0] == {"WIDTH": "199"}
+    assert len(read) == 200
+
+
+@pytest.mark.parametrize("window", [1, 5])
+def test_small_windows(window):
+    jobs = list(schedule(({"N": str(i)} for i in range(20)), window=window))
+
+    assert sorted(int(c["N"]) for c, _, _ in jobs) == list(range(20))
+
+
+def test_nearest_without_numpy(monkeypatch):
+    combinations = [{"WIDTH": str(w), "MODE": m} for w in (4, 12, 24, 64) for m in ("fast", "x")]
+    expected = list(zip(*schedule(combinations, RuntimePredictor(ROWS))))
+    monkeypatch.setattr(scheduler, "numpy", None)
+    jobs = list(zip(*schedule(combinations, RuntimePredictor(ROWS))))
+
+    assert jobs[0] == expected[0]
+    assert jobs[1] == pytest.approx(expected[1])
+    assert jobs[2] == pytest.approx(expected[2])
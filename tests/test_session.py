@@ -0,0 +1,207 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import io
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from openflex.config import SESSION_COMMANDS
+from openflex.session import SessionPool, ToolSession
+
+pytestmark = pytest.mark.skipif(shutil.which("tclsh") is None, reason="needs tclsh")
+
+IMPLEMENTATION = {"clk_period": [2.0, 2.5]}
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch, fakebin):
+    # Returns the process IDs of the sessions started so far
+    log = tmp_path / "sessions.log"
+    monkeypatch.setenv("FAKE_SESSION_LOG", str(log))
+    monkeypatch.delenv("FAKE_SESSION_CRASH", raising=False)
+    monkeypatch.delenv("FAKE_SESSION_DELAY", raising=False)
+    return lambda: log.read_text().split() if log.exists() else []
+
+
+def running(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_protocol(tmp_path, sessions):
+    session = ToolSession(SESSION_COMMANDS["vivado"])
+    stages = []
+    try:
+        status, output = session.run(
+            'puts "OPENFLEX_STAGE:synth_design"\nputs [pwd]', tmp_path, on_stage=stages.append
+        )
+        assert status == 0
+        assert output.splitlines()[-1] == str(tmp_path)
+        assert stages == ["synth_design"]
+
+        # An error is reported with its message, and the session stays usable
+        log = io.StringIO()
+        status, output = session.run('puts before\nerror "no such cell"\nputs after', tmp_path, log)
+        assert status == 1
+        assert output.startswith("before") and "after" not in output
+        assert "ERROR: no such cell" in log.getvalue()
+        assert session.run("expr {6 * 7}", tmp_path) == (0, "")
+        assert session.alive()
+    finally:
+        session.close()
+
+    assert not session.alive()
+    assert len(sessions()) == 1
+
+
+def test_crashed_sessions_are_replaced(tmp_path, sessions):
+    pool = SessionPool(SESSION_COMMANDS)
+    try:
+        session = pool.acquire("vivado")
+        assert session.run("exit 1", tmp_path)[0] == 1
+        assert not session.alive()
+        pool.release("vivado", session)
+
+        session = pool.acquire("vivado")
+        status, output = session.run("puts ok", tmp_path)
+        assert status == 0 and output.endswith("ok\n")
+        pool.release("vivado", session)
+        assert pool.acquire("vivado") is session
+    finally:
+        pool.close()
+
+    assert len(sessions()) == 2
+
+
+def test_sweep(project, sessions):
+    dut = project(implementation=IMPLEMENTATION)
+    results = dut.vivado_synth(clk_period=2.0, session=True)
+
+    assert sorted((r["WIDTH"], r["clk_period"], m["fMax"]) for r, m in results) == [
+        ("16", "2.0", pytest.approx(862.07, abs=0.01)),
+        ("16", "2.5", pytest.approx(862.07, abs=0.01)),
+        ("8", "2.0", pytest.approx(925.93, abs=0.01)),
+        ("8", "2.5", pytest.approx(925.93, abs=0.01)),
+    ]
+    assert len(sessions()) == 1
+
+
+def test_failed_runs_keep_the_session(project, sessions, monkeypatch):
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "any")
+    monkeypatch.setenv("FAKE_FAIL", "WIDTH 8")
+    results = project().vivado_synth(clk_period=2.0, session=True)
+
+    assert [r for r, _ in results] == [{"WIDTH": "16"}]
+    assert len(sessions()) == 1
+
+
+def test_crashed_session_is_restarted(project, sessions, monkeypatch):
+    monkeypatch.setenv("FAKE_SESSION_CRASH", "WIDTH 8")
+    results = project(parameters={"WIDTH": [8, 16, 24]}).vivado_synth(clk_period=2.0, session=True)
+
+    assert sorted(r["WIDTH"] for r, _ in results) == ["16", "24"]
+    assert len(sessions()) == 2
+
+
+def test_timed_out_runs_terminate_the_session(project, sessions, monkeypatch, capsys):
+    monkeypatch.setenv("FAKE_SESSION_DELAY", "5")
+    dut = project()
+    dut.run_timeout = 0.5
+    start = time.monotonic()
+    results = dut.vivado_synth(clk_period=2.0, session=True)
+
+    assert time.monotonic() - start < 5
+    assert results == []
+    assert "vivado exceeded the run timeout" in capsys.readouterr().out
+
+    # Each run got a fresh session, and none is left running
+    assert len(sessions()) == 2
+    for pid in sessions():
+        assert not running(pid)
+
+
+def test_cancel_terminates_the_session(project, sessions, monkeypatch):
+    monkeypatch.setenv("FAKE_SESSION_DELAY", "5")
+    dut = project()
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.extend(dut.vivado_synth(clk_period=2.0, session=True))
+    )
+    start = time.monotonic()
+    thread.start()
+    while not sessions():
+        time.sleep(0.05)
+    dut._cancel()
+    thread.join()
+
+    assert time.monotonic() - start < 5
+    assert results == []
+    assert len(sessions()) == 1
+    assert not running(sessions()[0])
+
+
+def tool_metrics(results):
+    # Without the profile, which differs between runs
+    return sorted(
+        (sorted(r.items()), {k: v for k, v in m.items() if "Time (s)" not in k and "(MB)" not in k})
+        for r, m in results
+    )
+
+
+@pytest.mark.parametrize("stage", [None, "compile", "timing"])
+def test_quartus_matches_separate_runs(project, sessions, monkeypatch, stage):
+    if stage:
+        monkeypatch.setenv("FAKE_FAIL_STAGE", stage)
+        monkeypatch.setenv("FAKE_FAIL", "WIDTH 8")
+    dut = project(tool="quartus", parameters={"WIDTH": [8, 16, 24]})
+    dut.cache = None
+    separate = dut.quartus_synth(clk_period=2.0)
+    assert sessions() == []
+
+    results = dut.quartus_synth(clk_period=2.0, session=True)
+    assert tool_metrics(results) == tool_metrics(separate)
+    assert len(results) == (2 if stage == "compile" else 3)
+    assert len(sessions()) == 1
+
+
+def test_quartus_session_is_reused(project, sessions):
+    dut = project(tool="quartus", parameters={"WIDTH": [8, 16, 24, 32]})
+    results = dut.quartus_synth(clk_period=2.0, session=True, jobs=2)
+
+    assert sorted(r["WIDTH"] for r, _ in results) == ["16", "24", "32", "8"]
+    assert all(m["fMax"] == "402.41" for _, m in results)
+    assert all("map Time (s)" in m for _, m in results)
+    assert 1 <= len(sessions()) <= 2
+
+
+def test_crashed_quartus_session_is_restarted(project, sessions, monkeypatch):
+    monkeypatch.setenv("FAKE_SESSION_CRASH", "WIDTH 8")
+    dut = project(tool="quartus", parameters={"WIDTH": [8, 16, 24]})
+    results = dut.quartus_synth(clk_period=2.0, session=True)
+
+    assert sorted(r["WIDTH"] for r, _ in results) == ["16", "24"]
+    assert len(sessions()) == 2
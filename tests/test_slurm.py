@@ -0,0 +1,116 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+
+import pytest
+
+from openflex import backend, config
+from openflex.backend import SlurmBackend
+
+# The workers import openflex from this tree
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PARAMETERS = {"WIDTH": [8, 16, 24, 32], "DEPTH": [1, 2]}
+
+
+@pytest.fixture
+def slurm(project, tmp_path, monkeypatch):
+    # A project that runs on the sbatch and squeue stand-ins
+    monkeypatch.setenv("FAKE_SLURM_DIR", str(tmp_path / "slurm"))
+    monkeypatch.setenv("PYTHONPATH", ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    for name in ("FAKE_SLURM_MAX_ARRAY_SIZE", "FAKE_SQUEUE_FAILURES"):
+        monkeypatch.delenv(name, raising=False)
+
+    def load(**backend):
+        return project(parameters=PARAMETERS, backend=dict(type="slurm", poll=0.05, **backend))
+
+    return load
+
+
+def rows(results):
+    return sorted((r["WIDTH"], r["DEPTH"], m["LUT (Used)"], m["fMax"]) for r, m in results)
+
+
+def test_sweep(slurm, capsys):
+    dut = slurm(batch_size=3)
+    results = dut.vivado_synth(clk_period=2.0)
+
+    assert len(results) == 8
+    assert "(3 tasks)" in capsys.readouterr().out
+
+    # The same results as a local sweep
+    local = slurm()
+    local.backend = None
+    local.cache = None
+    assert rows(local.vivado_synth(clk_period=2.0)) == rows(results)
+
+
+def test_large_jobs_are_split_into_arrays(slurm, monkeypatch, capsys):
+    # One combination per task, and room for three tasks per array
+    monkeypatch.setenv("FAKE_SLURM_MAX_ARRAY_SIZE", "3")
+    dut = slurm(max_array_size=3)
+    results = dut.vivado_synth(clk_period=2.0)
+
+    assert len(results) == 8
+    out = capsys.readouterr().out
+    assert "(8 tasks)" in out and "failed" not in out
+
+
+def test_arrays_above_the_limit_are_rejected(slurm, monkeypatch):
+    # The stand-in rejects arrays like Slurm does, so the limit is needed
+    monkeypatch.setenv("FAKE_SLURM_MAX_ARRAY_SIZE", "3")
+    with pytest.raises(SystemExit, match="submission failed"):
+        slurm().vivado_synth(clk_period=2.0)
+
+
+def test_squeue_errors_are_retried(slurm, monkeypatch, capsys):
+    monkeypatch.setenv("FAKE_SQUEUE_FAILURES", "2")
+    results = slurm(batch_size=8).vivado_synth(clk_period=2.0)
+
+    assert len(results) == 8
+    assert capsys.readouterr().out.count("WARNING: squeue failed") == 2
+
+
+def test_squeue_keeps_failing(slurm, monkeypatch):
+    monkeypatch.setenv("FAKE_SQUEUE_FAILURES", "100")
+    monkeypatch.setattr(backend, "SQUEUE_RETRIES", 2)
+    with pytest.raises(SystemExit, match="squeue failed 3 times"):
+        slurm(batch_size=8).vivado_synth(clk_period=2.0)
+
+
+def test_finished_jobs(slurm, fakebin):
+    slurm()
+    assert not SlurmBackend(poll=0)._queued("12345")
+
+
+def test_pruning_starts_from_the_same_results(slurm):
+    # The workers' results databases are empty, but they prune like a local
+    # sweep against the stored results of this flow
+    dut = slurm(batch_size=3)
+    dut.prune = {"objective": "pareto"}
+    flow = os.path.join(os.path.dirname(config.__file__), "tcl", "vivado_flow.tcl")
+    key = dut._cache_key("vivado", {"WIDTH": "8", "DEPTH": "1"}, 2.0, [flow])
+    metrics = {"fMax": "900", "LUT (Used)": "10"}
+    dut.db.add(key, "vivado", dut.config["device"], "top", {"WIDTH": "8", "DEPTH": "1"}, metrics)
+
+    results = dut.vivado_synth(clk_period=2.0)
+    assert len(results) == 8
+    assert all(m.get("Pruned") == "dominated" for _, m in results)
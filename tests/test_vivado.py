@@ -0,0 +1,65 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from openflex.config import FlexConfig
+
+IMPLEMENTATION = {"clk_period": [2.0, 2.5]}
+
+
+def test_implementation_sweep(project):
+    dut = project(implementation=IMPLEMENTATION)
+    results = dut.vivado_synth(clk_period=2.0)
+
+    assert len(results) == 4
+    assert {r["clk_period"] for r, _ in results} == {"2.0", "2.5"}
+    assert all(m["fMax"] == 431.03 for _, m in results)
+
+
+def test_failed_synthesis_is_not_implemented(project, monkeypatch):
+    # After an RTL edit that breaks synthesis, nothing may be implemented from
+    # the previous checkpoint, or stored
+    dut = project(implementation=IMPLEMENTATION)
+    assert len(dut.vivado_synth(clk_period=2.0)) == 4
+
+    with open("top.sv", "a") as file:
+        file.write("// edit\n")
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "synth")
+    dut = FlexConfig("openflex.yml")
+    assert dut.vivado_synth(clk_period=2.0) == []
+    assert len(dut.results("vivado")) == 4
+
+    # Nothing was cached, so everything runs once synthesis passes again
+    monkeypatch.delenv("FAKE_FAIL_STAGE")
+    dut = FlexConfig("openflex.yml")
+    assert len(dut.vivado_synth(clk_period=2.0)) == 4
+    assert dut.cache.hits == 0
+
+
+def test_failed_flow_is_not_cached(project, monkeypatch):
+    dut = project()
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "all")
+    monkeypatch.setenv("FAKE_FAIL", "16")
+    results = dut.vivado_synth(clk_period=2.0)
+    assert [r for r, _ in results] == [{"WIDTH": "8"}]
+
+    monkeypatch.delenv("FAKE_FAIL_STAGE")
+    dut = FlexConfig("openflex.yml")
+    assert len(dut.vivado_synth(clk_period=2.0)) == 2
+    assert (dut.cache.hits, dut.cache.misses) == (1, 1)
@@ -0,0 +1,151 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import time
+import _thread
+import threading
+
+import pytest
+
+from openflex.watch import DependencyMap
+
+FILES = {
+    "defs.svh": "`define DEPTH 4\n",
+    "pkg.sv": "package pkg;\n  typedef logic [7:0] byte_t;\nendpackage\n",
+    "fifo.sv": (
+        '`include "defs.svh"\n' "module fifo import pkg::*; (input byte_t d);\nendmodule\n"
+    ),
+    "top.sv": "module top (input logic clk);\n  fifo u_fifo (.d(8'h0));\nendmodule\n",
+    "unused.sv": "module unused;\n  // fifo isn't instantiated here\nendmodule\n",
+    "types.vhd": "package types is\nend package;\n",
+    "core.vhd": (
+        "use work.types.all;\nentity core is\nend entity;\n"
+        "architecture rtl of core is\nbegin\nend architecture;\n"
+    ),
+}
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name, text in FILES.items():
+        with open(name, "w") as file:
+            file.write(text)
+    return DependencyMap([f for f in FILES if not f.endswith(".svh")])
+
+
+def names(files):
+    return sorted(os.path.basename(f) for f in files)
+
+
+def test_included_files_are_sources(sources):
+    order = [os.path.basename(f) for f in sources.sources()]
+    assert order == [
+        "pkg.sv",
+        "fifo.sv",
+        "defs.svh",
+        "top.sv",
+        "unused.sv",
+        "types.vhd",
+        "core.vhd",
+    ]
+
+
+def test_dependents(sources):
+    # Includes, packages and instantiated modules
+    assert names(sources.dependents(["defs.svh"])) == ["defs.svh", "fifo.sv", "top.sv"]
+    assert names(sources.dependents(["pkg.sv"])) == ["fifo.sv", "pkg.sv", "top.sv"]
+    assert names(sources.dependents(["fifo.sv"])) == ["fifo.sv", "top.sv"]
+    assert names(sources.dependents(["top.sv"])) == ["top.sv"]
+    assert names(sources.dependents(["types.vhd"])) == ["core.vhd", "types.vhd"]
+
+    # Names in comments aren't uses
+    assert names(sources.dependents(["unused.sv"])) == ["unused.sv"]
+
+
+def test_dependents_to_recompile(sources):
+    # Verilog modules are bound at elaboration, so only includes and packages
+    # make a file recompile; VHDL files recompile with every unit they use
+    deps = sources.dependents(["defs.svh"], compile_only=True)
+    assert names(deps) == ["defs.svh", "fifo.sv"]
+    assert names(sources.dependents(["pkg.sv"], compile_only=True)) == ["fifo.sv", "pkg.sv"]
+    assert names(sources.dependents(["fifo.sv"], compile_only=True)) == ["fifo.sv"]
+    assert names(sources.dependents(["types.vhd"], compile_only=True)) == [
+        "core.vhd",
+        "types.vhd",
+    ]
+
+
+def test_top_sources(sources):
+    # In the order of the file list, included files after the file that
+    # includes them
+    order = [os.path.basename(f) for f in sources.top_sources("TOP")]
+    assert order == ["pkg.sv", "fifo.sv", "defs.svh", "top.sv"]
+    assert names(sources.top_sources("core")) == ["core.vhd", "types.vhd"]
+
+    # An unknown top level uses every file
+    assert names(sources.top_sources("missing")) == sorted(FILES)
+
+
+def test_watch_reruns_on_edit(project, capsys):
+    with open("unused.sv", "w") as file:
+        file.write("module unused;\nendmodule\n")
+    dut = project(files=["top.sv", "unused.sv"])
+    rtl = open("top.sv").read()
+
+    def edit(name, text):
+        time.sleep(0.5)
+        with open(name, "w") as file:
+            file.write(text)
+        # Make sure the modification time changes, whatever its resolution
+        stat = os.stat(name)
+        os.utime(name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def edits():
+        # Neither a file the top level doesn't use, nor saving a file without
+        # changing it, re-runs
+        edit("unused.sv", "module unused;\n  logic x;\nendmodule\n")
+        edit("top.sv", rtl)
+        edit("top.sv", rtl.replace("clk", "clock"))
+
+        # Stop watching if the edit wasn't picked up
+        time.sleep(10)
+        if len(runs) < 2:
+            _thread.interrupt_main()
+
+    runs = []
+    editor = threading.Thread(target=edits, daemon=True)
+
+    def run():
+        runs.append(open("top.sv").read())
+        if len(runs) == 1:
+            editor.start()
+            return [({"WIDTH": 8}, {"Status": "PASS"})]
+        raise KeyboardInterrupt
+
+    dut.watch(run, interval=0.05)
+    assert len(runs) == 2 and "clock" in runs[1]
+
+    out = capsys.readouterr().out
+    assert "1 results: 1 passed, 0 failed" in out
+    assert "Changed: unused.sv (not used by top, nothing to run)" in out
+    assert out.count("Changed:") == 2 and "Changed: top.sv\n" in out
+    assert "Stopped watching." in out
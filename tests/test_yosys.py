@@ -0,0 +1,96 @@
+# Copyright (c) 2024 Greg Stitt, Wesley Piard, University of Florida
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from openflex.config import FlexConfig
+
+ICE40 = {"family": "ice40", "nextpnr": "true"}
+
+
+def test_synthesis_only(project):
+    dut = project(tool="yosys")
+    results = dut.yosys_synth()
+
+    assert len(results) == 2
+    for row, metrics in results:
+        assert metrics["fMax"] == "n/a"
+        assert metrics["$lut (Used)"] == 10 * int(row["WIDTH"]) + 12
+        assert metrics["Logic Depth"] == str(int(row["WIDTH"]) // 4 + 2)
+
+
+def test_nextpnr_seed_sweep(project):
+    dut = project(tool="yosys", yosys=ICE40, implementation={"seed": [1, 2, 3]})
+    results = dut.yosys_synth(clk_period=10.0)
+
+    assert len(results) == 6
+    for row, metrics in results:
+        assert metrics["ICESTORM_LC (Total)"] == 5280
+        assert metrics["SB_LUT4 (Used)"] == 10 * int(row["WIDTH"]) + 12
+    fmax = {(r["WIDTH"], r["seed"]): m["fMax"] for r, m in results}
+    assert fmax["8", "3"] - fmax["8", "1"] == 1.0
+    assert fmax["16", "1"] < fmax["8", "1"]
+
+
+def test_failed_synthesis(project, monkeypatch):
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "synth")
+    monkeypatch.setenv("FAKE_FAIL", "WIDTH 16")
+    dut = project(tool="yosys", yosys=ICE40, implementation={"seed": [1, 2]})
+    assert sorted(r["WIDTH"] for r, _ in dut.yosys_synth(clk_period=10.0)) == ["8", "8"]
+
+    dut = project(tool="yosys", yosys=ICE40)
+    assert [r["WIDTH"] for r, _ in dut.yosys_synth(clk_period=10.0)] == ["8"]
+
+
+def test_failed_place_and_route(project, monkeypatch):
+    monkeypatch.setenv("FAKE_FAIL_STAGE", "place_route")
+    monkeypatch.setenv("FAKE_FAIL", '"WIDTH": "8"')
+    dut = project(tool="yosys", yosys=ICE40)
+    assert [r["WIDTH"] for r, _ in dut.yosys_synth(clk_period=10.0)] == ["16"]
+
+
+def test_generated_flow_is_part_of_the_key(project, monkeypatch):
+    dut = project(tool="yosys", yosys=ICE40)
+    dut.yosys_synth(clk_period=10.0)
+    dut = FlexConfig("openflex.yml")
+    dut.yosys_synth(clk_period=10.0)
+    assert dut.cache.hits == 2
+
+    # A change of the generated Yosys script re-runs
+    script = FlexConfig._yosys_script
+    monkeypatch.setattr(
+        FlexConfig, "_yosys_script", lambda self, *args: script(self, *args) + "opt_clean\n"
+    )
+    dut = FlexConfig("openflex.yml")
+    dut.yosys_synth(clk_period=10.0)
+    assert dut.cache.hits == 0
+
+    # So does a change of the nextpnr command
+    command = FlexConfig._nextpnr_command
+    monkeypatch.setattr(
+        FlexConfig,
+        "_nextpnr_command",
+        lambda self, *args: command(self, *args) + ["--timing-allow-fail"],
+    )
+    dut = FlexConfig("openflex.yml")
+    dut.yosys_synth(clk_period=10.0)
+    assert dut.cache.hits == 0
+
+    dut = FlexConfig("openflex.yml")
+    dut.yosys_synth(clk_period=10.0)
+    assert dut.cache.hits == 2